@@ -1,14 +1,11 @@
-import os
 from logging.config import fileConfig
 
-from dotenv import load_dotenv
-
-load_dotenv()
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
 
+from core.config import get_settings
 from db.session import Base
 from models.rbac import (
     Group,
@@ -23,10 +20,7 @@ from models.rbac import (
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option(
-    "sqlalchemy.url",
-    f"postgresql+psycopg2://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}",
-)
+config.set_main_option("sqlalchemy.url", get_settings().database_url())
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -0,0 +1,54 @@
+"""uuid7 primary key defaults
+
+Revision ID: 5c1f0e2d9a7b
+Revises: a34edc10ec8f
+Create Date: 2026-10-19 09:12:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5c1f0e2d9a7b"
+down_revision = "a34edc10ec8f"
+branch_labels = None
+depends_on = None
+
+tables = ["user", "role", "permission", "group"]
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+            SELECT encode(
+                set_bit(
+                    set_bit(
+                        overlay(
+                            uuid_send(gen_random_uuid())
+                            placing substring(
+                                int8send(
+                                    floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint
+                                ) FROM 3
+                            )
+                            FROM 1 FOR 6
+                        ),
+                        52, 1
+                    ),
+                    53, 1
+                ),
+                'hex'
+            )::uuid
+        $$ LANGUAGE sql VOLATILE
+        """
+    )
+    # existing uuid4 ids stay valid, only new rows get time-ordered ids
+    for table in tables:
+        op.alter_column(table, "id", server_default=sa.text("uuid_generate_v7()"))
+
+
+def downgrade() -> None:
+    for table in tables:
+        op.alter_column(table, "id", server_default=None)
+    op.execute("DROP FUNCTION IF EXISTS uuid_generate_v7()")
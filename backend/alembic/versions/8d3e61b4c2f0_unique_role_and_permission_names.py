@@ -0,0 +1,73 @@
+"""unique role and permission names
+
+Revision ID: 8d3e61b4c2f0
+Revises: 5c1f0e2d9a7b
+Create Date: 2026-10-19 10:02:17.551930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8d3e61b4c2f0"
+down_revision = "5c1f0e2d9a7b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # merge rows sharing a name into one of them before adding the constraint,
+    # ids are random uuids so ORDER BY id keeps an arbitrary row, not the oldest.
+    # Tokens carry permission ids, a token issued with a merged away id loses
+    # that permission until it is refreshed or the user logs in again
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE duplicate_role ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (PARTITION BY name ORDER BY id) AS keep_id
+            FROM role
+        ) AS ranked
+        WHERE id <> keep_id;
+
+        INSERT INTO user_has_role (user_id, role_id)
+        SELECT user_has_role.user_id, duplicate_role.keep_id
+        FROM user_has_role JOIN duplicate_role ON user_has_role.role_id = duplicate_role.id
+        ON CONFLICT DO NOTHING;
+        DELETE FROM user_has_role USING duplicate_role
+        WHERE user_has_role.role_id = duplicate_role.id;
+
+        INSERT INTO role_has_permission (role_id, permission_id)
+        SELECT duplicate_role.keep_id, role_has_permission.permission_id
+        FROM role_has_permission JOIN duplicate_role ON role_has_permission.role_id = duplicate_role.id
+        ON CONFLICT DO NOTHING;
+        DELETE FROM role_has_permission USING duplicate_role
+        WHERE role_has_permission.role_id = duplicate_role.id;
+
+        DELETE FROM role USING duplicate_role WHERE role.id = duplicate_role.id;
+
+        CREATE TEMPORARY TABLE duplicate_permission ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (PARTITION BY name ORDER BY id) AS keep_id
+            FROM permission
+        ) AS ranked
+        WHERE id <> keep_id;
+
+        INSERT INTO role_has_permission (role_id, permission_id)
+        SELECT role_has_permission.role_id, duplicate_permission.keep_id
+        FROM role_has_permission JOIN duplicate_permission ON role_has_permission.permission_id = duplicate_permission.id
+        ON CONFLICT DO NOTHING;
+        DELETE FROM role_has_permission USING duplicate_permission
+        WHERE role_has_permission.permission_id = duplicate_permission.id;
+
+        DELETE FROM permission USING duplicate_permission
+        WHERE permission.id = duplicate_permission.id;
+        """
+    )
+    op.create_unique_constraint("role_name_key", "role", ["name"])
+    op.create_unique_constraint("permission_name_key", "permission", ["name"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("permission_name_key", "permission", type_="unique")
+    op.drop_constraint("role_name_key", "role", type_="unique")
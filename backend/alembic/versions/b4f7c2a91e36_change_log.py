@@ -0,0 +1,38 @@
+"""change log
+
+Revision ID: b4f7c2a91e36
+Revises: 8d3e61b4c2f0
+Create Date: 2026-10-19 14:21:08.304117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "b4f7c2a91e36"
+down_revision = "8d3e61b4c2f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "change_log",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("op", sa.String(), nullable=False),
+        sa.Column("keys", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("change_log")
@@ -0,0 +1,71 @@
+"""service account api key
+
+Revision ID: d2b6e9f41a53
+Revises: c8a1d5e3f702
+Create Date: 2026-10-19 19:37:12.804517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "d2b6e9f41a53"
+down_revision = "c8a1d5e3f702"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user",
+        sa.Column(
+            "is_service_account",
+            sa.Boolean(),
+            server_default=sa.text("false"),
+            nullable=False,
+        ),
+    )
+    op.alter_column("user", "hashed_password", existing_type=sa.String(), nullable=True)
+    op.create_table(
+        "api_key",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            server_default=sa.text("uuid_generate_v7()"),
+            nullable=False,
+        ),
+        sa.Column("prefix", sa.String(), nullable=False),
+        sa.Column("key_hash", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("revoked_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("prefix"),
+    )
+    op.create_index(op.f("ix_api_key_user_id"), "api_key", ["user_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_api_key_user_id"), table_name="api_key")
+    op.drop_table("api_key")
+    # service accounts cannot exist without a password
+    for table in ("user_has_role", "group_has_user"):
+        op.execute(
+            f'DELETE FROM "{table}" WHERE user_id IN '
+            '(SELECT id FROM "user" WHERE hashed_password IS NULL)'
+        )
+    op.execute('DELETE FROM "user" WHERE hashed_password IS NULL')
+    op.alter_column(
+        "user", "hashed_password", existing_type=sa.String(), nullable=False
+    )
+    op.drop_column("user", "is_service_account")
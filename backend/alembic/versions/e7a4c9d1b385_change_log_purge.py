@@ -0,0 +1,34 @@
+"""change log purge
+
+Revision ID: e7a4c9d1b385
+Revises: d2b6e9f41a53
+Create Date: 2026-10-20 10:12:36.402177
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e7a4c9d1b385"
+down_revision = "d2b6e9f41a53"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "change_log_purge",
+        sa.Column("last_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "purged_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("last_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("change_log_purge")
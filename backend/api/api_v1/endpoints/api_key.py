@@ -0,0 +1,75 @@
+from typing import Any
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from api.deps import get_db, get_read_db, SessionReleasingRoute
+import crud
+from schemas.rbac import ApiKeyCreate, ApiKeyCreated, ApiKeyOut
+from utils.auth import require_permissions
+from utils.exception import UvicornException
+
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+
+@router.post(
+    "",
+    response_model=ApiKeyCreated,
+    status_code=201,
+    dependencies=[require_permissions("setting.create")],
+)
+async def create_api_key(
+    api_key: ApiKeyCreate,
+    db: Session = Depends(get_db),
+) -> Any:
+    user = crud.rbac.get_user_by_id(db, user_id=api_key.user_id)
+    if user is None:
+        raise UvicornException(
+            status_code=404,
+            message="user not found",
+            error=f"no user id: {api_key.user_id}",
+        )
+    if not user.is_service_account:
+        raise UvicornException(
+            status_code=400,
+            message="user is not a service account",
+            error=f"user id: {user.id}, user email: {user.email}",
+        )
+    db_obj, key = crud.rbac.create_api_key(
+        db, user_id=user.id, name=api_key.name, expires_at=api_key.expires_at
+    )
+    return {**ApiKeyOut.from_orm(db_obj).dict(), "key": key}
+
+
+@router.get(
+    "/{user_id}",
+    response_model=list[ApiKeyOut],
+    status_code=200,
+    dependencies=[require_permissions("setting.read")],
+)
+async def read_api_keys(
+    user_id: UUID,
+    db: Session = Depends(get_read_db),
+) -> Any:
+    return crud.rbac.get_api_keys_by_user_id(db, user_id=user_id)
+
+
+@router.delete(
+    "/{id}",
+    status_code=204,
+    dependencies=[require_permissions("setting.delete")],
+)
+async def revoke_api_key(
+    id: UUID,
+    db: Session = Depends(get_db),
+):
+    db_obj = crud.rbac.get_api_key_by_id(db, api_key_id=id)
+    if not db_obj:
+        raise UvicornException(
+            status_code=404,
+            message="api key not found",
+            error=f"no api key id: {id}",
+        )
+    crud.rbac.revoke_api_key(db, api_key=db_obj)
@@ -1,50 +1,101 @@
 from typing import Any
+from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
+from api.deps import get_db, get_read_db, SessionReleasingRoute
+from authz.catalog import catalog
+from authz.decisions import decisions
+from core.config import get_settings
 import crud
 from schemas.rbac import UserCreate
-from schemas.token import Token
+from schemas.token import LoginOut, RefreshTokenIn, Token
 from utils import security
+from utils.auth import authorize, get_manifest, require_permissions, verify_api_key
+from utils.exception import UvicornException
+from utils.metrics import AUTH_CHECKS
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
-@router.post("/login", response_model=Token, status_code=201)
-async def login(body: UserCreate, db: Session = Depends(get_db)) -> Any:
+def issue_tokens(db: Session, user_id: UUID, email: str, refresh_token: str) -> dict:
+    permissions = catalog.get_user_permissions(db, user_id=user_id)
+    return {
+        "permissions": list(permissions.values()),
+        "token": security.generate_jwt(list(permissions), email),
+        "refresh_token": refresh_token,
+        "expires_in": get_settings().ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+@router.post("/login", response_model=LoginOut, status_code=201)
+async def login(
+    body: UserCreate,
+    db: Session = Depends(get_read_db),
+    primary_db: Session = Depends(get_db),
+) -> Any:
     user = crud.rbac.authenticate(db, obj_in=body)
     if not user:
         return JSONResponse(
             status_code=400, content={"message": "Incorrect email or password"}
         )
-    role_ids = crud.rbac.get_all_role_ids_by_user_id(db, user_id=user.id)
-    permission_ids = []
-    for role_id in role_ids:
-        permission_ids += crud.rbac.get_all_permission_ids_by_role_id(
-            db, role_id=role_id
+    # the plain password is only available here, upgrade the stored cost
+    if security.needs_rehash(user.hashed_password):
+        crud.rbac.rehash_password(primary_db, user=user, password=body.password)
+    refresh_token = crud.rbac.create_refresh_token(primary_db, user_id=user.id)
+    return issue_tokens(primary_db, user.id, user.email, refresh_token)
+
+
+@router.post("/refresh", response_model=LoginOut, status_code=201)
+async def refresh(body: RefreshTokenIn, db: Session = Depends(get_db)) -> Any:
+    # no password check, the refresh token is looked up by its keyed hash
+    rotated = crud.rbac.rotate_refresh_token(db, token=body.refresh_token)
+    if not rotated:
+        raise UvicornException(
+            status_code=401,
+            message="user is not authorized",
+            error="refresh token is invalid, expired or revoked",
         )
-    return {
-        "permissions": [
-            crud.rbac.get_permission_name_by_id(db, permission_id=permission_id)
-            for permission_id in permission_ids
-        ],
-        "token": security.generate_jwt(permission_ids, user.email),
-    }
+    user_id, email, refresh_token = rotated
+    return issue_tokens(db, user_id, email, refresh_token)
+
+
+@router.post("/revoke", status_code=204)
+async def revoke(body: RefreshTokenIn, db: Session = Depends(get_db)):
+    crud.rbac.revoke_refresh_token(db, token=body.refresh_token)
 
 
 @router.post("", status_code=201)
 async def auth(body: Token, db: Session = Depends(get_db)) -> Any:
-    payload = security.verify_jwt(body.token)
-    permission_names = [
-        crud.rbac.get_permission_name_by_id(db, permission_id=permission_id)
-        for permission_id in payload["permissions"]
-    ]
-    for permission in body.permissions:
-        if not permission in permission_names:
-            return JSONResponse(
-                status_code=401, content={"message": "user does not have permission"}
-            )
+    # repeated checks of the same token and permissions are answered from the
+    # decision cache, without verifying the token again
+    key = decisions.key(body.token, body.permissions, "all", decisions.version())
+    allowed = decisions.get(key)
+    if allowed is None:
+        if body.token.startswith(security.API_KEY_PREFIX):
+            payload = verify_api_key(db, body.token)
+        else:
+            try:
+                payload = security.verify_jwt(body.token)
+            except UvicornException:
+                AUTH_CHECKS.labels("invalid_token").inc()
+                raise
+        allowed = authorize(db, payload, body.permissions)
+        decisions.set(key, allowed, payload)
+    else:
+        AUTH_CHECKS.labels("allowed" if allowed else "denied").inc()
+    if not allowed:
+        return JSONResponse(
+            status_code=401,
+            content={"message": "user does not have permission"},
+        )
     return {"message": "success"}
+
+
+@router.get(
+    "/manifest", status_code=200, dependencies=[require_permissions("setting.read")]
+)
+async def read_manifest(request: Request) -> Any:
+    return get_manifest(request.app)
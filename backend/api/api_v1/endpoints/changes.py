@@ -0,0 +1,90 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from api.deps import get_read_db, SessionReleasingRoute
+from core.config import get_settings
+import crud
+from schemas.rbac import ChangeFeed, ChangeOut
+from utils.auth import require_permissions
+from utils.exception import UvicornException
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+KEEPALIVE_INTERVAL = 15
+
+
+def check_horizon(after: int, horizon: int) -> None:
+    if after < horizon:
+        raise UvicornException(
+            status_code=410,
+            message="changes have been purged",
+            error=f"change log starts after {horizon}, reload from /snapshot",
+        )
+
+
+def poll_changes(db: Session, after: int) -> list[Any]:
+    changes = crud.rbac.get_changes(db, after=after, limit=1000)
+    # end the read transaction so no connection is held between polls
+    db.commit()
+    return changes
+
+
+@router.get(
+    "",
+    response_model=ChangeFeed,
+    status_code=200,
+    dependencies=[require_permissions("setting.read")],
+)
+async def read_changes(
+    after: int = 0,
+    limit: int = Query(default=1000, ge=1, le=10000),
+    db: Session = Depends(get_read_db),
+) -> Any:
+    changes = crud.rbac.get_changes(db, after=after, limit=limit)
+    # a page that continues right after the cursor missed nothing, ids in
+    # between may only be gaps or purged
+    if changes and changes[0].id != after + 1:
+        check_horizon(after, crud.rbac.get_change_horizon(db))
+    return {"changes": changes, "next": changes[-1].id if changes else after}
+
+
+@router.get(
+    "/stream", status_code=200, dependencies=[require_permissions("setting.read")]
+)
+async def stream_changes(
+    request: Request,
+    after: int = 0,
+    last_event_id: int | None = Header(default=None),
+    db: Session = Depends(get_read_db),
+) -> Any:
+    # EventSource reconnects with the id of the last event it received
+    cursor = last_event_id if last_event_id is not None else after
+    check_horizon(cursor, await run_in_threadpool(crud.rbac.get_change_horizon, db))
+
+    async def events() -> AsyncIterator[str]:
+        nonlocal cursor
+        settings = get_settings()
+        deadline = time.monotonic() + settings.CHANGES_STREAM_TIMEOUT
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline and not await request.is_disconnected():
+            # every subscriber polls, the query runs off the event loop
+            changes = await run_in_threadpool(poll_changes, db, cursor)
+            for change in changes:
+                cursor = change.id
+                data = ChangeOut.from_orm(change).json()
+                yield f"id: {change.id}\nevent: change\ndata: {data}\n\n"
+                last_sent = time.monotonic()
+            if len(changes) == 1000:
+                continue
+            if time.monotonic() - last_sent >= KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(settings.CHANGES_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
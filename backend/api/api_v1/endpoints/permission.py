@@ -1,52 +1,61 @@
 from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
+from api.deps import get_db, get_read_db, SessionReleasingRoute
 import crud
 from schemas.rbac import PermissionCreate, PermissionOut
-from utils.auth import verify_permission
+from utils.auth import require_permissions
 from utils.exception import UvicornException
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
-@router.post("", response_model=PermissionOut, status_code=201)
+@router.post(
+    "",
+    response_model=PermissionOut,
+    status_code=201,
+    dependencies=[require_permissions("setting.create")],
+)
 async def create_permission(
     permission: PermissionCreate,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.create"])
-    db_obj = crud.rbac.get_permission_by_name(db, name=permission.name)
-    if db_obj:
+    db_objs = crud.rbac.create_permissions(db, permissions=[permission.name])
+    if not db_objs:
+        db_obj = crud.rbac.get_permission_by_name(db, name=permission.name)
         raise UvicornException(
             status_code=400,
             message="permission has already been created",
-            error=f"permission id: {db_obj.id}, permission name: {db_obj.name}",
+            error=f"permission id: {db_obj.id if db_obj else None}, permission name: {permission.name}",
         )
-    return crud.rbac.create_permissions(db, permissions=[permission.name])[0]
+    return db_objs[0]
 
 
-@router.get("", response_model=list[PermissionOut], status_code=200)
-async def read_permissions(
-    authorization: str | None = Header(default=None), db: Session = Depends(get_db)
-) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.read"])
+@router.get(
+    "",
+    response_model=list[PermissionOut],
+    status_code=200,
+    dependencies=[require_permissions("setting.read")],
+)
+async def read_permissions(db: Session = Depends(get_read_db)) -> Any:
     return crud.rbac.get_permissions(db)
 
 
-@router.patch("/{id}", response_model=PermissionOut, status_code=200)
+@router.patch(
+    "/{id}",
+    response_model=PermissionOut,
+    status_code=200,
+    dependencies=[require_permissions("setting.update")],
+)
 async def update_permission(
     id: UUID,
     permission: PermissionCreate,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.update"])
     db_obj = crud.rbac.get_permission_by_id(db, permission_id=id)
     if not db_obj:
         raise UvicornException(
@@ -54,18 +63,26 @@ async def update_permission(
             message="permission not found",
             error=f"no permission id: {id}",
         )
-    return crud.rbac.update_permission(
+    updated = crud.rbac.update_permission(
         db, permission=db_obj, new_permission_name=permission.name
     )
+    if not updated:
+        db_obj = crud.rbac.get_permission_by_name(db, name=permission.name)
+        raise UvicornException(
+            status_code=400,
+            message="permission has already been created",
+            error=f"permission id: {db_obj.id if db_obj else None}, permission name: {permission.name}",
+        )
+    return updated
 
 
-@router.delete("/{id}", status_code=204)
+@router.delete(
+    "/{id}", status_code=204, dependencies=[require_permissions("setting.delete")]
+)
 async def delete_permission(
     id: UUID,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ):
-    await verify_permission(db, authorization, permissions=["setting.delete"])
     db_obj = crud.rbac.get_permission_by_id(db, permission_id=id)
     if not db_obj:
         raise UvicornException(
@@ -1,52 +1,61 @@
 from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
+from api.deps import get_db, get_read_db, SessionReleasingRoute
 import crud
 from schemas.rbac import RoleCreate, RoleOut
-from utils.auth import verify_permission
+from utils.auth import require_permissions
 from utils.exception import UvicornException
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
-@router.post("", response_model=RoleOut, status_code=201)
+@router.post(
+    "",
+    response_model=RoleOut,
+    status_code=201,
+    dependencies=[require_permissions("setting.create")],
+)
 async def create_role(
     role: RoleCreate,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.create"])
-    db_obj = crud.rbac.get_role_by_name(db, name=role.name)
-    if db_obj:
+    created = crud.rbac.create_role(db, role_name=role.name)
+    if not created:
+        db_obj = crud.rbac.get_role_by_name(db, name=role.name)
         raise UvicornException(
             status_code=400,
             message="role has already been created",
-            error=f"role id: {db_obj.id}, role name: {db_obj.name}",
+            error=f"role id: {db_obj.id if db_obj else None}, role name: {role.name}",
         )
-    return crud.rbac.create_role(db, role_name=role.name)
+    return created
 
 
-@router.get("", response_model=list[RoleOut], status_code=200)
-async def read_roles(
-    authorization: str | None = Header(default=None), db: Session = Depends(get_db)
-) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.read"])
+@router.get(
+    "",
+    response_model=list[RoleOut],
+    status_code=200,
+    dependencies=[require_permissions("setting.read")],
+)
+async def read_roles(db: Session = Depends(get_read_db)) -> Any:
     return crud.rbac.get_roles(db)
 
 
-@router.patch("/{id}", response_model=RoleOut, status_code=200)
+@router.patch(
+    "/{id}",
+    response_model=RoleOut,
+    status_code=200,
+    dependencies=[require_permissions("setting.update")],
+)
 async def update_role(
     id: UUID,
     role: RoleCreate,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.update"])
     db_obj = crud.rbac.get_role_by_id(db, role_id=id)
     if not db_obj:
         raise UvicornException(
@@ -54,16 +63,24 @@ async def update_role(
             message="role not found",
             error=f"no role id: {id}",
         )
-    return crud.rbac.update_role(db, role=db_obj, new_role_name=role.name)
+    updated = crud.rbac.update_role(db, role=db_obj, new_role_name=role.name)
+    if not updated:
+        db_obj = crud.rbac.get_role_by_name(db, name=role.name)
+        raise UvicornException(
+            status_code=400,
+            message="role has already been created",
+            error=f"role id: {db_obj.id if db_obj else None}, role name: {role.name}",
+        )
+    return updated
 
 
-@router.delete("/{id}", status_code=204)
+@router.delete(
+    "/{id}", status_code=204, dependencies=[require_permissions("setting.delete")]
+)
 async def delete_role(
     id: UUID,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ):
-    await verify_permission(db, authorization, permissions=["setting.delete"])
     db_obj = crud.rbac.get_role_by_id(db, role_id=id)
     if not db_obj:
         raise UvicornException(
@@ -0,0 +1,50 @@
+import time
+from typing import Any
+
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+
+from api.deps import get_snapshot_db, SessionReleasingRoute
+from authz.catalog import catalog
+from authz.snapshot import dump_snapshot, export_snapshot, read_graph, SnapshotData
+from utils.auth import require_permissions
+
+router = APIRouter(route_class=SessionReleasingRoute)
+
+
+def build_snapshot(db: Session) -> SnapshotData:
+    return read_graph(db.connection())
+
+
+@router.get(
+    "",
+    status_code=200,
+    response_class=Response,
+    dependencies=[require_permissions("setting.read")],
+)
+async def read_snapshot(
+    compress: bool = False,
+    db: Session = Depends(get_snapshot_db),
+) -> Any:
+    # the mapped snapshot may trail the database, clients catch up from
+    # change_id through the change feed. Without one the graph is read off
+    # the event loop
+    snapshot = catalog.snapshots and catalog.snapshots.get()
+    if snapshot:
+        content = export_snapshot(snapshot.buffer, compress)
+        generation, change_id = snapshot.generation, snapshot.change_id
+    else:
+        built_at = time.time()
+        data = await run_in_threadpool(build_snapshot, db)
+        content = dump_snapshot(data, 0, built_at, compress)
+        generation, change_id = 0, data.change_id
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={
+            "X-Snapshot-Generation": str(generation),
+            "X-Snapshot-Change-Id": str(change_id),
+        },
+    )
@@ -1,52 +1,82 @@
 from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
+from api.deps import get_db, get_read_db, SessionReleasingRoute
 import crud
-from schemas.rbac import UserCreate, UserOut, UserUpdate
-from utils.auth import verify_permission
+from schemas.rbac import ServiceAccountCreate, UserCreate, UserOut, UserUpdate
+from utils.auth import require_permissions
 from utils.exception import UvicornException
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
-@router.post("", response_model=UserOut, status_code=201)
+@router.post(
+    "",
+    response_model=UserOut,
+    status_code=201,
+    dependencies=[require_permissions("setting.create")],
+)
 async def create_user(
     user: UserCreate,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.create"])
-    db_obj = crud.rbac.get_user_by_email(db, email=user.email)
-    if db_obj:
+    created = crud.rbac.create_user(db, obj_in=user)
+    if not created:
+        db_obj = crud.rbac.get_user_by_email(db, email=user.email)
         raise UvicornException(
             status_code=400,
             message="user has already been created",
-            error=f"user id: {db_obj.id}, user email: {db_obj.email}",
+            error=f"user id: {db_obj.id if db_obj else None}, user email: {user.email}",
         )
-    return crud.rbac.create_user(db, obj_in=user)
+    return created
 
 
-@router.get("", response_model=list[UserOut], status_code=200)
-async def read_users(
-    authorization: str | None = Header(default=None), db: Session = Depends(get_db)
+@router.post(
+    "/service-account",
+    response_model=UserOut,
+    status_code=201,
+    dependencies=[require_permissions("setting.create")],
+)
+async def create_service_account(
+    service_account: ServiceAccountCreate,
+    db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.read"])
+    created = crud.rbac.create_service_account(db, email=service_account.email)
+    if not created:
+        db_obj = crud.rbac.get_user_by_email(db, email=service_account.email)
+        raise UvicornException(
+            status_code=400,
+            message="user has already been created",
+            error=f"user id: {db_obj.id if db_obj else None}, user email: {service_account.email}",
+        )
+    return created
+
+
+@router.get(
+    "",
+    response_model=list[UserOut],
+    status_code=200,
+    dependencies=[require_permissions("setting.read")],
+)
+async def read_users(db: Session = Depends(get_read_db)) -> Any:
     return crud.rbac.get_users(db)
 
 
-@router.patch("/{id}", response_model=UserOut, status_code=200)
+@router.patch(
+    "/{id}",
+    response_model=UserOut,
+    status_code=200,
+    dependencies=[require_permissions("setting.update")],
+)
 async def update_user(
     id: UUID,
     user: UserUpdate,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.update"])
     db_obj = crud.rbac.get_user_by_id(db, user_id=id)
     if not db_obj:
         raise UvicornException(
@@ -54,16 +84,24 @@ async def update_user(
             message="user not found",
             error=f"no user id: {id}",
         )
-    return crud.rbac.update_user(db, user=db_obj, new_email=user.email)
+    updated = crud.rbac.update_user(db, user=db_obj, new_email=user.email)
+    if not updated:
+        db_obj = crud.rbac.get_user_by_email(db, email=user.email)
+        raise UvicornException(
+            status_code=400,
+            message="user has already been created",
+            error=f"user id: {db_obj.id if db_obj else None}, user email: {user.email}",
+        )
+    return updated
 
 
-@router.delete("/{id}", status_code=204)
+@router.delete(
+    "/{id}", status_code=204, dependencies=[require_permissions("setting.delete")]
+)
 async def delete_user(
     id: UUID,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ):
-    await verify_permission(db, authorization, permissions=["setting.delete"])
     db_obj = crud.rbac.get_user_by_id(db, user_id=id)
     if not db_obj:
         raise UvicornException(
@@ -1,26 +1,29 @@
 from typing import Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
+from api.deps import get_db, get_read_db, SessionReleasingRoute
 import crud
 from schemas.rbac import RoleOut, UserHasRole, UserHasRoleUpdate
-from utils.auth import verify_permission
+from utils.auth import require_permissions
 from utils.exception import UvicornException
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionReleasingRoute)
 
 
-@router.post("", response_model=UserHasRole, status_code=201)
+@router.post(
+    "",
+    response_model=UserHasRole,
+    status_code=201,
+    dependencies=[require_permissions("setting.create")],
+)
 async def create_user_has_role(
     user_has_role: UserHasRole,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.create"])
     if crud.rbac.get_user_by_id(db, user_id=user_has_role.user_id) is None:
         raise UvicornException(
             status_code=404,
@@ -33,43 +36,44 @@ async def create_user_has_role(
             message="role not found",
             error=f"no role id: {user_has_role.role_id}",
         )
-    db_obj = crud.rbac.get_user_has_role_by_user_id_and_role_id(
+    db_obj = crud.rbac.create_user_has_role(
         db,
         user_id=user_has_role.user_id,
         role_id=user_has_role.role_id,
     )
-    if db_obj:
+    if not db_obj:
         raise UvicornException(
             status_code=400,
             message="user has role has already been created",
-            error=f"user id: {db_obj.user_id}, role id: {db_obj.role_id}",
+            error=f"user id: {user_has_role.user_id}, role id: {user_has_role.role_id}",
         )
-    return crud.rbac.create_user_has_role(
-        db,
-        user_id=user_has_role.user_id,
-        role_id=user_has_role.role_id,
-    )
+    return db_obj
 
 
-@router.get("/{id}", response_model=list[RoleOut], status_code=200)
+@router.get(
+    "/{id}",
+    response_model=list[RoleOut],
+    status_code=200,
+    dependencies=[require_permissions("setting.read")],
+)
 async def read_user_has_roles(
     id: UUID,
-    authorization: str | None = Header(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.read"])
-    db_objs = crud.rbac.get_all_user_has_role_by_user_id(db, user_id=id)
-    return [crud.rbac.get_role_by_id(db, role_id=db_obj.role_id) for db_obj in db_objs]
+    return crud.rbac.get_roles_by_user_id(db, user_id=id)
 
 
-@router.patch("/{id}", response_model=UserHasRole, status_code=200)
+@router.patch(
+    "/{id}",
+    response_model=UserHasRole,
+    status_code=200,
+    dependencies=[require_permissions("setting.update")],
+)
 async def update_user_has_role(
     id: UUID,
     role_update: UserHasRoleUpdate,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ) -> Any:
-    await verify_permission(db, authorization, permissions=["setting.update"])
     if crud.rbac.get_user_by_id(db, user_id=id) is None:
         raise UvicornException(
             status_code=404,
@@ -98,14 +102,16 @@ async def update_user_has_role(
     )
 
 
-@router.delete("/{user_id}/{role_id}", status_code=204)
+@router.delete(
+    "/{user_id}/{role_id}",
+    status_code=204,
+    dependencies=[require_permissions("setting.delete")],
+)
 async def delete_user_has_role(
     user_id: UUID,
     role_id: UUID,
-    authorization: str | None = Header(default=None),
     db: Session = Depends(get_db),
 ):
-    await verify_permission(db, authorization, permissions=["setting.delete"])
     db_obj = crud.rbac.get_user_has_role_by_user_id_and_role_id(
         db, user_id=user_id, role_id=role_id
     )
@@ -1,11 +1,63 @@
-from typing import Generator
+import asyncio
+import functools
+from typing import Any, Callable, Generator
 
-from db.session import SessionLocal
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+
+from db.session import ReadSessionLocal, SessionLocal
 
 
 def get_db() -> Generator:
+    # sessions are lazy, a connection is checked out on the first statement
     try:
         db = SessionLocal()
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator:
+    try:
+        db = ReadSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+def get_snapshot_db() -> Generator:
+    # one consistent view of the whole graph, like the command line export
+    try:
+        db = ReadSessionLocal()
+        db.bind = db.bind.execution_options(isolation_level="REPEATABLE READ")
+        yield db
+    finally:
+        db.close()
+
+
+def release_sessions(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    if getattr(endpoint, "releases_sessions", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs: Any) -> Any:
+        try:
+            if asyncio.iscoroutinefunction(endpoint):
+                return await endpoint(**kwargs)
+            return await run_in_threadpool(endpoint, **kwargs)
+        finally:
+            for value in kwargs.values():
+                if isinstance(value, Session):
+                    value.close()
+
+    wrapper.releases_sessions = True
+    return wrapper
+
+
+class SessionReleasingRoute(APIRoute):
+    # dependency teardown only runs after the response has been sent, closing
+    # the sessions when the endpoint returns gives the connection back before
+    # the response is serialized. Loaded objects stay readable once detached
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, release_sessions(endpoint), **kwargs)
@@ -0,0 +1,275 @@
+from collections import OrderedDict
+from datetime import datetime
+import math
+import threading
+import time
+from typing import Callable, Iterable, NamedTuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from authz import changes
+from authz.changes import Change
+from authz.snapshot import Snapshot, SnapshotStore
+from core.config import get_settings
+import crud
+
+
+class ApiKeyEntry(NamedTuple):
+    id: UUID
+    key_hash: str
+    user_id: UUID
+    expires_at: datetime | None
+
+
+class PermissionCatalog:
+    # permission names, role -> permissions and user -> roles, filled on
+    # demand and invalidated by rbac change notifications. A fill only lands
+    # if no invalidation happened while it was reading. Nothing is cached
+    # while the change listener is disconnected, and everything is dropped
+    # every ttl seconds for writes that bypass the notifications.
+    # A mapped snapshot answers lookups except for ids changed after it was
+    # built, those are read here until a snapshot includes their change
+    def __init__(self, max_users: int = 100_000, ttl: float = 300) -> None:
+        self.max_users = max_users
+        self.ttl = ttl
+        self.listening: threading.Event | None = None
+        self.version = 0
+        self.permission_names: dict[UUID, str] = {}
+        self.role_permissions: dict[UUID, frozenset[UUID]] = {}
+        self.user_roles: OrderedDict[UUID, frozenset[UUID]] = OrderedDict()
+        self.api_keys: dict[str, ApiKeyEntry] = {}
+        self.snapshots: SnapshotStore | None = None
+        self.snapshot_pending: dict[UUID, float] = {}
+        self._pruned_change_id = 0
+        self._resynced_at = 0.0
+        self._resync_change_id: int | None = None
+        self._expires_at = time.monotonic() + ttl
+        self._lock = threading.Lock()
+
+    def online(self) -> bool:
+        return self.listening is None or self.listening.is_set()
+
+    def cacheable(self, db: Session) -> bool:
+        # invalidations come from the primary, an entry read from a lagging
+        # replica after its invalidation would stay stale
+        return (
+            get_settings().AUTHZ_CACHE and not db.info.get("replica") and self.online()
+        )
+
+    def expire(self) -> None:
+        if time.monotonic() >= self._expires_at:
+            self.clear()
+
+    def snapshot(self) -> Snapshot | None:
+        # a mapped snapshot is only as fresh as the notifications rebuilding it,
+        # after a resync only one built later or including every change made
+        # before it is used
+        if self.snapshots is None or not self.online():
+            return None
+        snapshot = self.snapshots.get()
+        if snapshot is None:
+            return None
+        if snapshot.built_at < self._resynced_at and (
+            self._resync_change_id is None
+            or snapshot.change_id < self._resync_change_id
+        ):
+            return None
+        if snapshot.change_id > self._pruned_change_id:
+            with self._lock:
+                self.snapshot_pending = {
+                    id: change_id
+                    for id, change_id in self.snapshot_pending.items()
+                    if change_id > snapshot.change_id
+                }
+                self._pruned_change_id = snapshot.change_id
+        return snapshot
+
+    def snapshot_covers(self, snapshot: Snapshot, ids: Iterable[UUID]) -> bool:
+        pending = self.snapshot_pending
+        return not pending or not any(
+            pending.get(id, 0) > snapshot.change_id for id in ids
+        )
+
+    def get_permissions(
+        self, db: Session, permission_ids: Iterable[UUID]
+    ) -> dict[UUID, str]:
+        permission_ids = list(permission_ids)
+        snapshot = self.snapshot()
+        if snapshot and self.snapshot_covers(snapshot, permission_ids):
+            return snapshot.get_permissions(permission_ids)
+        self.expire()
+        version = self.version
+        permissions = {}
+        missing = []
+        for permission_id in permission_ids:
+            name = self.permission_names.get(permission_id)
+            if name is None:
+                missing.append(permission_id)
+            else:
+                permissions[permission_id] = name
+        if missing:
+            found = {
+                permission.id: permission.name
+                for permission in crud.rbac.get_permissions_by_ids(
+                    db, permission_ids=missing
+                )
+            }
+            permissions.update(found)
+            if self.cacheable(db):
+                with self._lock:
+                    if version == self.version:
+                        self.permission_names.update(found)
+        return permissions
+
+    def get_permission_names(
+        self, db: Session, permission_ids: Iterable[UUID]
+    ) -> list[str]:
+        return list(self.get_permissions(db, permission_ids).values())
+
+    def get_role_permissions(self, db: Session, role_ids: Iterable[UUID]) -> set[UUID]:
+        self.expire()
+        version = self.version
+        permission_ids: set[UUID] = set()
+        missing = []
+        for role_id in role_ids:
+            cached = self.role_permissions.get(role_id)
+            if cached is None:
+                missing.append(role_id)
+            else:
+                permission_ids |= cached
+        if missing:
+            found: dict[UUID, set[UUID]] = {role_id: set() for role_id in missing}
+            for role_id, permission_id in crud.rbac.get_permission_ids_by_role_ids(
+                db, role_ids=missing
+            ):
+                found[role_id].add(permission_id)
+                permission_ids.add(permission_id)
+            if self.cacheable(db):
+                with self._lock:
+                    if version == self.version:
+                        for role_id, ids in found.items():
+                            self.role_permissions[role_id] = frozenset(ids)
+        return permission_ids
+
+    def get_user_roles(self, db: Session, user_id: UUID) -> frozenset[UUID]:
+        self.expire()
+        with self._lock:
+            role_ids = self.user_roles.get(user_id)
+            if role_ids is not None:
+                self.user_roles.move_to_end(user_id)
+                return role_ids
+            version = self.version
+        role_ids = frozenset(crud.rbac.get_all_role_ids_by_user_id(db, user_id=user_id))
+        if self.cacheable(db):
+            with self._lock:
+                if version == self.version:
+                    self.user_roles[user_id] = role_ids
+                    if len(self.user_roles) > self.max_users:
+                        self.user_roles.popitem(last=False)
+        return role_ids
+
+    def get_user_permissions(self, db: Session, user_id: UUID) -> dict[UUID, str]:
+        snapshot = self.snapshot()
+        if snapshot:
+            permissions = snapshot.get_user_permissions(user_id)
+            ids = [user_id, *snapshot.get_user_roles(user_id), *permissions]
+            if self.snapshot_covers(snapshot, ids):
+                return permissions
+        role_ids = self.get_user_roles(db, user_id)
+        return self.get_permissions(db, self.get_role_permissions(db, role_ids))
+
+    def get_api_key(self, db: Session, prefix: str) -> ApiKeyEntry | None:
+        # revoked and unknown keys are not cached
+        self.expire()
+        entry = self.api_keys.get(prefix)
+        if entry is not None:
+            return entry
+        version = self.version
+        db_obj = crud.rbac.get_api_key_by_prefix(db, prefix=prefix)
+        if db_obj is None or db_obj.revoked_at is not None:
+            return None
+        entry = ApiKeyEntry(
+            db_obj.id, db_obj.key_hash, db_obj.user_id, db_obj.expires_at
+        )
+        if self.cacheable(db):
+            with self._lock:
+                if version == self.version:
+                    self.api_keys[prefix] = entry
+        return entry
+
+    def apply(self, change: Change) -> None:
+        keys = {key: UUID(value) for key, value in change.keys.items()}
+        with self._lock:
+            self.version += 1
+            if self.snapshots is not None and change.table != "api_key":
+                # a change without a log id is never covered before a resync
+                change_id = change.id or math.inf
+                for id in keys.values():
+                    self.snapshot_pending[id] = max(
+                        change_id, self.snapshot_pending.get(id, 0)
+                    )
+            if change.table == "permission":
+                self.permission_names.pop(keys["id"], None)
+                if change.op == "delete":
+                    self._drop_roles_with_permission(keys["id"])
+            elif change.table == "role":
+                self.role_permissions.pop(keys["id"], None)
+                if change.op == "delete":
+                    self._drop_users_with_role(keys["id"])
+            elif change.table == "role_has_permission":
+                if "role_id" in keys:
+                    self.role_permissions.pop(keys["role_id"], None)
+                else:
+                    self._drop_roles_with_permission(keys["permission_id"])
+            elif change.table == "user_has_role":
+                if "user_id" in keys:
+                    self.user_roles.pop(keys["user_id"], None)
+                else:
+                    self._drop_users_with_role(keys["role_id"])
+            elif change.table == "user":
+                self.user_roles.pop(keys["id"], None)
+                if change.op == "delete":
+                    self._drop_api_keys(lambda entry: entry.user_id == keys["id"])
+            elif change.table == "api_key":
+                self._drop_api_keys(lambda entry: entry.id == keys["id"])
+
+    def _drop_roles_with_permission(self, permission_id: UUID) -> None:
+        for role_id, permission_ids in list(self.role_permissions.items()):
+            if permission_id in permission_ids:
+                del self.role_permissions[role_id]
+
+    def _drop_users_with_role(self, role_id: UUID) -> None:
+        for user_id, role_ids in list(self.user_roles.items()):
+            if role_id in role_ids:
+                del self.user_roles[user_id]
+
+    def _drop_api_keys(self, match: Callable[[ApiKeyEntry], bool]) -> None:
+        for prefix, entry in list(self.api_keys.items()):
+            if match(entry):
+                del self.api_keys[prefix]
+
+    def resync(self, change_id: int | None = None) -> None:
+        # changes missed while disconnected are unknown, wait for a snapshot
+        # built from here on or including change_id, the latest change log id
+        # read after listening again
+        self.clear()
+        with self._lock:
+            self._resynced_at = time.time()
+            self._resync_change_id = change_id
+            self.snapshot_pending.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._expires_at = time.monotonic() + self.ttl
+            self.permission_names.clear()
+            self.role_permissions.clear()
+            self.user_roles.clear()
+            self.api_keys.clear()
+
+
+catalog = PermissionCatalog(
+    max_users=get_settings().AUTHZ_CACHE_MAX_USERS, ttl=get_settings().AUTHZ_CACHE_TTL
+)
+changes.subscribers.append(catalog.apply)
@@ -0,0 +1,95 @@
+from dataclasses import asdict, dataclass, field, replace
+import json
+import logging
+from typing import Any, Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+CHANNEL = "rbac_changes"
+
+# change_log ids are handed out under a transaction level lock, so they follow
+# commit order and a reader polling with after=<last id> never skips a row
+# committed late
+RECORD = text(
+    """
+    WITH lock AS MATERIALIZED (SELECT pg_advisory_xact_lock(:lock_key)),
+    inserted AS (
+        INSERT INTO change_log (table_name, op, keys)
+        SELECT change->>'table', change->>'op', change->'keys'
+        FROM lock, unnest(CAST(:payloads AS jsonb[])) WITH ORDINALITY AS c(change, n)
+        ORDER BY n
+        RETURNING id, table_name, op, keys
+    )
+    SELECT id, pg_notify(
+        :channel,
+        json_build_object('id', id, 'table', table_name, 'op', op, 'keys', keys)::text
+    )
+    FROM inserted ORDER BY id
+    """
+)
+CHANGE_LOG_LOCK = 0x52424143
+
+subscribers: list[Callable[["Change"], None]] = []
+
+
+@dataclass(frozen=True)
+class Change:
+    table: str
+    op: str
+    keys: dict[str, str] = field(default_factory=dict)
+    id: int | None = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, payload: str) -> "Change":
+        return cls(**json.loads(payload))
+
+
+def record_change(db: Session, table: str, op: str, **keys: Any) -> Change:
+    change = Change(table, op, {key: str(value) for key, value in keys.items()})
+    db.info.setdefault("rbac_changes", []).append(change)
+    return change
+
+
+def publish(change: Change) -> None:
+    for subscriber in subscribers:
+        try:
+            subscriber(change)
+        except Exception:
+            logging.exception(f"failed to apply {change}")
+
+
+@event.listens_for(Session, "before_commit")
+def before_commit(session: Session) -> None:
+    # the change log and NOTIFY are transactional, other workers only hear
+    # about committed changes. One statement per commit however many rows
+    # changed
+    pending = session.info.get("rbac_changes")
+    if pending:
+        ids = session.execute(
+            RECORD,
+            {
+                "lock_key": CHANGE_LOG_LOCK,
+                "channel": CHANNEL,
+                "payloads": [change.to_json() for change in pending],
+            },
+        ).scalars()
+        session.info["rbac_changes"] = [
+            replace(change, id=id) for change, id in zip(pending, ids)
+        ]
+
+
+@event.listens_for(Session, "after_commit")
+def after_commit(session: Session) -> None:
+    # this worker applies its own changes right away instead of waiting for
+    # the notification to come back
+    for change in session.info.pop("rbac_changes", []):
+        publish(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def after_rollback(session: Session) -> None:
+    session.info.pop("rbac_changes", None)
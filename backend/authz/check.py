@@ -0,0 +1,12 @@
+from typing import Iterable
+
+
+def is_allowed(
+    granted: Iterable[str], required: Iterable[str], mode: str = "all"
+) -> bool:
+    granted = set(granted)
+    if mode == "all":
+        return all(permission in granted for permission in required)
+    if mode == "any":
+        return any(permission in granted for permission in required)
+    raise ValueError(f"unknown mode: {mode}")
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable
+from uuid import UUID
+
+from fastapi import Header, HTTPException
+import httpx
+
+from authz.check import is_allowed
+from authz.snapshot import loads_snapshot
+from utils import security
+from utils.exception import UvicornException
+
+
+class AuthzClient:
+    # decides access in the calling process: tokens are verified with the
+    # shared secret and permission ids resolved against a local copy of the
+    # permission names, bootstrapped from a snapshot and kept current from
+    # the change feed of this service
+    def __init__(
+        self,
+        base_url: str = "",
+        token: str | Callable[[], str] | None = None,
+        secret_key: str | None = None,
+        refresh_interval: float = 5.0,
+        http: Any = None,
+    ) -> None:
+        self.http = http or httpx.Client(base_url=base_url, timeout=30)
+        self.token = token
+        self.secret_key = secret_key
+        self.refresh_interval = refresh_interval
+        self.permission_names: dict[UUID, str] = {}
+        self.change_id: int | None = None
+        self.refreshed_at: float | None = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _get(self, path: str, **params: Any) -> Any:
+        token = self.token() if callable(self.token) else self.token
+        headers = {"authorization": f"Bearer {token}"} if token else {}
+        r = self.http.get(path, params=params, headers=headers)
+        r.raise_for_status()
+        return r
+
+    def load(self) -> None:
+        snapshot = loads_snapshot(self._get("/api/v1/snapshot", compress=True).content)
+        with self._lock:
+            self.permission_names = dict(snapshot.permissions())
+            self.change_id = snapshot.change_id
+            self.refreshed_at = time.monotonic()
+
+    def refresh(self) -> int:
+        # role and user changes do not matter here, tokens carry permission
+        # ids. The permission table is small, it is reloaded on any change
+        if self.change_id is None:
+            self.load()
+        applied = 0
+        while True:
+            feed = self._get("/api/v1/changes", after=self.change_id).json()
+            changes = feed["changes"]
+            if any(change["table_name"] == "permission" for change in changes):
+                permissions = self._get("/api/v1/rbac/permission").json()
+                with self._lock:
+                    self.permission_names = {
+                        UUID(permission["id"]): permission["name"]
+                        for permission in permissions
+                    }
+            self.change_id = feed["next"]
+            applied += len(changes)
+            if len(changes) < 1000:
+                break
+        self.refreshed_at = time.monotonic()
+        return applied
+
+    def start(self) -> None:
+        self.load()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="authz-client-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"authz client refresh failed: {e}")
+
+    def get_permission_names(self, permission_ids: Iterable[UUID]) -> list[str]:
+        names = self.permission_names
+        return [names[id] for id in permission_ids if id in names]
+
+    def check(self, token: str, permissions: Iterable[str], mode: str = "all") -> bool:
+        try:
+            payload = security.verify_jwt(token, secret_key=self.secret_key)
+        except UvicornException:
+            return False
+        granted = self.get_permission_names(UUID(id) for id in payload["permissions"])
+        return is_allowed(granted, permissions, mode)
+
+    def require(self, *permissions: str, mode: str = "all") -> Callable[..., None]:
+        def dependency(authorization: str | None = Header(default=None)) -> None:
+            if not authorization or not authorization.startswith("Bearer "):
+                raise HTTPException(status_code=401, detail="user is not authorized")
+            token = authorization.split("Bearer ")[1]
+            if not self.check(token, permissions, mode):
+                raise HTTPException(
+                    status_code=401, detail="user does not have permission"
+                )
+
+        return dependency
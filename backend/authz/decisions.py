@@ -0,0 +1,88 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from typing import Any, Hashable, Iterable
+
+from authz.catalog import catalog, PermissionCatalog
+from core.config import get_settings
+from utils.metrics import AUTH_DECISION_CACHE
+
+
+def fingerprint(token: str) -> bytes:
+    # the raw token is not kept in memory
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+class DecisionCache:
+    # allow and deny decisions for (token, permissions, mode), bounded LRU.
+    # The key includes the catalog version and snapshot generation, any rbac
+    # change makes every entry unreachable and the next fill drops them.
+    # Entries expire after ttl seconds and never outlive the token
+    def __init__(
+        self, catalog: PermissionCatalog, max_entries: int = 100_000, ttl: float = 60
+    ) -> None:
+        self.catalog = catalog
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[bool, float]] = OrderedDict()
+        self._version: Hashable = None
+        self._lock = threading.Lock()
+
+    def version(self) -> Hashable:
+        snapshot = self.catalog.snapshot()
+        return self.catalog.version, snapshot.generation if snapshot else None
+
+    def key(
+        self, token: str, permissions: Iterable[str], mode: str, version: Hashable
+    ) -> Hashable:
+        return fingerprint(token), tuple(sorted(set(permissions))), mode, version
+
+    def get(self, key: Hashable) -> bool | None:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                AUTH_DECISION_CACHE.labels("miss").inc()
+                return None
+            self.entries.move_to_end(key)
+        AUTH_DECISION_CACHE.labels("hit").inc()
+        return entry[0]
+
+    def set(self, key: Hashable, allowed: bool, payload: dict[str, Any]) -> None:
+        # without the change listener, changes made by other workers are
+        # never seen here
+        settings = get_settings()
+        if self.max_entries <= 0 or not (
+            settings.AUTHZ_CACHE or settings.AUTHZ_SNAPSHOT_PATH
+        ):
+            return
+        if not self.catalog.online():
+            return
+        ttl = min(self.ttl, payload.get("exp", float("inf")) - time.time())
+        if ttl <= 0:
+            return
+        version = key[-1]
+        with self._lock:
+            # a decision computed against an older version is not stored
+            if version != self.version():
+                return
+            if version != self._version:
+                self.entries.clear()
+                self._version = version
+            self.entries[key] = (allowed, time.monotonic() + ttl)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+
+
+decisions = DecisionCache(
+    catalog,
+    max_entries=get_settings().AUTHZ_DECISION_CACHE_SIZE,
+    ttl=get_settings().AUTHZ_DECISION_CACHE_TTL,
+)
@@ -0,0 +1,88 @@
+import logging
+import select
+import threading
+from typing import Callable
+
+from sqlalchemy.engine import Engine
+
+from authz.changes import CHANNEL, Change
+from db.pool import KEEPALIVES
+
+
+class ChangeListener:
+    # one LISTEN connection per worker, notifications sent while it was
+    # disconnected are lost so every (re)connect triggers a full resync and
+    # on_disconnect lets caches stop serving until then
+    def __init__(
+        self,
+        engine: Engine,
+        on_change: Callable[[Change], None],
+        on_resync: Callable[[], None],
+        on_disconnect: Callable[[], None] = lambda: None,
+        poll_interval: float = 1.0,
+        retry_interval: float = 1.0,
+    ) -> None:
+        self.engine = engine
+        self.on_change = on_change
+        self.on_resync = on_resync
+        self.on_disconnect = on_disconnect
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.connected = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._connection = None
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rbac-change-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logging.warning(f"rbac change listener disconnected: {e}")
+            finally:
+                if self.connected.is_set():
+                    self.connected.clear()
+                    self.on_disconnect()
+                self._close()
+            self._stopped.wait(self.retry_interval)
+
+    def _listen(self) -> None:
+        # a dedicated connection outside the pool, with keepalives so a
+        # half-open socket fails instead of waiting for notifications forever
+        cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+        dbapi_connection = self.engine.dialect.connect(
+            *cargs, **{**cparams, **KEEPALIVES}
+        )
+        self._connection = dbapi_connection
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        self.on_resync()
+        self.connected.set()
+        while not self._stopped.is_set():
+            if select.select([dbapi_connection], [], [], self.poll_interval)[0]:
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notify = dbapi_connection.notifies.pop(0)
+                    self.on_change(Change.from_json(notify.payload))
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
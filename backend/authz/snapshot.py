@@ -0,0 +1,485 @@
+from array import array
+from contextlib import contextmanager
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Any, Iterable, Iterator
+from uuid import UUID
+import zlib
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection, Engine
+
+from authz.changes import Change
+from models.rbac import (
+    ChangeLog,
+    Permission,
+    Role,
+    RoleHasPermission,
+    User,
+    UserHasRole,
+)
+
+# header, then 8 byte aligned sections:
+#   permission ids, name offsets, names, role ids, role name offsets, names,
+#   role -> permission offsets and targets, user ids, user -> role offsets and
+#   targets
+# ids are 16 byte uuids sorted bytewise, edges are uint32 indexes (CSR).
+# change_id is the last change log id the snapshot includes
+MAGIC = b"RBACSNAP"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sI5IQQQQd")
+# exports may wrap the whole file in a zlib stream
+COMPRESSED_MAGIC = b"RBACSNZ1"
+
+if sys.byteorder != "little":
+    raise ImportError("rbac snapshots are stored little endian")
+
+
+class SnapshotHeader:
+    def __init__(self, *fields: Any) -> None:
+        (
+            magic,
+            self.version,
+            self.permissions,
+            self.roles,
+            self.users,
+            self.role_permissions,
+            self.user_roles,
+            self.names_size,
+            self.role_names_size,
+            self.generation,
+            self.change_id,
+            self.built_at,
+        ) = fields
+        if magic != MAGIC:
+            raise ValueError("not an rbac snapshot")
+        if self.version != FORMAT_VERSION:
+            raise ValueError(f"unsupported rbac snapshot version {self.version}")
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+class SnapshotData:
+    # the graph as flat arrays, written as is and read back zero-copy
+    def __init__(self) -> None:
+        self.permission_ids = bytearray()
+        self.name_offsets = array("I", [0])
+        self.names = bytearray()
+        self.role_ids = bytearray()
+        self.role_name_offsets = array("I", [0])
+        self.role_names = bytearray()
+        self.role_offsets = array("I", [0])
+        self.role_targets = array("I")
+        self.user_ids = bytearray()
+        self.user_offsets = array("I", [0])
+        self.user_targets = array("I")
+        self.change_id = 0
+
+    def sections(self) -> list[bytes | bytearray | array]:
+        return [
+            self.permission_ids,
+            self.name_offsets,
+            self.names,
+            self.role_ids,
+            self.role_name_offsets,
+            self.role_names,
+            self.role_offsets,
+            self.role_targets,
+            self.user_ids,
+            self.user_offsets,
+            self.user_targets,
+        ]
+
+    def header(self, generation: int, built_at: float) -> bytes:
+        return HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            len(self.name_offsets) - 1,
+            len(self.role_offsets) - 1,
+            len(self.user_offsets) - 1,
+            len(self.role_targets),
+            len(self.user_targets),
+            len(self.names),
+            len(self.role_names),
+            generation,
+            self.change_id,
+            built_at,
+        )
+
+    def chunks(self, generation: int, built_at: float) -> Iterator[Any]:
+        header = self.header(generation, built_at)
+        yield header + _padding(len(header))
+        for section in self.sections():
+            yield section
+            yield _padding(len(section) * getattr(section, "itemsize", 1))
+
+
+def _stream(connection: Connection, statement: Any) -> Iterator[Any]:
+    return connection.execution_options(stream_results=True, yield_per=10_000).execute(
+        statement
+    )
+
+
+def latest_change_id(connection: Connection) -> int:
+    return connection.execute(select(func.coalesce(func.max(ChangeLog.id), 0))).scalar()
+
+
+def read_graph(connection: Connection) -> SnapshotData:
+    # user tables are streamed in id order and merged, only permissions and
+    # roles are held in dicts. Outside REPEATABLE READ rows committed while
+    # reading may be partly included, change_id is read first so replaying
+    # the change feed from it repairs them
+    data = SnapshotData()
+    data.change_id = latest_change_id(connection)
+    permission_index = {}
+    for i, (id, name) in enumerate(
+        connection.execute(
+            select(Permission.id, Permission.name).order_by(Permission.id)
+        )
+    ):
+        permission_index[id] = i
+        data.permission_ids += id.bytes
+        data.names += name.encode()
+        data.name_offsets.append(len(data.names))
+
+    role_index = {}
+    for i, (id, name) in enumerate(
+        connection.execute(select(Role.id, Role.name).order_by(Role.id))
+    ):
+        role_index[id] = i
+        data.role_ids += id.bytes
+        data.role_names += name.encode()
+        data.role_name_offsets.append(len(data.role_names))
+    role_targets: list[list[int]] = [[] for _ in role_index]
+    for role_id, permission_id in connection.execute(
+        select(RoleHasPermission.role_id, RoleHasPermission.permission_id)
+    ):
+        if role_id in role_index and permission_id in permission_index:
+            role_targets[role_index[role_id]].append(permission_index[permission_id])
+    for targets in role_targets:
+        data.role_targets.extend(sorted(targets))
+        data.role_offsets.append(len(data.role_targets))
+
+    edges = iter(
+        _stream(
+            connection,
+            select(UserHasRole.user_id, UserHasRole.role_id).order_by(
+                UserHasRole.user_id
+            ),
+        )
+    )
+    edge = next(edges, None)
+    for id in _stream(connection, select(User.id).order_by(User.id)).scalars():
+        data.user_ids += id.bytes
+        while edge is not None and edge[0] <= id:
+            if edge[0] == id and edge[1] in role_index:
+                data.user_targets.append(role_index[edge[1]])
+            edge = next(edges, None)
+        data.user_offsets.append(len(data.user_targets))
+    return data
+
+
+def _replace_file(path: str, chunks: Iterable[Any]) -> None:
+    # readers keep the inode they mapped, replacing the path is atomic
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.writelines(chunks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(
+    path: str, data: SnapshotData, generation: int, built_at: float
+) -> None:
+    _replace_file(path, data.chunks(generation, built_at))
+
+
+def dump_snapshot(
+    data: SnapshotData, generation: int, built_at: float, compress: bool = False
+) -> bytes:
+    raw = b"".join(bytes(chunk) for chunk in data.chunks(generation, built_at))
+    return export_snapshot(raw, compress)
+
+
+def export_snapshot(raw: Any, compress: bool = False) -> bytes:
+    if compress:
+        return COMPRESSED_MAGIC + zlib.compress(raw)
+    return bytes(raw)
+
+
+def _decompress(blob: bytes) -> bytes:
+    if blob[: len(COMPRESSED_MAGIC)] == COMPRESSED_MAGIC:
+        return zlib.decompress(memoryview(blob)[len(COMPRESSED_MAGIC) :])
+    return blob
+
+
+def loads_snapshot(blob: bytes) -> "Snapshot":
+    return Snapshot(_decompress(blob))
+
+
+@contextmanager
+def snapshot_lock(path: str) -> Iterator[None]:
+    # serializes everything that replaces the file at path
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def current_generation(path: str) -> int:
+    try:
+        return load_snapshot(path).generation
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def install_snapshot(
+    path: str, blob: bytes, change_id: int, checked_at: float
+) -> "Snapshot":
+    # validated before it replaces the file the workers map. A snapshot older
+    # than change_id, the latest change log id read after checked_at, would
+    # roll authorization back until the next rebuild. One that includes it is
+    # as current as a snapshot built at checked_at and is stamped so. It gets
+    # the next generation so nothing cached against the file it replaces
+    # stays valid
+    raw = _decompress(blob)
+    snapshot = Snapshot(raw)
+    if snapshot.change_id < change_id:
+        raise ValueError(
+            f"snapshot includes changes up to {snapshot.change_id}, "
+            f"the change log is at {change_id}"
+        )
+    with snapshot_lock(path):
+        fields = list(HEADER.unpack_from(raw))
+        fields[-3] = current_generation(path) + 1
+        fields[-1] = checked_at
+        _replace_file(path, [HEADER.pack(*fields), memoryview(raw)[HEADER.size :]])
+        return load_snapshot(path)
+
+
+class _Ids:
+    def __init__(self, view: memoryview) -> None:
+        self.view = view
+
+    def __len__(self) -> int:
+        return len(self.view) // 16
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.view[i * 16 : i * 16 + 16])
+
+    def index(self, id: UUID) -> int | None:
+        key = id.bytes
+        i = bisect.bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else None
+
+
+class Snapshot:
+    def __init__(self, buffer: Any) -> None:
+        self.buffer = buffer
+        view = memoryview(buffer)
+        self.header = SnapshotHeader(*HEADER.unpack_from(view))
+        header = self.header
+        offset = HEADER.size + len(_padding(HEADER.size))
+
+        def section(size: int, fmt: str | None = None) -> memoryview:
+            nonlocal offset
+            if offset + size > len(view):
+                raise ValueError("truncated rbac snapshot")
+            part = view[offset : offset + size]
+            offset += size + len(_padding(size))
+            return part.cast(fmt) if fmt else part
+
+        self.permission_ids = _Ids(section(header.permissions * 16))
+        self.name_offsets = section((header.permissions + 1) * 4, "I")
+        self.names = section(header.names_size)
+        self.role_ids = _Ids(section(header.roles * 16))
+        self.role_name_offsets = section((header.roles + 1) * 4, "I")
+        self.role_names = section(header.role_names_size)
+        self.role_offsets = section((header.roles + 1) * 4, "I")
+        self.role_targets = section(header.role_permissions * 4, "I")
+        self.user_ids = _Ids(section(header.users * 16))
+        self.user_offsets = section((header.users + 1) * 4, "I")
+        self.user_targets = section(header.user_roles * 4, "I")
+
+    @property
+    def generation(self) -> int:
+        return self.header.generation
+
+    @property
+    def built_at(self) -> float:
+        return self.header.built_at
+
+    @property
+    def change_id(self) -> int:
+        return self.header.change_id
+
+    def permission_name(self, i: int) -> str:
+        return str(self.names[self.name_offsets[i] : self.name_offsets[i + 1]], "utf-8")
+
+    def role_name(self, i: int) -> str:
+        return str(
+            self.role_names[self.role_name_offsets[i] : self.role_name_offsets[i + 1]],
+            "utf-8",
+        )
+
+    def permissions(self) -> Iterator[tuple[UUID, str]]:
+        for i in range(self.header.permissions):
+            yield UUID(bytes=self.permission_ids[i]), self.permission_name(i)
+
+    def get_permissions(self, permission_ids: Iterable[UUID]) -> dict[UUID, str]:
+        permissions = {}
+        for permission_id in permission_ids:
+            i = self.permission_ids.index(permission_id)
+            if i is not None:
+                permissions[permission_id] = self.permission_name(i)
+        return permissions
+
+    def get_user_roles(self, user_id: UUID) -> list[UUID]:
+        user = self.user_ids.index(user_id)
+        if user is None:
+            return []
+        return [
+            UUID(bytes=self.role_ids[self.user_targets[k]])
+            for k in range(self.user_offsets[user], self.user_offsets[user + 1])
+        ]
+
+    def get_user_permissions(self, user_id: UUID) -> dict[UUID, str]:
+        user = self.user_ids.index(user_id)
+        if user is None:
+            return {}
+        indexes = set()
+        for k in range(self.user_offsets[user], self.user_offsets[user + 1]):
+            role = self.user_targets[k]
+            indexes.update(
+                self.role_targets[self.role_offsets[role] : self.role_offsets[role + 1]]
+            )
+        return {
+            UUID(bytes=self.permission_ids[i]): self.permission_name(i)
+            for i in sorted(indexes)
+        }
+
+
+def load_snapshot(path: str) -> Snapshot:
+    with open(path, "rb") as f:
+        return Snapshot(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class SnapshotStore:
+    # each worker maps the current file, a replaced file is picked up on the
+    # next lookup after check_interval
+    def __init__(self, path: str, check_interval: float = 0.5) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot: Snapshot | None = None
+        self._inode: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Snapshot | None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            try:
+                inode = os.stat(self.path).st_ino
+                if inode != self._inode:
+                    self._snapshot = load_snapshot(self.path)
+                    self._inode = inode
+            except FileNotFoundError:
+                self._snapshot = self._inode = None
+            except Exception as e:
+                logging.warning(f"cannot load rbac snapshot {self.path}: {e}")
+        return self._snapshot
+
+
+class SnapshotPublisher:
+    # every worker hears every change, the file lock lets one of them rebuild
+    # and the others find a snapshot started after their change and skip
+    def __init__(self, engine: Engine, path: str, debounce: float = 0.05) -> None:
+        self.engine = engine
+        self.path = path
+        self.debounce = debounce
+        self._dirty_since: float | None = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def mark_dirty(self, change: Change | None = None) -> None:
+        if self._dirty_since is None:
+            self._dirty_since = time.time()
+        self._wakeup.set()
+
+    def mark_stale(self, change_id: int) -> None:
+        # a file that already includes change_id, built by another worker or
+        # imported, is not rebuilt at every boot or reconnect
+        try:
+            if load_snapshot(self.path).change_id >= change_id:
+                return
+        except (FileNotFoundError, ValueError):
+            pass
+        self.mark_dirty()
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rbac-snapshot-publisher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            with self.engine.connect() as connection:
+                self.mark_stale(latest_change_id(connection))
+        except Exception as e:
+            logging.warning(f"cannot check rbac snapshot {self.path}: {e}")
+            self.mark_dirty()
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            if self._stopped.wait(self.debounce):
+                return
+            self._wakeup.clear()
+            dirty_since, self._dirty_since = self._dirty_since, None
+            if dirty_since is None:
+                continue
+            try:
+                self.publish(dirty_since)
+            except Exception as e:
+                logging.warning(f"failed to publish rbac snapshot: {e}")
+                self.mark_dirty()
+                self._stopped.wait(1.0)
+
+    def publish(self, dirty_since: float) -> bool:
+        with snapshot_lock(self.path):
+            generation = 0
+            try:
+                current = load_snapshot(self.path)
+                if current.built_at > dirty_since:
+                    return False
+                generation = current.generation
+            except (FileNotFoundError, ValueError):
+                pass
+            built_at = time.time()
+            with self.engine.connect().execution_options(
+                isolation_level="REPEATABLE READ"
+            ) as connection:
+                with connection.begin():
+                    data = read_graph(connection)
+            write_snapshot(self.path, data, generation + 1, built_at)
+            return True
@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timezone
+import json
+import logging
+import platform
+import subprocess
+import time
+from typing import Any, Callable
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.deps import get_db, get_read_db
+from benchmarks.dataset import ADMIN_EMAIL, DATASETS, PASSWORD, seed
+from db.session import Base
+from core.config import get_settings
+from main import app
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='{"time": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}',
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def scenarios(token: str) -> dict[str, Callable[[httpx.AsyncClient], Any]]:
+    header = {"authorization": f"Bearer {token}"}
+    login_data = {"email": ADMIN_EMAIL, "password": PASSWORD}
+    return {
+        "login": lambda client: client.post("/api/v1/auth/login", json=login_data),
+        "auth": lambda client: client.post(
+            "/api/v1/auth",
+            json={"permissions": ["setting.read"], "token": token},
+        ),
+        "auth_denied": lambda client: client.post(
+            "/api/v1/auth",
+            json={"permissions": ["missing.permission"], "token": token},
+        ),
+        "list_permissions": lambda client: client.get(
+            "/api/v1/rbac/permission", headers=header
+        ),
+        "list_roles": lambda client: client.get("/api/v1/rbac/role", headers=header),
+        "list_users": lambda client: client.get("/api/v1/rbac/user", headers=header),
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    request: Callable[[httpx.AsyncClient], Any],
+    requests: int,
+    concurrency: int,
+) -> dict[str, Any]:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            r = await request(client)
+            latencies.append(time.perf_counter() - start)
+            if r.status_code >= 400 and r.status_code != 401:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) * 1000,
+            "p50": percentile(latencies, 50) * 1000,
+            "p90": percentile(latencies, 90) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": max(latencies) * 1000,
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        r = await client.post(
+            "/api/v1/auth/login", json={"email": ADMIN_EMAIL, "password": PASSWORD}
+        )
+        r.raise_for_status()
+        available = scenarios(r.json()["token"])
+        results = []
+        for name in args.scenarios or available:
+            logging.info(f"Running {name}")
+            # warm up caches and the connection pool before measuring
+            await run_scenario(client, available[name], args.warmup, 1)
+            result = await run_scenario(
+                client, available[name], args.requests, args.concurrency
+            )
+            results.append({"scenario": name, **result})
+        return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the RBAC API in-process")
+    parser.add_argument("--dataset", choices=DATASETS, default="small")
+    parser.add_argument(
+        "--database-url",
+        help="database to seed and benchmark against, defaults to the test database",
+    )
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--roles", type=int)
+    parser.add_argument("--permissions", type=int)
+    parser.add_argument("--permissions-per-role", type=int)
+    parser.add_argument("--roles-per-user", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument(
+        "--keep-data",
+        action="store_true",
+        help="keep the seeded tables to rerun with --skip-seed",
+    )
+    parser.add_argument("--scenarios", nargs="*")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    dataset = replace(
+        DATASETS[args.dataset],
+        **{
+            field: getattr(args, field)
+            for field in DATASETS[args.dataset].to_dict()
+            if getattr(args, field, None) is not None
+        },
+    )
+    engine = create_engine(args.database_url or get_settings().test_database_url)
+    if not args.skip_seed:
+        seed(engine, dataset)
+
+    SessionLocal = sessionmaker(bind=engine)
+
+    def override_get_db():
+        try:
+            db = SessionLocal()
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if not args.keep_data:
+            Base.metadata.drop_all(bind=engine)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "dataset": {"name": args.dataset, **dataset.to_dict()},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for result in results:
+        latency = result["latency_ms"]
+        logging.info(
+            f"{result['scenario']}: {result['throughput_rps']:.1f} req/s, "
+            f"p50 {latency['p50']:.2f} ms, p99 {latency['p99']:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import json
+import logging
+import timeit
+from typing import Any, Callable
+from uuid import uuid4
+
+from utils import security
+from utils.security import get_password_hash, verify_password
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='{"time": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}',
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+def measure(function: Callable[[], Any], min_time: float) -> dict[str, float]:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=3, number=number)) / number
+    return {"seconds": best, "ops_per_second": 1 / best}
+
+
+def bench_bcrypt(rounds: list[int], min_time: float) -> list[dict[str, Any]]:
+    results = []
+    for cost in rounds:
+        hashed_password = get_password_hash("benchmark", rounds=cost)
+        results.append(
+            {
+                "name": "bcrypt_hash",
+                "rounds": cost,
+                **measure(
+                    lambda: get_password_hash("benchmark", rounds=cost), min_time
+                ),
+            }
+        )
+        results.append(
+            {
+                "name": "bcrypt_verify",
+                "rounds": cost,
+                **measure(
+                    lambda: verify_password("benchmark", hashed_password), min_time
+                ),
+            }
+        )
+        logging.info(f"bcrypt rounds {cost}: {results[-1]['seconds'] * 1000:.2f} ms")
+    return results
+
+
+def bench_jwt(claim_sizes: list[int], min_time: float) -> list[dict[str, Any]]:
+    results = []
+    for size in claim_sizes:
+        permission_ids = [uuid4() for _ in range(size)]
+        token = security.generate_jwt(permission_ids, "benchmark@example.com")
+        results.append(
+            {
+                "name": "jwt_encode",
+                "permissions": size,
+                "token_bytes": len(token),
+                **measure(
+                    lambda: security.generate_jwt(
+                        permission_ids, "benchmark@example.com"
+                    ),
+                    min_time,
+                ),
+            }
+        )
+        results.append(
+            {
+                "name": "jwt_decode",
+                "permissions": size,
+                "token_bytes": len(token),
+                **measure(lambda: security.verify_jwt(token), min_time),
+            }
+        )
+        logging.info(
+            f"jwt {size} permissions: {results[-1]['seconds'] * 1_000_000:.1f} us"
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark password hashing and JWT")
+    parser.add_argument("--rounds", type=int, nargs="*", default=[4, 8, 10, 12, 14])
+    parser.add_argument(
+        "--claim-sizes", type=int, nargs="*", default=[0, 10, 100, 500, 1000]
+    )
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--output", default="benchmark_security.json")
+    args = parser.parse_args()
+
+    results = bench_bcrypt(args.rounds, args.min_time) + bench_jwt(
+        args.claim_sizes, args.min_time
+    )
+    with open(args.output, "w") as f:
+        json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import json
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    before = {result["scenario"]: result for result in baseline["results"]}
+
+    print(f"{'scenario':<20}{'req/s':>28}{'p50 ms':>28}{'p99 ms':>28}")
+    for result in candidate["results"]:
+        old = before.get(result["scenario"])
+        if not old:
+            continue
+        columns = []
+        for new_value, old_value in [
+            (result["throughput_rps"], old["throughput_rps"]),
+            (result["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+            (result["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+        ]:
+            change = (new_value - old_value) / old_value * 100 if old_value else 0
+            columns.append(f"{old_value:.2f} -> {new_value:.2f} ({change:+.0f}%)")
+        print(f"{result['scenario']:<20}" + "".join(f"{c:>28}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
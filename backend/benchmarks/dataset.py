@@ -0,0 +1,87 @@
+import logging
+
+from sqlalchemy.engine import Engine
+
+from db.session import Base
+from db.synthetic import GraphSpec, load
+from models.rbac import Permission, Role, RoleHasPermission, User, UserHasRole
+from utils.security import get_password_hash
+from utils.uuid7 import uuid7
+
+ADMIN_EMAIL = "bench.admin@example.com"
+PASSWORD = "benchmark"
+ADMIN_PERMISSIONS = [
+    "setting.create",
+    "setting.read",
+    "setting.update",
+    "setting.delete",
+]
+
+DATASETS = {
+    "small": GraphSpec(
+        users=1_000,
+        roles=20,
+        permissions=100,
+        permissions_per_role=10,
+        roles_per_user=2,
+    ),
+    "medium": GraphSpec(
+        users=100_000,
+        roles=200,
+        permissions=1_000,
+        permissions_per_role=100,
+        roles_per_user=3,
+    ),
+    "large": GraphSpec(
+        users=1_000_000,
+        roles=1_000,
+        permissions=5_000,
+        permissions_per_role=500,
+        roles_per_user=3,
+    ),
+}
+
+
+def seed(engine: Engine, dataset: GraphSpec) -> None:
+    # drops and recreates every table, only point this at a throwaway database
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    dataset.passwords = [PASSWORD]
+    logging.info(f"Seeding {dataset.users} users")
+    load(engine, dataset, truncate=True)
+
+    admin_id = uuid7()
+    admin_role_id = uuid7()
+    admin_permission_ids = [uuid7() for _ in ADMIN_PERMISSIONS]
+    with engine.begin() as connection:
+        connection.execute(
+            Permission.__table__.insert(),
+            [
+                {"id": id, "name": name}
+                for id, name in zip(admin_permission_ids, ADMIN_PERMISSIONS)
+            ],
+        )
+        connection.execute(
+            Role.__table__.insert(), [{"id": admin_role_id, "name": "admin"}]
+        )
+        connection.execute(
+            RoleHasPermission.__table__.insert(),
+            [
+                {"role_id": admin_role_id, "permission_id": permission_id}
+                for permission_id in admin_permission_ids
+            ],
+        )
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {
+                    "id": admin_id,
+                    "email": ADMIN_EMAIL,
+                    "hashed_password": get_password_hash(PASSWORD),
+                }
+            ],
+        )
+        connection.execute(
+            UserHasRole.__table__.insert(),
+            [{"user_id": admin_id, "role_id": admin_role_id}],
+        )
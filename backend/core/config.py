@@ -0,0 +1,102 @@
+from functools import lru_cache
+from typing import Any
+
+from dotenv import load_dotenv
+from pydantic import BaseSettings, validator
+from pydantic.fields import ModelField
+
+load_dotenv()
+
+
+class Settings(BaseSettings):
+    ENV: str | None = None
+    PORT: int = 8000
+    SECRET_KEY: str | None = None
+    BCRYPT_ROUNDS: int = 12
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    REFRESH_TOKEN_REUSE_DETECTION_HOURS: int = 24
+
+    PROFILE_TOKEN: str | None = None
+    PROFILE_SAMPLE_RATE: float = 0
+    PROFILE_DIR: str = "profiles"
+
+    SLOW_QUERY_THRESHOLD_MS: float | None = None
+    SLOW_QUERY_EXPLAIN: bool = False
+
+    TRACE_EXPORTER: str | None = None
+    TRACE_FILE: str = "traces.jsonl"
+
+    ADMISSION_MAX_LOOP_LAG_MS: float | None = None
+    ADMISSION_MAX_IN_FLIGHT: int | None = None
+    ADMISSION_RETRY_AFTER: int = 1
+
+    AUTHZ_CACHE: bool = True
+    AUTHZ_CACHE_MAX_USERS: int = 100_000
+    AUTHZ_CACHE_TTL: float = 300
+    AUTHZ_SNAPSHOT_PATH: str | None = None
+    AUTHZ_DECISION_CACHE_SIZE: int = 100_000
+    AUTHZ_DECISION_CACHE_TTL: float = 60
+
+    CHANGES_POLL_INTERVAL: float = 1
+    CHANGES_STREAM_TIMEOUT: float = 300
+    CHANGE_LOG_RETENTION_DAYS: int = 30
+
+    POSTGRES_USER: str | None = None
+    POSTGRES_PASSWORD: str | None = None
+    POSTGRES_DB: str | None = None
+    POSTGRES_HOST: str = "localhost"
+    POSTGRES_PORT: int = 5432
+    POSTGRES_TEST_DB: str | None = None
+    POSTGRES_TEST_PORT: int | None = None
+
+    POSTGRES_REPLICA_HOSTS: str = ""
+    POSTGRES_REPLICA_MAX_LAG: float = 5
+    POSTGRES_REPLICA_LAG_CHECK_INTERVAL: float = 1
+
+    POSTGRES_POOL_SIZE: int = 5
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: int = 30
+    POSTGRES_POOL_RECYCLE: int | None = None
+    POSTGRES_POOL_LIVENESS: str = "pre_ping"
+    POSTGRES_PGBOUNCER: bool = False
+
+    class Config:
+        case_sensitive = True
+
+    @validator("*", pre=True)
+    def empty_to_default(cls, v: Any, field: ModelField) -> Any:
+        # .env.example leaves optional settings blank
+        return field.default if v == "" else v
+
+    @validator("BCRYPT_ROUNDS")
+    def check_bcrypt_rounds(cls, v: int) -> int:
+        if not 4 <= v <= 31:
+            raise ValueError("BCRYPT_ROUNDS must be between 4 and 31")
+        return v
+
+    @validator("POSTGRES_POOL_LIVENESS")
+    def check_liveness(cls, v: str) -> str:
+        if v not in ("pre_ping", "recycle"):
+            raise ValueError(f"unknown POSTGRES_POOL_LIVENESS: {v}")
+        return v
+
+    def database_url(self, host: str | None = None, db: str | None = None) -> str:
+        host = host or f"{self.POSTGRES_HOST}:{self.POSTGRES_PORT}"
+        return f"postgresql+psycopg2://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{host}/{db or self.POSTGRES_DB}"
+
+    @property
+    def test_database_url(self) -> str:
+        return self.database_url(
+            host=f"{self.POSTGRES_HOST}:{self.POSTGRES_TEST_PORT or self.POSTGRES_PORT}",
+            db=self.POSTGRES_TEST_DB,
+        )
+
+    @property
+    def replica_hosts(self) -> list[str]:
+        return [host for host in self.POSTGRES_REPLICA_HOSTS.split(",") if host]
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
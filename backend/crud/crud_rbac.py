@@ -1,16 +1,79 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any
 from uuid import UUID
 
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from models.rbac import Permission, Role, RoleHasPermission, User, UserHasRole
+from authz.changes import record_change
+from core.config import get_settings
+from models.rbac import (
+    ApiKey,
+    ChangeLog,
+    ChangeLogPurge,
+    Permission,
+    RefreshToken,
+    Role,
+    RoleHasPermission,
+    User,
+    UserHasRole,
+)
 from schemas.rbac import UserCreate
-from utils.security import get_password_hash, verify_password
+from utils.security import (
+    generate_api_key,
+    generate_refresh_token,
+    get_password_hash,
+    keyed_hash,
+    verify_password,
+)
+from utils.tracing import traced_methods
+from utils.uuid7 import uuid7
+
+
+@traced_methods
+class CRUDRbac:
+    def _insert_returning(
+        self, db: Session, model: Any, values: list[dict[str, Any]]
+    ) -> list[Any]:
+        # single round trip INSERT ... ON CONFLICT DO NOTHING RETURNING,
+        # rows that hit a unique constraint are left out of the result
+        stmt = (
+            insert(model)
+            .values(values)
+            .on_conflict_do_nothing()
+            .returning(*model.__table__.c)
+        )
+        db_objs = db.execute(select(model).from_statement(stmt)).scalars().all()
+        for db_obj in db_objs:
+            self._record_change(db, db_obj, "create")
+        db.commit()
+        return db_objs
 
+    def _update(self, db: Session, db_obj: Any, **values: Any) -> Any | None:
+        try:
+            with db.begin_nested():
+                for key, value in values.items():
+                    setattr(db_obj, key, value)
+        except IntegrityError:
+            return None
+        self._record_change(db, db_obj, "update")
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def _record_change(self, db: Session, db_obj: Any, op: str) -> None:
+        # sent in the same transaction as the change itself
+        table = db_obj.__table__
+        keys = {
+            column.name: getattr(db_obj, column.key) for column in table.primary_key
+        }
+        record_change(db, table.name, op, **keys)
 
-class CRUDRbac:
     def authenticate(self, db: Session, obj_in: UserCreate) -> User | None:
         user = self.get_user_by_email(db, email=obj_in.email)
-        if not user:
+        if not user or user.hashed_password is None:
             return None
         if not verify_password(
             password=obj_in.password, hashed_password=user.hashed_password
@@ -22,14 +85,43 @@ class CRUDRbac:
     def get_user_by_email(self, db: Session, email: str) -> User | None:
         return db.query(User).filter(User.email == email).first()
 
-    def create_user(self, db: Session, obj_in: UserCreate) -> User:
-        db_obj = User(
-            email=obj_in.email, hashed_password=get_password_hash(obj_in.password)
+    def create_user(self, db: Session, obj_in: UserCreate) -> User | None:
+        # a duplicate costs an indexed lookup instead of a bcrypt hash, the
+        # insert still skips one created concurrently
+        if self.get_user_by_email(db, email=obj_in.email):
+            return None
+        db_objs = self._insert_returning(
+            db,
+            User,
+            [
+                {
+                    "email": obj_in.email,
+                    "hashed_password": get_password_hash(obj_in.password),
+                }
+            ],
+        )
+        return db_objs[0] if db_objs else None
+
+    def create_service_account(self, db: Session, email: str) -> User | None:
+        db_objs = self._insert_returning(
+            db, User, [{"email": email, "is_service_account": True}]
+        )
+        return db_objs[0] if db_objs else None
+
+    def rehash_password(self, db: Session, user: User, password: str) -> bool:
+        # only replaces the hash that was verified, a concurrent password
+        # change wins
+        updated = (
+            db.query(User)
+            .filter(User.id == user.id)
+            .filter(User.hashed_password == user.hashed_password)
+            .update(
+                {User.hashed_password: get_password_hash(password)},
+                synchronize_session=False,
+            )
         )
-        db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        return bool(updated)
 
     def get_users(self, db: Session) -> list[User]:
         return db.query(User).all()
@@ -37,29 +129,25 @@ class CRUDRbac:
     def get_user_by_id(self, db: Session, user_id: UUID) -> User | None:
         return db.query(User).filter(User.id == user_id).first()
 
-    def update_user(self, db: Session, user: User, new_email: str) -> User:
-        user.email = new_email
-        db.commit()
-        db.refresh(user)
-        return user
+    def update_user(self, db: Session, user: User, new_email: str) -> User | None:
+        return self._update(db, user, email=new_email)
 
     def delete_user(self, db: Session, user: User) -> None:
-        user_has_roles = self.get_all_user_has_role_by_user_id(db, user_id=user.id)
-        for user_has_role in user_has_roles:
-            self.delete_user_has_role(db, user_has_role)
+        db.query(UserHasRole).filter(UserHasRole.user_id == user.id).delete(
+            synchronize_session=False
+        )
+        record_change(db, "user_has_role", "delete", user_id=user.id)
+        self._record_change(db, user, "delete")
         db.delete(user)
         db.commit()
 
     # Role
-    def get_role_by_name(self, db: Session, name: str) -> Role:
+    def get_role_by_name(self, db: Session, name: str) -> Role | None:
         return db.query(Role).filter(Role.name == name).first()
 
-    def create_role(self, db: Session, role_name: str) -> Role:
-        db_obj = Role(name=role_name)
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+    def create_role(self, db: Session, role_name: str) -> Role | None:
+        db_objs = self._insert_returning(db, Role, [{"name": role_name}])
+        return db_objs[0] if db_objs else None
 
     def get_roles(self, db: Session) -> list[Role]:
         return db.query(Role).all()
@@ -67,23 +155,19 @@ class CRUDRbac:
     def get_role_by_id(self, db: Session, role_id: UUID) -> Role | None:
         return db.query(Role).filter(Role.id == role_id).first()
 
-    def update_role(self, db: Session, role: Role, new_role_name: str) -> Role:
-        role.name = new_role_name
-        db.commit()
-        db.refresh(role)
-        return role
+    def update_role(self, db: Session, role: Role, new_role_name: str) -> Role | None:
+        return self._update(db, role, name=new_role_name)
 
     def delete_role(self, db: Session, role: Role) -> None:
-        user_has_roles = self.get_all_user_has_role_by_role_id(db, role_id=role.id)
-        for user_has_role in user_has_roles:
-            self.delete_user_has_role(db, user_has_role)
-
-        role_has_permissions = self.get_all_role_has_permission_by_role_id(
-            db, role_id=role.id
+        db.query(UserHasRole).filter(UserHasRole.role_id == role.id).delete(
+            synchronize_session=False
         )
-        for role_has_permission in role_has_permissions:
-            self.delete_role_has_permission(db, role_has_permission)
-
+        db.query(RoleHasPermission).filter(RoleHasPermission.role_id == role.id).delete(
+            synchronize_session=False
+        )
+        record_change(db, "user_has_role", "delete", role_id=role.id)
+        record_change(db, "role_has_permission", "delete", role_id=role.id)
+        self._record_change(db, role, "delete")
         db.delete(role)
         db.commit()
 
@@ -116,6 +200,27 @@ class CRUDRbac:
         )
         return [permission_id[0] for permission_id in permission_ids]
 
+    def get_permission_ids_by_role_ids(
+        self, db: Session, role_ids: list[UUID]
+    ) -> list[tuple[UUID, UUID]]:
+        if not role_ids:
+            return []
+        return (
+            db.query(RoleHasPermission.role_id, RoleHasPermission.permission_id)
+            .filter(RoleHasPermission.role_id.in_(role_ids))
+            .all()
+        )
+
+    def get_permissions_by_role_id(
+        self, db: Session, role_id: UUID
+    ) -> list[Permission]:
+        return (
+            db.query(Permission)
+            .join(RoleHasPermission, RoleHasPermission.permission_id == Permission.id)
+            .filter(RoleHasPermission.role_id == role_id)
+            .all()
+        )
+
     def get_role_has_permission_by_role_id_and_permission_id(
         self, db: Session, role_id: UUID, permission_id: UUID
     ) -> RoleHasPermission | None:
@@ -129,18 +234,21 @@ class CRUDRbac:
     def create_role_has_permission(
         self, db: Session, role_id: UUID, permission_ids: list[UUID]
     ) -> list[RoleHasPermission]:
-        db_objs = [
-            RoleHasPermission(role_id=role_id, permission_id=permission_id)
-            for permission_id in permission_ids
-        ]
-        db.add_all(db_objs)
-        db.commit()
-        return db_objs
+        return self._insert_returning(
+            db,
+            RoleHasPermission,
+            [
+                {"role_id": role_id, "permission_id": permission_id}
+                for permission_id in permission_ids
+            ],
+        )
 
     def update_role_has_permission(
         self, db: Session, role_has_permission: RoleHasPermission, new_permission: UUID
     ) -> RoleHasPermission:
+        self._record_change(db, role_has_permission, "delete")
         role_has_permission.permission_id = new_permission
+        self._record_change(db, role_has_permission, "create")
         db.commit()
         db.refresh(role_has_permission)
         return role_has_permission
@@ -148,6 +256,7 @@ class CRUDRbac:
     def delete_role_has_permission(
         self, db: Session, role_has_permission: RoleHasPermission
     ) -> None:
+        self._record_change(db, role_has_permission, "delete")
         db.delete(role_has_permission)
         db.commit()
 
@@ -158,6 +267,14 @@ class CRUDRbac:
         )
         return [role_id[0] for role_id in role_ids]
 
+    def get_roles_by_user_id(self, db: Session, user_id: UUID) -> list[Role]:
+        return (
+            db.query(Role)
+            .join(UserHasRole, UserHasRole.role_id == Role.id)
+            .filter(UserHasRole.user_id == user_id)
+            .all()
+        )
+
     def get_all_user_has_role_by_user_id(
         self, db: Session, user_id: UUID
     ) -> list[UserHasRole]:
@@ -180,22 +297,24 @@ class CRUDRbac:
 
     def create_user_has_role(
         self, db: Session, user_id: UUID, role_id: UUID
-    ) -> UserHasRole:
-        db_obj = UserHasRole(user_id=user_id, role_id=role_id)
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+    ) -> UserHasRole | None:
+        db_objs = self._insert_returning(
+            db, UserHasRole, [{"user_id": user_id, "role_id": role_id}]
+        )
+        return db_objs[0] if db_objs else None
 
     def update_user_has_role(
         self, db: Session, user_has_role: UserHasRole, new_role: UUID
     ) -> UserHasRole:
+        self._record_change(db, user_has_role, "delete")
         user_has_role.role_id = new_role
+        self._record_change(db, user_has_role, "create")
         db.commit()
         db.refresh(user_has_role)
         return user_has_role
 
     def delete_user_has_role(self, db: Session, user_has_role: UserHasRole) -> None:
+        self._record_change(db, user_has_role, "delete")
         db.delete(user_has_role)
         db.commit()
 
@@ -205,6 +324,35 @@ class CRUDRbac:
             db.query(Permission.name).filter(Permission.id == permission_id).first()[0]
         )
 
+    def get_permission_names_by_ids(
+        self, db: Session, permission_ids: list[UUID]
+    ) -> list[str]:
+        if not permission_ids:
+            return []
+        permission_names = (
+            db.query(Permission.name).filter(Permission.id.in_(permission_ids)).all()
+        )
+        return [permission_name[0] for permission_name in permission_names]
+
+    def get_permissions_by_ids(
+        self, db: Session, permission_ids: list[UUID]
+    ) -> list[Permission]:
+        if not permission_ids:
+            return []
+        return db.query(Permission).filter(Permission.id.in_(permission_ids)).all()
+
+    def get_permissions_by_user_id(
+        self, db: Session, user_id: UUID
+    ) -> list[Permission]:
+        return (
+            db.query(Permission)
+            .join(RoleHasPermission, RoleHasPermission.permission_id == Permission.id)
+            .join(UserHasRole, UserHasRole.role_id == RoleHasPermission.role_id)
+            .filter(UserHasRole.user_id == user_id)
+            .distinct()
+            .all()
+        )
+
     def get_permission_by_id(
         self, db: Session, permission_id: UUID
     ) -> Permission | None:
@@ -219,29 +367,181 @@ class CRUDRbac:
     def create_permissions(
         self, db: Session, permissions: list[str]
     ) -> list[Permission]:
-        db_objs = [Permission(name=permission) for permission in permissions]
-        db.add_all(db_objs)
-        db.commit()
-        for db_obj in db_objs:
-            db.refresh(db_obj)
-        return db_objs
+        return self._insert_returning(
+            db, Permission, [{"name": permission} for permission in permissions]
+        )
 
     def update_permission(
         self, db: Session, permission: Permission, new_permission_name: str
-    ) -> Permission:
-        permission.name = new_permission_name
-        db.commit()
-        db.refresh(permission)
-        return permission
+    ) -> Permission | None:
+        return self._update(db, permission, name=new_permission_name)
 
     def delete_permission(self, db: Session, permission: Permission) -> None:
-        role_has_permissions = self.get_all_by_permission_id(
-            db, permission_id=permission.id
-        )
-        for role_has_permission in role_has_permissions:
-            self.delete_role_has_permission(db, role_has_permission)
+        db.query(RoleHasPermission).filter(
+            RoleHasPermission.permission_id == permission.id
+        ).delete(synchronize_session=False)
+        record_change(db, "role_has_permission", "delete", permission_id=permission.id)
+        self._record_change(db, permission, "delete")
         db.delete(permission)
         db.commit()
 
+    # ChangeLog
+    def get_changes(self, db: Session, after: int, limit: int) -> list[ChangeLog]:
+        return (
+            db.query(ChangeLog)
+            .filter(ChangeLog.id > after)
+            .order_by(ChangeLog.id)
+            .limit(limit)
+            .all()
+        )
+
+    def get_change_horizon(self, db: Session) -> int:
+        # the last purged change log id, 0 if nothing has been purged
+        return db.query(func.coalesce(func.max(ChangeLogPurge.last_id), 0)).scalar()
+
+    def purge_changes(self, db: Session) -> int:
+        # the newest row is always kept, so a client whose cursor is behind
+        # the horizon always gets a page starting after it
+        retention = timedelta(days=get_settings().CHANGE_LOG_RETENTION_DAYS)
+        newest = db.query(func.max(ChangeLog.id)).scalar_subquery()
+        last_id = (
+            db.query(func.max(ChangeLog.id))
+            .filter(ChangeLog.created_at < func.now() - retention)
+            .filter(ChangeLog.id < newest)
+            .scalar()
+        )
+        if last_id is None:
+            return 0
+        count = (
+            db.query(ChangeLog)
+            .filter(ChangeLog.id <= last_id)
+            .delete(synchronize_session=False)
+        )
+        db.add(ChangeLogPurge(last_id=last_id))
+        db.commit()
+        return count
+
+    # RefreshToken
+    def create_refresh_token(
+        self, db: Session, user_id: UUID, family_id: UUID | None = None
+    ) -> str:
+        # only the hash is stored, the token itself is returned once
+        token = generate_refresh_token()
+        expires_at = datetime.now(tz=timezone.utc) + timedelta(
+            days=get_settings().REFRESH_TOKEN_EXPIRE_DAYS
+        )
+        db_obj = RefreshToken(
+            token_hash=keyed_hash(token),
+            user_id=user_id,
+            family_id=family_id or uuid7(),
+            expires_at=expires_at,
+        )
+        db.add(db_obj)
+        db.commit()
+        return token
+
+    def rotate_refresh_token(
+        self, db: Session, token: str
+    ) -> tuple[UUID, str, str] | None:
+        # revokes the presented token and returns its user with a new token of
+        # the same family, the revoke is a single conditional UPDATE on the
+        # unique hash so a token can only be rotated once
+        token_hash = keyed_hash(token)
+        row = db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.token_hash == token_hash)
+            .where(RefreshToken.revoked_at.is_(None))
+            .where(RefreshToken.expires_at > func.now())
+            .where(RefreshToken.user_id == User.id)
+            .values(revoked_at=func.now())
+            .returning(RefreshToken.user_id, RefreshToken.family_id, User.email)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            # a revoked token presented again was replayed or stolen, every
+            # token issued from the same login is revoked
+            family_id = (
+                db.query(RefreshToken.family_id)
+                .filter(RefreshToken.token_hash == token_hash)
+                .filter(RefreshToken.revoked_at.isnot(None))
+                .scalar()
+            )
+            if family_id:
+                self._revoke_refresh_token_family(db, family_id=family_id)
+            return None
+        user_id, family_id, email = row
+        return user_id, email, self.create_refresh_token(db, user_id, family_id)
+
+    def revoke_refresh_token(self, db: Session, token: str) -> None:
+        family_id = (
+            db.query(RefreshToken.family_id)
+            .filter(RefreshToken.token_hash == keyed_hash(token))
+            .scalar()
+        )
+        if family_id:
+            self._revoke_refresh_token_family(db, family_id=family_id)
+
+    def purge_refresh_tokens(self, db: Session) -> int:
+        # every rotation leaves a revoked row behind. Expired tokens are
+        # rejected anyway, revoked ones are only kept to detect their reuse for
+        # REFRESH_TOKEN_REUSE_DETECTION_HOURS
+        retention = timedelta(hours=get_settings().REFRESH_TOKEN_REUSE_DETECTION_HOURS)
+        count = (
+            db.query(RefreshToken)
+            .filter(
+                or_(
+                    RefreshToken.expires_at <= func.now(),
+                    RefreshToken.revoked_at < func.now() - retention,
+                )
+            )
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return count
+
+    def _revoke_refresh_token_family(self, db: Session, family_id: UUID) -> None:
+        db.query(RefreshToken).filter(RefreshToken.family_id == family_id).filter(
+            RefreshToken.revoked_at.is_(None)
+        ).update({RefreshToken.revoked_at: func.now()}, synchronize_session=False)
+        db.commit()
+
+    # ApiKey
+    def create_api_key(
+        self,
+        db: Session,
+        user_id: UUID,
+        name: str,
+        expires_at: datetime | None = None,
+    ) -> tuple[ApiKey, str]:
+        # only the prefix and the keyed hash are stored, the key itself is
+        # returned once
+        prefix, key = generate_api_key()
+        db_obj = ApiKey(
+            prefix=prefix,
+            key_hash=keyed_hash(key),
+            name=name,
+            user_id=user_id,
+            expires_at=expires_at,
+        )
+        db.add(db_obj)
+        db.flush()
+        self._record_change(db, db_obj, "create")
+        db.commit()
+        return db_obj, key
+
+    def get_api_key_by_prefix(self, db: Session, prefix: str) -> ApiKey | None:
+        return db.query(ApiKey).filter(ApiKey.prefix == prefix).first()
+
+    def get_api_key_by_id(self, db: Session, api_key_id: UUID) -> ApiKey | None:
+        return db.query(ApiKey).filter(ApiKey.id == api_key_id).first()
+
+    def get_api_keys_by_user_id(self, db: Session, user_id: UUID) -> list[ApiKey]:
+        return (
+            db.query(ApiKey).filter(ApiKey.user_id == user_id).order_by(ApiKey.id).all()
+        )
+
+    def revoke_api_key(self, db: Session, api_key: ApiKey) -> ApiKey | None:
+        return self._update(db, api_key, revoked_at=func.now())
+
 
 rbac = CRUDRbac()
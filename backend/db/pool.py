@@ -0,0 +1,123 @@
+import bisect
+import itertools
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from core.config import Settings
+
+# libpq TCP keepalives, a dead peer is detected after about a minute
+KEEPALIVES = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, wait)] += 1
+
+    def wait_histogram(self) -> list[tuple[str, int]]:
+        with self._lock:
+            counts = list(itertools.accumulate(self.wait_buckets))
+        bounds = [str(bound) for bound in WAIT_BUCKETS] + ["+Inf"]
+        return list(zip(bounds, counts))
+
+
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "TimedQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - start)
+        return connection
+
+
+def engine_options(settings: Settings) -> dict[str, Any]:
+    # POSTGRES_POOL_LIVENESS:
+    #   pre_ping - SELECT 1 on every checkout (one extra round trip per request)
+    #   recycle  - no checkout round trip, connections are recycled by age,
+    #              dead sockets are caught by TCP keepalives and the whole pool
+    #              is invalidated on the first disconnect error
+    if settings.POSTGRES_PGBOUNCER:
+        # PgBouncer in transaction mode does the pooling, keep no idle
+        # connections and no session state on our side
+        return {"poolclass": NullPool, "pool_pre_ping": False}
+
+    recycle = settings.POSTGRES_POOL_LIVENESS == "recycle"
+    pool_recycle = settings.POSTGRES_POOL_RECYCLE
+    if pool_recycle is None:
+        pool_recycle = 1800 if recycle else -1
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.POSTGRES_POOL_SIZE,
+        "max_overflow": settings.POSTGRES_MAX_OVERFLOW,
+        "pool_timeout": settings.POSTGRES_POOL_TIMEOUT,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": not recycle,
+    }
+    if recycle:
+        options["pool_use_lifo"] = True
+        options["connect_args"] = dict(KEEPALIVES)
+    return options
+
+
+def instrument(engine: Engine) -> Engine:
+    @event.listens_for(engine, "checkout")
+    def discard_closed(dbapi_connection, connection_record, connection_proxy):
+        # psycopg2 flags connections whose socket already failed, replacing
+        # them here costs no round trip
+        if dbapi_connection.closed:
+            raise exc.DisconnectionError()
+
+    return engine
+
+
+def pool_status(engine: Engine) -> dict[str, Any]:
+    pool = engine.pool
+    if not isinstance(pool, TimedQueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": pool.metrics.checkouts,
+        "timeouts": pool.metrics.timeouts,
+        "wait_seconds_total": pool.metrics.wait_seconds_total,
+        "wait_buckets": pool.metrics.wait_histogram(),
+    }
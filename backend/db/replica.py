@@ -0,0 +1,70 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+# replay timestamp only moves when the primary commits, so a caught up but idle
+# replica is reported as lag 0 instead of the time since the last commit
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        engines: list[Engine],
+        fallback: Callable[[], Session],
+        max_lag: float = 5.0,
+        check_interval: float = 1.0,
+    ) -> None:
+        self.engines = engines
+        self.fallback = fallback
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._sessionmakers = {
+            engine: sessionmaker(
+                bind=engine, expire_on_commit=False, info={"replica": True}
+            )
+            for engine in engines
+        }
+        self._lags: dict[Engine, tuple[float, float | None]] = {}
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(engines)
+
+    def __call__(self) -> Session:
+        for _ in range(len(self.engines)):
+            with self._lock:
+                engine = next(self._cycle)
+            if self.is_healthy(engine):
+                return self._sessionmakers[engine]()
+        return self.fallback()
+
+    def is_healthy(self, engine: Engine) -> bool:
+        lag = self.get_lag(engine)
+        return lag is not None and lag <= self.max_lag
+
+    def get_lag(self, engine: Engine) -> float | None:
+        now = time.monotonic()
+        checked_at, lag = self._lags.get(engine, (0.0, None))
+        if engine in self._lags and now - checked_at < self.check_interval:
+            return lag
+        try:
+            with engine.connect() as connection:
+                lag = float(connection.execute(LAG_QUERY).scalar() or 0)
+        except Exception as e:
+            logging.warning(f"replica {engine.url.host} is unavailable: {e}")
+            lag = None
+        self._lags[engine] = (now, lag)
+        return lag
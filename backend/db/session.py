@@ -1,21 +1,103 @@
-import os
+from functools import lru_cache
+from typing import Any, Callable
 
-from dotenv import load_dotenv
-
-load_dotenv()
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.config import get_settings
+from db.pool import engine_options, instrument
+from db.replica import ReplicaRouter
 
 Base = declarative_base()
-engine = create_engine(
-    f"postgresql+psycopg2://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}",
-    pool_pre_ping=True,
-)
-SessionLocal = sessionmaker(bind=engine)
-
-test_engine = create_engine(
-    f"postgresql+psycopg2://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_TEST_PORT')}/{os.getenv('POSTGRES_TEST_DB')}",
-    pool_pre_ping=True,
-)
-TestSessionLocal = sessionmaker(bind=test_engine)
+
+
+class LazySessionmaker:
+    # engines are only built when the first session is requested, so importing
+    # this module (seed scripts, alembic, tests) opens no connection pools
+    def __init__(self, factory: Callable[[], Callable[..., Session]]) -> None:
+        self.factory = factory
+
+    def __call__(self, **kwargs: Any) -> Session:
+        return self.factory()(**kwargs)
+
+
+@lru_cache()
+def get_engine() -> Engine:
+    settings = get_settings()
+    return instrument(
+        create_engine(settings.database_url(), **engine_options(settings))
+    )
+
+
+@lru_cache()
+def get_sessionmaker() -> sessionmaker:
+    # objects returned by an endpoint are serialized after its session is
+    # closed, they have to stay loaded across the commit
+    return sessionmaker(bind=get_engine(), expire_on_commit=False)
+
+
+@lru_cache()
+def get_replica_router() -> ReplicaRouter:
+    settings = get_settings()
+    engines = [
+        instrument(
+            create_engine(settings.database_url(host=host), **engine_options(settings))
+        )
+        for host in settings.replica_hosts
+    ]
+    return ReplicaRouter(
+        engines,
+        fallback=SessionLocal,
+        max_lag=settings.POSTGRES_REPLICA_MAX_LAG,
+        check_interval=settings.POSTGRES_REPLICA_LAG_CHECK_INTERVAL,
+    )
+
+
+@lru_cache()
+def get_test_engine() -> Engine:
+    settings = get_settings()
+    return instrument(
+        create_engine(settings.test_database_url, **engine_options(settings))
+    )
+
+
+@lru_cache()
+def get_test_sessionmaker() -> sessionmaker:
+    return sessionmaker(bind=get_test_engine(), expire_on_commit=False)
+
+
+SessionLocal = LazySessionmaker(get_sessionmaker)
+ReadSessionLocal = LazySessionmaker(get_replica_router)
+TestSessionLocal = LazySessionmaker(get_test_sessionmaker)
+
+
+def built_engines() -> dict[str, Engine]:
+    engines = {}
+    if get_engine.cache_info().currsize:
+        engines["primary"] = get_engine()
+    if get_replica_router.cache_info().currsize:
+        for engine in get_replica_router().engines:
+            engines[f"replica:{engine.url.host}:{engine.url.port}"] = engine
+    if get_test_engine.cache_info().currsize:
+        engines["test"] = get_test_engine()
+    return engines
+
+
+def init_engines() -> None:
+    get_sessionmaker()
+    get_replica_router()
+
+
+def dispose_engines() -> None:
+    for engine in built_engines().values():
+        engine.dispose()
+    for factory in (
+        get_engine,
+        get_sessionmaker,
+        get_replica_router,
+        get_test_engine,
+        get_test_sessionmaker,
+    ):
+        factory.cache_clear()
@@ -0,0 +1,251 @@
+from dataclasses import asdict, dataclass, field
+from hashlib import blake2b
+import io
+import logging
+import random
+from typing import Any, Iterable, Iterator
+from uuid import UUID
+
+from sqlalchemy.engine import Engine
+
+from utils.security import get_password_hash
+
+ACTIONS = ["create", "read", "update", "delete", "list", "export", "approve", "audit"]
+
+# 2023-01-01T00:00:00Z, synthetic ids count up from here in milliseconds
+BASE_MS = 1_672_531_200_000
+
+
+@dataclass
+class GraphSpec:
+    users: int
+    roles: int
+    permissions: int
+    permissions_per_role: int
+    roles_per_user: int
+    seed: int = 0
+    passwords: list[str] = field(default_factory=lambda: ["12345678"])
+    email_domain: str = "example.com"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {key: value for key, value in asdict(self).items() if key != "passwords"}
+
+
+def synthetic_id(seed: int, kind: str, index: int) -> UUID:
+    # uuid7 layout with a fake clock, so reruns produce the same time-ordered ids
+    rand = int.from_bytes(
+        blake2b(f"{seed}:{kind}:{index}".encode(), digest_size=10).digest(), "big"
+    )
+    value = ((BASE_MS + index) & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= (rand >> 68) << 64
+    value |= 0x2 << 62
+    value |= rand & 0x3FFFFFFFFFFFFFFF
+    return UUID(int=value)
+
+
+def zipf_weights(n: int, s: float = 1.1) -> list[float]:
+    return [1 / (rank**s) for rank in range(1, n + 1)]
+
+
+def weighted_sample(
+    rng: random.Random, population: list[Any], weights: list[float], k: int
+) -> list[Any]:
+    # weighted sampling without replacement (Efraimidis-Spirakis)
+    keys = [rng.random() ** (1 / weight) for weight in weights]
+    order = sorted(range(len(population)), key=keys.__getitem__, reverse=True)
+    return [population[i] for i in order[:k]]
+
+
+def generate_permissions(spec: GraphSpec) -> list[tuple[UUID, str]]:
+    return [
+        (
+            synthetic_id(spec.seed, "permission", i),
+            f"resource{i // len(ACTIONS)}.{ACTIONS[i % len(ACTIONS)]}",
+        )
+        for i in range(spec.permissions)
+    ]
+
+
+def generate_roles(spec: GraphSpec) -> list[tuple[UUID, str]]:
+    return [(synthetic_id(spec.seed, "role", i), f"role{i}") for i in range(spec.roles)]
+
+
+def generate_role_has_permissions(
+    spec: GraphSpec,
+    roles: list[tuple[UUID, str]],
+    permissions: list[tuple[UUID, str]],
+) -> Iterator[tuple[UUID, UUID]]:
+    # popular permissions are shared by most roles, the tail is role specific,
+    # role sizes vary around permissions_per_role
+    rng = random.Random(f"{spec.seed}:role_has_permission")
+    permission_ids = [id for id, _ in permissions]
+    weights = zipf_weights(len(permission_ids), s=0.8)
+    for role_id, _ in roles:
+        size = round(spec.permissions_per_role * rng.uniform(0.5, 1.5))
+        size = max(1, min(size, len(permission_ids)))
+        for permission_id in weighted_sample(rng, permission_ids, weights, size):
+            yield role_id, permission_id
+
+
+def generate_users(spec: GraphSpec) -> Iterator[tuple[UUID, str, str]]:
+    # hash each distinct password once, bcrypt per row would take days at 10M
+    hashed_passwords = [get_password_hash(password) for password in spec.passwords]
+    for i in range(spec.users):
+        yield (
+            synthetic_id(spec.seed, "user", i),
+            f"user{i}@{spec.email_domain}",
+            hashed_passwords[i % len(hashed_passwords)],
+        )
+
+
+def generate_user_has_roles(
+    spec: GraphSpec, roles: list[tuple[UUID, str]]
+) -> Iterator[tuple[UUID, UUID]]:
+    # roles per user and role popularity both follow power laws
+    rng = random.Random(f"{spec.seed}:user_has_role")
+    role_ids = [id for id, _ in roles]
+    weights = zipf_weights(len(role_ids))
+    cumulative = list(_accumulate(weights))
+    max_roles = min(spec.roles_per_user, len(role_ids))
+    for i in range(spec.users):
+        count = min(max_roles, int(rng.paretovariate(1.5)))
+        user_id = synthetic_id(spec.seed, "user", i)
+        chosen = set(rng.choices(role_ids, cum_weights=cumulative, k=count))
+        for role_id in chosen:
+            yield user_id, role_id
+
+
+def _accumulate(values: list[float]) -> Iterator[float]:
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
+
+
+def copy_rows(
+    cursor: Any,
+    table: str,
+    columns: list[str],
+    rows: Iterable[tuple],
+    chunk_size: int,
+) -> int:
+    # values are uuids, generated names and bcrypt hashes, none need escaping
+    sql = f'COPY "{table}" ({", ".join(columns)}) FROM STDIN'
+    total = 0
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(str(value) for value in row))
+        buffer.write("\n")
+        count += 1
+        if count == chunk_size:
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += count
+            buffer = io.StringIO()
+            count = 0
+    if count:
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+        total += count
+    return total
+
+
+TABLES = [
+    ("permission", ["id", "name"]),
+    ("role", ["id", "name"]),
+    ("role_has_permission", ["role_id", "permission_id"]),
+    ("user", ["id", "email", "hashed_password"]),
+    ("user_has_role", ["user_id", "role_id"]),
+]
+
+# unique column used to match generated rows against rows already loaded
+NATURAL_KEYS = {"permission": "name", "role": "name", "user": "email"}
+
+EDGES = {
+    "role_has_permission": {"role_id": "role", "permission_id": "permission"},
+    "user_has_role": {"user_id": "user", "role_id": "role"},
+}
+
+
+def stage_rows(
+    cursor: Any, table: str, columns: list[str], rows: Iterable[tuple], chunk_size: int
+) -> int:
+    # names are fixed but ids depend on the seed, existing rows keep their ids
+    # and staged edges are remapped to them by name before inserting
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE staging (LIKE "{table}" INCLUDING DEFAULTS) '
+        "ON COMMIT DROP"
+    )
+    copy_rows(cursor, "staging", columns, rows, chunk_size)
+    if table in EDGES:
+        joins = " ".join(
+            f'JOIN "{target}_ids" ON "{target}_ids".staged_id = staging.{column}'
+            for column, target in EDGES[table].items()
+        )
+        select = ", ".join(f'"{target}_ids".id' for target in EDGES[table].values())
+        cursor.execute(
+            f'INSERT INTO "{table}" ({", ".join(columns)}) '
+            f"SELECT {select} FROM staging {joins} ON CONFLICT DO NOTHING"
+        )
+        return cursor.rowcount
+
+    cursor.execute(
+        f'INSERT INTO "{table}" ({", ".join(columns)}) '
+        f'SELECT {", ".join(columns)} FROM staging ON CONFLICT DO NOTHING'
+    )
+    count = cursor.rowcount
+    key = NATURAL_KEYS[table]
+    cursor.execute(f'DROP TABLE IF EXISTS "{table}_ids"')
+    cursor.execute(
+        f'CREATE TEMPORARY TABLE "{table}_ids" AS '
+        f'SELECT staging.id AS staged_id, "{table}".id FROM staging '
+        f'JOIN "{table}" USING ({key})'
+    )
+    cursor.execute(f'ANALYZE "{table}_ids"')
+    return count
+
+
+def load(
+    engine: Engine, spec: GraphSpec, truncate: bool = False, chunk_size: int = 100_000
+) -> dict[str, int]:
+    permissions = generate_permissions(spec)
+    roles = generate_roles(spec)
+    rows = {
+        "permission": permissions,
+        "role": roles,
+        "role_has_permission": generate_role_has_permissions(spec, roles, permissions),
+        "user": generate_users(spec),
+        "user_has_role": generate_user_has_roles(spec, roles),
+    }
+    counts = {}
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if truncate:
+            cursor.execute(
+                "TRUNCATE "
+                + ", ".join(f'"{table}"' for table, _ in TABLES)
+                + " CASCADE"
+            )
+        for table, columns in TABLES:
+            logging.info(f"Loading {table}")
+            if truncate:
+                counts[table] = copy_rows(
+                    cursor, table, columns, rows[table], chunk_size
+                )
+            else:
+                counts[table] = stage_rows(
+                    cursor, table, columns, rows[table], chunk_size
+                )
+            connection.commit()
+        if not truncate:
+            cursor.execute(
+                "DROP TABLE " + ", ".join(f'"{table}_ids"' for table in NATURAL_KEYS)
+            )
+        cursor.execute("ANALYZE")
+        connection.commit()
+    finally:
+        connection.close()
+    return counts
@@ -1,17 +1,86 @@
-import os
-
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import uvicorn
 
 from api.api_v1.api import api_router
+from authz import changes
+from authz.catalog import catalog
+from authz.listener import ChangeListener
+from authz.snapshot import latest_change_id, SnapshotPublisher, SnapshotStore
+from core.config import get_settings
+from db.session import dispose_engines, get_engine, init_engines
+from utils.admission import AdmissionMiddleware, loop_monitor
+from utils.auth import build_manifest
 from utils.exception import UvicornException
+from utils.metrics import MetricsMiddleware
+from utils.profiling import ProfilingMiddleware
+from utils import tracing
+import utils.slow_query  # noqa: F401
 
 
 app = FastAPI()
 
 
+@app.on_event("startup")
+def startup() -> None:
+    settings = get_settings()
+    tracing.configure(settings.TRACE_EXPORTER, settings.TRACE_FILE)
+    init_engines()
+    app.state.permission_manifest = build_manifest(app)
+    if settings.AUTHZ_SNAPSHOT_PATH:
+        catalog.snapshots = SnapshotStore(settings.AUTHZ_SNAPSHOT_PATH)
+        app.state.snapshot_publisher = SnapshotPublisher(
+            get_engine(), settings.AUTHZ_SNAPSHOT_PATH
+        )
+        changes.subscribers.append(app.state.snapshot_publisher.mark_dirty)
+        app.state.snapshot_publisher.start()
+    if settings.AUTHZ_CACHE or settings.AUTHZ_SNAPSHOT_PATH:
+        app.state.change_listener = ChangeListener(
+            get_engine(),
+            on_change=changes.publish,
+            on_resync=resync,
+            on_disconnect=catalog.clear,
+        )
+        catalog.listening = app.state.change_listener.connected
+        app.state.change_listener.start()
+
+
+def resync() -> None:
+    snapshot_publisher = getattr(app.state, "snapshot_publisher", None)
+    if not snapshot_publisher:
+        catalog.resync()
+        return
+    with get_engine().connect() as connection:
+        change_id = latest_change_id(connection)
+    catalog.resync(change_id)
+    snapshot_publisher.mark_stale(change_id)
+
+
+@app.on_event("startup")
+async def start_loop_monitor() -> None:
+    loop_monitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor() -> None:
+    await loop_monitor.stop()
+
+
+@app.on_event("shutdown")
+def shutdown() -> None:
+    change_listener = getattr(app.state, "change_listener", None)
+    if change_listener:
+        change_listener.stop()
+        catalog.listening = None
+    snapshot_publisher = getattr(app.state, "snapshot_publisher", None)
+    if snapshot_publisher:
+        changes.subscribers.remove(snapshot_publisher.mark_dirty)
+        snapshot_publisher.stop()
+    dispose_engines()
+
+
 @app.exception_handler(UvicornException)
 async def uvicorn_exception_handler(request: Request, exc: UvicornException):
     return JSONResponse(
@@ -20,6 +89,8 @@ async def uvicorn_exception_handler(request: Request, exc: UvicornException):
     )
 
 
+# inside CORS so 503 responses still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -27,8 +98,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
 
 app.include_router(api_router, prefix="/api/v1")
 
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT")))
+    uvicorn.run("main:app", host="0.0.0.0", port=get_settings().PORT)
@@ -1,17 +1,66 @@
-import uuid
-
-from sqlalchemy import Column, ForeignKey, String
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    DDL,
+    event,
+    ForeignKey,
+    func,
+    String,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 
 from db.session import Base
+from utils.uuid7 import uuid7
+
+# server side UUIDv7 for rows inserted outside the ORM (raw SQL, COPY)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL(
+        """
+        CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+            SELECT encode(
+                set_bit(
+                    set_bit(
+                        overlay(
+                            uuid_send(gen_random_uuid())
+                            placing substring(
+                                int8send(
+                                    floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint
+                                ) FROM 3
+                            )
+                            FROM 1 FOR 6
+                        ),
+                        52, 1
+                    ),
+                    53, 1
+                ),
+                'hex'
+            )::uuid
+        $$ LANGUAGE sql VOLATILE
+        """
+    ),
+)
 
 
 class User(Base):
     __tablename__ = "user"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid7,
+        server_default=text("uuid_generate_v7()"),
+    )
     email = Column(String, unique=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
+    # service accounts have no password and authenticate with api keys
+    hashed_password = Column(String)
+    is_service_account = Column(
+        Boolean, nullable=False, default=False, server_default=text("false")
+    )
 
 
 class UserHasRole(Base):
@@ -28,8 +77,13 @@ class UserHasRole(Base):
 class Role(Base):
     __tablename__ = "role"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    name = Column(String, nullable=False)
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid7,
+        server_default=text("uuid_generate_v7()"),
+    )
+    name = Column(String, unique=True, nullable=False)
 
 
 class RoleHasPermission(Base):
@@ -49,14 +103,24 @@ class RoleHasPermission(Base):
 class Permission(Base):
     __tablename__ = "permission"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    name = Column(String, nullable=False)
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid7,
+        server_default=text("uuid_generate_v7()"),
+    )
+    name = Column(String, unique=True, nullable=False)
 
 
 class Group(Base):
     __tablename__ = "group"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid7,
+        server_default=text("uuid_generate_v7()"),
+    )
     name = Column(String, nullable=False)
 
 
@@ -69,3 +133,77 @@ class GroupHasUser(Base):
     user_id = Column(
         UUID(as_uuid=True), ForeignKey("user.id"), primary_key=True, nullable=False
     )
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    id = Column(BigInteger, primary_key=True)
+    table_name = Column(String, nullable=False)
+    op = Column(String, nullable=False)
+    keys = Column(JSONB, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class ChangeLogPurge(Base):
+    # change_log rows up to last_id have been deleted, a client behind it has
+    # to start over from a snapshot
+    __tablename__ = "change_log_purge"
+
+    last_id = Column(BigInteger, primary_key=True)
+    purged_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_token"
+
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid7,
+        server_default=text("uuid_generate_v7()"),
+    )
+    token_hash = Column(String, unique=True, nullable=False)
+    # removed with the user by the database, deleting a user costs no extra
+    # statement
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("user.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+    family_id = Column(UUID(as_uuid=True), index=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True))
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class ApiKey(Base):
+    __tablename__ = "api_key"
+
+    id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid7,
+        server_default=text("uuid_generate_v7()"),
+    )
+    prefix = Column(String, unique=True, nullable=False)
+    key_hash = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("user.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+    expires_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True))
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
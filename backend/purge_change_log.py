@@ -0,0 +1,24 @@
+import logging
+
+import crud
+from db.session import SessionLocal
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='{"time": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}',
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+def main() -> None:
+    logging.info("Start purging the change log")
+    db = SessionLocal()
+    count = crud.rbac.purge_changes(db)
+    horizon = crud.rbac.get_change_horizon(db)
+    db.close()
+    logging.info(f"Purged {count} changes, the change log starts after {horizon}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import logging
+
+import crud
+from db.session import SessionLocal
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='{"time": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}',
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+def main() -> None:
+    logging.info("Start purging refresh tokens")
+    db = SessionLocal()
+    count = crud.rbac.purge_refresh_tokens(db)
+    db.close()
+    logging.info(f"Purged {count} expired or revoked refresh tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+from datetime import datetime
 from uuid import UUID
 
 from pydantic import BaseModel, EmailStr
@@ -11,6 +12,7 @@ class UserCreate(BaseModel):
 class UserOut(BaseModel):
     id: UUID
     email: EmailStr
+    is_service_account: bool = False
 
     class Config:
         orm_mode = True
@@ -20,6 +22,33 @@ class UserUpdate(BaseModel):
     email: EmailStr
 
 
+class ServiceAccountCreate(BaseModel):
+    email: EmailStr
+
+
+class ApiKeyCreate(BaseModel):
+    user_id: UUID
+    name: str
+    expires_at: datetime | None = None
+
+
+class ApiKeyOut(BaseModel):
+    id: UUID
+    user_id: UUID
+    name: str
+    prefix: str
+    created_at: datetime
+    expires_at: datetime | None
+    revoked_at: datetime | None
+
+    class Config:
+        orm_mode = True
+
+
+class ApiKeyCreated(ApiKeyOut):
+    key: str
+
+
 class UserHasRole(BaseModel):
     user_id: UUID
     role_id: UUID
@@ -68,3 +97,19 @@ class RoleHasPermission(BaseModel):
 class RoleHasPermissionUpdate(BaseModel):
     old_permission_id: UUID
     new_permission_id: UUID
+
+
+class ChangeOut(BaseModel):
+    id: int
+    table_name: str
+    op: str
+    keys: dict[str, str]
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class ChangeFeed(BaseModel):
+    changes: list[ChangeOut]
+    next: int
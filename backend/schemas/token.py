@@ -4,3 +4,14 @@ from pydantic import BaseModel
 class Token(BaseModel):
     permissions: list[str]
     token: str
+
+
+class LoginOut(BaseModel):
+    permissions: list[str]
+    token: str
+    refresh_token: str
+    expires_in: int
+
+
+class RefreshTokenIn(BaseModel):
+    refresh_token: str
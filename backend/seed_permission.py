@@ -4,8 +4,9 @@ from uuid import UUID
 
 from sqlalchemy.orm import Session
 
+import crud
 from db.session import SessionLocal
-from models.rbac import Permission, Role, RoleHasPermission
+from models.rbac import Permission, Role
 
 
 logging.basicConfig(
@@ -17,24 +18,20 @@ logging.basicConfig(
 
 def seed_permissions(db: Session, permissions: list[str]) -> list[UUID]:
     logging.info("Seeding permissions")
-    db_objs = [Permission(name=permission) for permission in permissions]
-    db.add_all(db_objs)
-    db.commit()
-    for db_obj in db_objs:
-        db.refresh(db_obj)
+    crud.rbac.create_permissions(db, permissions=permissions)
     logging.info("Permissions has been seeded")
-    return [obj.id for obj in db_objs]
+    permission_ids = (
+        db.query(Permission.id).filter(Permission.name.in_(permissions)).all()
+    )
+    return [permission_id[0] for permission_id in permission_ids]
 
 
 def map_role_permission(db: Session, permission_ids: list[UUID]) -> None:
     logging.info("Mapping admin role with permissions")
     role: Role = db.query(Role).filter(Role.name == "admin").first()
-    db_objs = [
-        RoleHasPermission(role_id=role.id, permission_id=permission_id)
-        for permission_id in permission_ids
-    ]
-    db.add_all(db_objs)
-    db.commit()
+    crud.rbac.create_role_has_permission(
+        db, role_id=role.id, permission_ids=permission_ids
+    )
     logging.info("Admin role and permissions has been mapped")
 
 
@@ -4,9 +4,10 @@ from uuid import UUID
 
 from sqlalchemy.orm import Session
 
+import crud
 from db.session import SessionLocal
-from models.rbac import Role, User, UserHasRole
-from utils.security import get_password_hash
+from models.rbac import Role
+from schemas.rbac import UserCreate
 
 
 logging.basicConfig(
@@ -18,10 +19,12 @@ logging.basicConfig(
 
 def seed_superuser(db: Session, email: str, password: str) -> UUID:
     logging.info("Seeding super user")
-    db_obj = User(email=email, hashed_password=get_password_hash(password))
-    db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    db_obj = crud.rbac.create_user(
+        db, obj_in=UserCreate(email=email, password=password)
+    )
+    if not db_obj:
+        logging.info("Super user already exists")
+        return crud.rbac.get_user_by_email(db, email=email).id
     logging.info("Super user has been seeded")
     return db_obj.id
 
@@ -41,10 +44,7 @@ def seed_admin_role(db: Session) -> UUID:
 
 def map_user_role(db: Session, user_id: UUID, role_id: UUID) -> None:
     logging.info("Mapping super user with admin role")
-    db_obj = UserHasRole(user_id=user_id, role_id=role_id)
-    db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    crud.rbac.create_user_has_role(db, user_id=user_id, role_id=role_id)
     logging.info("Super user and admin role has been mapped")
 
 
@@ -4,9 +4,9 @@ from uuid import UUID
 
 from sqlalchemy.orm import Session
 
+import crud
 from db.session import SessionLocal
-from models.rbac import User
-from utils.security import get_password_hash
+from schemas.rbac import UserCreate
 
 
 logging.basicConfig(
@@ -18,11 +18,14 @@ logging.basicConfig(
 
 def seed_user(db: Session, email: str, password: str) -> UUID:
     logging.info("Seeding normal user")
-    db_obj = User(email=email, hashed_password=get_password_hash(password))
-    db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    db_obj = crud.rbac.create_user(
+        db, obj_in=UserCreate(email=email, password=password)
+    )
+    if not db_obj:
+        logging.info("Normal user already exists")
+        return crud.rbac.get_user_by_email(db, email=email).id
     logging.info("Normal user has been seeded")
+    return db_obj.id
 
 
 def main(email: str, password: str) -> None:
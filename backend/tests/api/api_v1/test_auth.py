@@ -1,13 +1,12 @@
 from fastapi.testclient import TestClient
+import pytest
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
+from core.config import get_settings
 import crud
 from main import app
 from schemas.rbac import UserCreate
-from tests.conftest import override_get_db
-
-app.dependency_overrides[get_db] = override_get_db
+from utils import security
 
 client = TestClient(app)
 
@@ -26,6 +25,24 @@ def test_login_success(db: Session) -> None:
     assert res["token"]
 
 
+def test_login_rehashes_password(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    email = "admin@test.com"
+    password = "12345678"
+    monkeypatch.setattr(get_settings(), "BCRYPT_ROUNDS", 4)
+    admin = UserCreate(email=email, password=password)
+    db_obj = crud.rbac.create_user(db, obj_in=admin)
+    assert security.get_hash_rounds(db_obj.hashed_password) == 4
+
+    monkeypatch.setattr(get_settings(), "BCRYPT_ROUNDS", 5)
+    login_data = {"email": email, "password": password}
+    r = client.post("/api/v1/auth/login", json=login_data)
+    assert r.status_code == 201
+    db.refresh(db_obj)
+    assert security.get_hash_rounds(db_obj.hashed_password) == 5
+    r = client.post("/api/v1/auth/login", json=login_data)
+    assert r.status_code == 201
+
+
 def test_login_wrong_password(db: Session) -> None:
     email = "admin@test.com"
     password = "12345678"
@@ -146,3 +163,63 @@ def test_auth_invalid_jwt() -> None:
     assert r.status_code == 401
     assert "message" in res
     assert res["message"] == "user is not authorized"
+
+
+def test_refresh_token_rotation(db: Session) -> None:
+    email = "admin@test.com"
+    password = "12345678"
+    admin = UserCreate(email=email, password=password)
+    crud.rbac.create_user(db, obj_in=admin)
+    login_data = {"email": email, "password": password}
+    r = client.post("/api/v1/auth/login", json=login_data)
+    res = r.json()
+    assert res["refresh_token"]
+    assert res["expires_in"] == get_settings().ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+    first = res["refresh_token"]
+    r = client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    res = r.json()
+    assert r.status_code == 201
+    assert security.verify_jwt(res["token"])["email"] == email
+    second = res["refresh_token"]
+    assert second != first
+
+    # the rotated token used again revokes the whole family
+    r = client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    res = r.json()
+    assert r.status_code == 401
+    assert res["error"] == "refresh token is invalid, expired or revoked"
+    r = client.post("/api/v1/auth/refresh", json={"refresh_token": second})
+    assert r.status_code == 401
+
+
+def test_refresh_token_revoke(db: Session) -> None:
+    email = "admin@test.com"
+    password = "12345678"
+    admin = UserCreate(email=email, password=password)
+    user = crud.rbac.create_user(db, obj_in=admin)
+    login_data = {"email": email, "password": password}
+    token = client.post("/api/v1/auth/login", json=login_data).json()["refresh_token"]
+    other = client.post("/api/v1/auth/login", json=login_data).json()["refresh_token"]
+
+    r = client.post("/api/v1/auth/revoke", json={"refresh_token": token})
+    assert r.status_code == 204
+    r = client.post("/api/v1/auth/refresh", json={"refresh_token": token})
+    assert r.status_code == 401
+    r = client.post("/api/v1/auth/refresh", json={"refresh_token": other})
+    assert r.status_code == 201
+
+    r = client.post("/api/v1/auth/refresh", json={"refresh_token": "invalid"})
+    assert r.status_code == 401
+
+
+def test_refresh_token_expired(db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "REFRESH_TOKEN_EXPIRE_DAYS", -1)
+    email = "admin@test.com"
+    password = "12345678"
+    admin = UserCreate(email=email, password=password)
+    crud.rbac.create_user(db, obj_in=admin)
+    login_data = {"email": email, "password": password}
+    token = client.post("/api/v1/auth/login", json=login_data).json()["refresh_token"]
+    r = client.post("/api/v1/auth/refresh", json={"refresh_token": token})
+    assert r.status_code == 401
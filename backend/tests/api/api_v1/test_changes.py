@@ -0,0 +1,103 @@
+import json
+from typing import Callable
+
+from fastapi.testclient import TestClient
+from pytest import MonkeyPatch
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+import crud
+from main import app
+from tests.conftest import AdminLogin
+
+client = TestClient(app)
+
+
+def test_read_changes(db: Session, admin_login: Callable[..., AdminLogin]) -> None:
+    header = admin_login().headers
+    r = client.get("/api/v1/changes", headers=header)
+    assert r.status_code == 200
+    res = r.json()
+    # user, role, user_has_role, 4 permissions, 4 role_has_permission
+    assert len(res["changes"]) == 11
+    assert res["next"] == res["changes"][-1]["id"]
+    first = res["changes"][0]
+    assert first["table_name"] == "user"
+    assert first["op"] == "create"
+    assert set(first["keys"]) == {"id"}
+
+    r = client.post("/api/v1/rbac/role", json={"name": "test"}, headers=header)
+    role_id = r.json()["id"]
+    client.delete(f"/api/v1/rbac/role/{role_id}", headers=header)
+    r = client.get(f"/api/v1/changes?after={res['next']}", headers=header)
+    changes = r.json()["changes"]
+    assert [(change["table_name"], change["op"]) for change in changes] == [
+        ("role", "create"),
+        ("user_has_role", "delete"),
+        ("role_has_permission", "delete"),
+        ("role", "delete"),
+    ]
+    assert changes[0]["keys"] == {"id": role_id}
+    assert changes[1]["keys"] == {"role_id": role_id}
+
+
+def test_read_changes_limit(
+    db: Session, admin_login: Callable[..., AdminLogin]
+) -> None:
+    header = admin_login().headers
+    r = client.get("/api/v1/changes?limit=5", headers=header)
+    res = r.json()
+    assert len(res["changes"]) == 5
+    r = client.get(f"/api/v1/changes?after={res['next']}&limit=100", headers=header)
+    assert len(r.json()["changes"]) == 6
+    r = client.get("/api/v1/changes?limit=0", headers=header)
+    assert r.status_code == 422
+
+
+def test_read_changes_unauthorized(db: Session) -> None:
+    r = client.get("/api/v1/changes")
+    assert r.status_code == 401
+
+
+def test_stream_changes(
+    db: Session, monkeypatch: MonkeyPatch, admin_login: Callable[..., AdminLogin]
+) -> None:
+    monkeypatch.setattr(get_settings(), "CHANGES_STREAM_TIMEOUT", 0.1)
+    monkeypatch.setattr(get_settings(), "CHANGES_POLL_INTERVAL", 0.01)
+    header = admin_login().headers
+    r = client.get("/api/v1/changes", headers=header)
+    third = r.json()["changes"][2]["id"]
+
+    r = client.get(
+        "/api/v1/changes/stream", headers={**header, "last-event-id": str(third)}
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [event for event in r.text.split("\n\n") if event]
+    assert len(events) == 8
+    id, name, data = events[0].split("\n")
+    assert id == f"id: {third + 1}"
+    assert name == "event: change"
+    assert json.loads(data.removeprefix("data: "))["table_name"] == "permission"
+
+
+def test_read_purged_changes(
+    db: Session, monkeypatch: MonkeyPatch, admin_login: Callable[..., AdminLogin]
+) -> None:
+    header = admin_login().headers
+    r = client.get("/api/v1/changes", headers=header)
+    changes = r.json()["changes"]
+    monkeypatch.setattr(get_settings(), "CHANGE_LOG_RETENTION_DAYS", -1)
+    # the newest change is kept
+    assert crud.rbac.purge_changes(db) == len(changes) - 1
+    assert crud.rbac.purge_changes(db) == 0
+    horizon = crud.rbac.get_change_horizon(db)
+    assert horizon == changes[-2]["id"]
+
+    for path in ["/api/v1/changes", "/api/v1/changes/stream"]:
+        r = client.get(path, headers=header)
+        assert r.status_code == 410
+        assert r.json()["message"] == "changes have been purged"
+    r = client.get(f"/api/v1/changes?after={horizon}", headers=header)
+    assert r.status_code == 200
+    assert [change["id"] for change in r.json()["changes"]] == [changes[-1]["id"]]
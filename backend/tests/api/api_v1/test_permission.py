@@ -2,13 +2,9 @@ from uuid import uuid4
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
 import crud
 from main import app
 from schemas.rbac import UserCreate
-from tests.conftest import override_get_db
-
-app.dependency_overrides[get_db] = override_get_db
 
 client = TestClient(app)
 
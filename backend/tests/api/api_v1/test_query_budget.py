@@ -0,0 +1,143 @@
+from fastapi.testclient import TestClient
+import pytest
+from pytest import MonkeyPatch
+from sqlalchemy.orm import Session
+
+import crud
+from crud import crud_rbac
+from main import app
+from schemas.rbac import UserCreate
+from tests.conftest import QueryCounter
+
+client = TestClient(app)
+
+
+def seed(db: Session) -> dict:
+    email = "admin@test.com"
+    password = "12345678"
+    permissions = ["setting.create", "setting.read", "setting.update", "setting.delete"]
+    admin = UserCreate(email=email, password=password)
+    user = crud.rbac.create_user(db, obj_in=admin)
+    role = crud.rbac.create_role(db, role_name="admin")
+    crud.rbac.create_user_has_role(db, user_id=user.id, role_id=role.id)
+    db_objs = crud.rbac.create_permissions(db, permissions=permissions)
+    crud.rbac.create_role_has_permission(
+        db, role_id=role.id, permission_ids=[obj.id for obj in db_objs]
+    )
+    # enough extra rows that a per-row query shows up as a repeat
+    extra_permissions = crud.rbac.create_permissions(
+        db, permissions=[f"extra.{i}" for i in range(5)]
+    )
+    for i in range(3):
+        extra_role = crud.rbac.create_role(db, role_name=f"extra{i}")
+        crud.rbac.create_user_has_role(db, user_id=user.id, role_id=extra_role.id)
+        crud.rbac.create_role_has_permission(
+            db,
+            role_id=extra_role.id,
+            permission_ids=[obj.id for obj in extra_permissions],
+        )
+    crud.rbac.create_user(db, obj_in=UserCreate(email="user@test.com", password="x"))
+
+    login_data = {"email": email, "password": password}
+    r = client.post("/api/v1/auth/login", json=login_data)
+    return {
+        "user_id": user.id,
+        "role_id": extra_role.id,
+        "permission_id": extra_permissions[0].id,
+        "token": r.json()["token"],
+        "refresh_token": r.json()["refresh_token"],
+    }
+
+
+@pytest.mark.parametrize(
+    "method,path,budget",
+    [
+        ("get", "/api/v1/rbac/user", 2),
+        ("get", "/api/v1/rbac/role", 2),
+        ("get", "/api/v1/rbac/permission", 2),
+        ("get", "/api/v1/rbac/user-has-role/{user_id}", 2),
+        ("get", "/api/v1/rbac/role-has-permission/{role_id}", 2),
+        ("delete", "/api/v1/rbac/role/{role_id}", 5),
+        ("delete", "/api/v1/rbac/permission/{permission_id}", 4),
+        ("delete", "/api/v1/rbac/user/{user_id}", 4),
+    ],
+)
+def test_query_budget(db: Session, method: str, path: str, budget: int) -> None:
+    data = seed(db)
+    header = {"authorization": f"Bearer {data['token']}"}
+    with QueryCounter(db.get_bind()) as queries:
+        r = client.request(method, path.format(**data), headers=header)
+    assert r.status_code < 300
+    queries.assert_at_most(budget)
+    queries.assert_no_repeats()
+
+
+def test_login_query_budget(db: Session) -> None:
+    seed(db)
+    login_data = {"email": "admin@test.com", "password": "12345678"}
+    with QueryCounter(db.get_bind()) as queries:
+        r = client.post("/api/v1/auth/login", json=login_data)
+    assert r.status_code == 201
+    assert len(r.json()["permissions"]) == 9
+    queries.assert_at_most(2)
+    queries.assert_no_repeats()
+
+
+def test_refresh_query_budget(db: Session) -> None:
+    data = seed(db)
+    body = {"refresh_token": data["refresh_token"]}
+    with QueryCounter(db.get_bind()) as queries:
+        r = client.post("/api/v1/auth/refresh", json=body)
+    assert r.status_code == 201
+    assert len(r.json()["permissions"]) == 9
+    # revoke and return the user in one statement, insert the next token
+    queries.assert_at_most(2)
+
+
+def test_auth_query_budget(db: Session) -> None:
+    data = seed(db)
+    auth_data = {"permissions": ["setting.read", "extra.4"], "token": data["token"]}
+    with QueryCounter(db.get_bind()) as queries:
+        r = client.post("/api/v1/auth", json=auth_data)
+    assert r.status_code == 201
+    queries.assert_at_most(1)
+    queries.assert_no_repeats()
+
+
+def test_create_duplicate_user_query_budget(
+    db: Session, monkeypatch: MonkeyPatch
+) -> None:
+    seed(db)
+    hashed = []
+    get_password_hash = crud_rbac.get_password_hash
+    monkeypatch.setattr(
+        crud_rbac,
+        "get_password_hash",
+        lambda password: hashed.append(password) or get_password_hash(password),
+    )
+    admin = UserCreate(email="admin@test.com", password="12345678")
+    with QueryCounter(db.get_bind()) as queries:
+        assert crud.rbac.create_user(db, obj_in=admin) is None
+    # the email lookup turns a duplicate away before bcrypt runs
+    queries.assert_at_most(1)
+    assert hashed == []
+
+    with QueryCounter(db.get_bind()) as queries:
+        user = crud.rbac.create_user(
+            db, obj_in=UserCreate(email="new@test.com", password="12345678")
+        )
+    assert user is not None
+    # lookup, insert and the change log entry
+    queries.assert_at_most(3)
+    assert hashed == ["12345678"]
+
+
+def test_repeated_statement_is_detected(db: Session) -> None:
+    data = seed(db)
+    with QueryCounter(db.get_bind()) as queries:
+        for permission_id in [data["permission_id"], data["role_id"]]:
+            crud.rbac.get_permission_by_id(db, permission_id=permission_id)
+    assert queries.count == 2
+    assert len(queries.repeated()) == 1
+    with pytest.raises(AssertionError):
+        queries.assert_no_repeats()
@@ -2,13 +2,9 @@ from uuid import uuid4
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from api.deps import get_db
 import crud
 from main import app
 from schemas.rbac import UserCreate
-from tests.conftest import override_get_db
-
-app.dependency_overrides[get_db] = override_get_db
 
 client = TestClient(app)
 
@@ -166,6 +162,34 @@ def test_update_role(db: Session) -> None:
     assert res["name"] == "test"
 
 
+def test_update_duplicate_role(db: Session) -> None:
+    email = "admin@test.com"
+    password = "12345678"
+    permissions = ["setting.create", "setting.read", "setting.update", "setting.delete"]
+    admin = UserCreate(email=email, password=password)
+    user = crud.rbac.create_user(db, obj_in=admin)
+    role = crud.rbac.create_role(db, role_name="admin")
+    crud.rbac.create_user_has_role(db, user_id=user.id, role_id=role.id)
+    db_objs = crud.rbac.create_permissions(db, permissions=permissions)
+    crud.rbac.create_role_has_permission(
+        db, role_id=role.id, permission_ids=[obj.id for obj in db_objs]
+    )
+    other_role = crud.rbac.create_role(db, role_name="test")
+
+    login_data = {"email": email, "password": password}
+    r = client.post("/api/v1/auth/login", json=login_data)
+    res = r.json()
+
+    header = {"authorization": f"Bearer {res['token']}"}
+    r = client.patch(
+        f"/api/v1/rbac/role/{role.id}", json={"name": "test"}, headers=header
+    )
+    res = r.json()
+    assert r.status_code == 400
+    assert res["message"] == "role has already been created"
+    assert res["error"] == f"role id: {other_role.id}, role name: test"
+
+
 def test_delete_not_found_role(db: Session) -> None:
     email = "admin@test.com"
     password = "12345678"
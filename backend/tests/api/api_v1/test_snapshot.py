@@ -0,0 +1,57 @@
+from typing import Callable
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from authz.catalog import catalog
+from authz.snapshot import loads_snapshot, read_graph, SnapshotStore, write_snapshot
+from main import app
+from tests.conftest import AdminLogin
+
+client = TestClient(app)
+
+
+def test_read_snapshot(db: Session, admin_login: Callable[..., AdminLogin]) -> None:
+    admin = admin_login()
+    header = admin.headers
+    r = client.get("/api/v1/changes", headers=header)
+    change_id = r.json()["next"]
+
+    r = client.get("/api/v1/snapshot", headers=header)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/octet-stream"
+    assert r.headers["x-snapshot-change-id"] == str(change_id)
+    snapshot = loads_snapshot(r.content)
+    assert snapshot.change_id == change_id
+    assert snapshot.role_name(0) == "admin"
+    assert snapshot.get_user_permissions(admin.user.id) == {
+        permission.id: permission.name for permission in admin.permissions
+    }
+
+    r = client.get("/api/v1/snapshot?compress=true", headers=header)
+    assert r.status_code == 200
+    compressed = loads_snapshot(r.content)
+    assert compressed.get_user_permissions(admin.user.id) == (
+        snapshot.get_user_permissions(admin.user.id)
+    )
+
+
+def test_read_snapshot_from_store(
+    db: Session, tmp_path, admin_login: Callable[..., AdminLogin]
+) -> None:
+    header = admin_login().headers
+    path = str(tmp_path / "rbac.snapshot")
+    write_snapshot(path, read_graph(db.connection()), generation=3, built_at=0)
+    catalog.snapshots = SnapshotStore(path)
+    try:
+        r = client.get("/api/v1/snapshot", headers=header)
+    finally:
+        catalog.snapshots = None
+    assert r.headers["x-snapshot-generation"] == "3"
+    with open(path, "rb") as f:
+        assert r.content == f.read()
+
+
+def test_read_snapshot_unauthorized(db: Session) -> None:
+    r = client.get("/api/v1/snapshot")
+    assert r.status_code == 401
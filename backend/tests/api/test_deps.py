@@ -0,0 +1,98 @@
+import threading
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, validator
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.deps import get_db, get_snapshot_db, SessionReleasingRoute
+import crud
+from db.session import get_test_engine
+from main import app
+from schemas.rbac import UserCreate
+from tests.conftest import QueryCounter
+
+client = TestClient(app)
+
+
+def test_release_before_serialization(db: Session) -> None:
+    sessions = []
+    in_transaction = []
+
+    class Out(BaseModel):
+        value: int
+
+        @validator("value")
+        def check_released(cls, value: int) -> int:
+            in_transaction.append(sessions[0].in_transaction())
+            return value
+
+    router = APIRouter(route_class=SessionReleasingRoute)
+
+    @router.get("/value", response_model=Out)
+    async def read_value(db: Session = Depends(get_db)) -> dict:
+        sessions.append(db)
+        return {"value": db.execute(text("SELECT 1")).scalar()}
+
+    service = FastAPI()
+    service.include_router(router)
+    service.dependency_overrides = app.dependency_overrides
+    r = TestClient(service).get("/value")
+    assert r.status_code == 200
+    assert r.json() == {"value": 1}
+    assert in_transaction == [False]
+
+
+def test_release_sync_endpoint(db: Session) -> None:
+    sessions = []
+    threads = []
+    router = APIRouter(route_class=SessionReleasingRoute)
+
+    async def event_loop_thread() -> int:
+        return threading.get_ident()
+
+    @router.get("/value")
+    def read_value(
+        db: Session = Depends(get_db), loop: int = Depends(event_loop_thread)
+    ) -> dict:
+        sessions.append(db)
+        threads.append((loop, threading.get_ident()))
+        return {"value": db.execute(text("SELECT 1")).scalar()}
+
+    service = FastAPI()
+    service.include_router(router)
+    service.dependency_overrides = app.dependency_overrides
+    r = TestClient(service).get("/value")
+    assert r.status_code == 200
+    assert r.json() == {"value": 1}
+    assert not sessions[0].in_transaction()
+    # sync endpoints still run in the threadpool
+    [(loop, thread)] = threads
+    assert loop != thread
+
+
+def test_denied_from_cache_without_statements(db: Session) -> None:
+    email = "user@test.com"
+    password = "12345678"
+    crud.rbac.create_user(db, obj_in=UserCreate(email=email, password=password))
+    r = client.post("/api/v1/auth/login", json={"email": email, "password": password})
+    header = {"authorization": f"Bearer {r.json()['token']}"}
+    client.get("/api/v1/rbac/role", headers=header)
+
+    with QueryCounter(get_test_engine()) as counter:
+        r = client.get("/api/v1/rbac/role", headers=header)
+        assert r.status_code == 401
+        r = client.get("/api/v1/rbac/role", headers={"authorization": "Bearer x"})
+        assert r.status_code == 401
+    assert counter.count == 0
+
+
+def test_snapshot_db_is_repeatable_read() -> None:
+    dependency = get_snapshot_db()
+    db = next(dependency)
+    try:
+        isolation = db.execute(text("SHOW transaction_isolation")).scalar()
+    finally:
+        dependency.close()
+    assert isolation == "repeatable read"
@@ -0,0 +1,144 @@
+import threading
+import time
+from uuid import UUID
+
+from pytest import MonkeyPatch
+from sqlalchemy.orm import Session
+
+from authz.catalog import PermissionCatalog
+from authz.changes import Change
+import crud
+from schemas.rbac import UserCreate
+from tests.conftest import QueryCounter
+
+
+def seed(db: Session) -> dict:
+    user = crud.rbac.create_user(
+        db, obj_in=UserCreate(email="admin@test.com", password="12345678")
+    )
+    role = crud.rbac.create_role(db, role_name="admin")
+    crud.rbac.create_user_has_role(db, user_id=user.id, role_id=role.id)
+    permissions = crud.rbac.create_permissions(
+        db, permissions=["setting.read", "setting.update"]
+    )
+    crud.rbac.create_role_has_permission(
+        db, role_id=role.id, permission_ids=[obj.id for obj in permissions]
+    )
+    return {"user": user, "role": role, "permissions": permissions}
+
+
+def test_catalog_caches(db: Session) -> None:
+    user_id = seed(db)["user"].id
+    catalog = PermissionCatalog()
+    with QueryCounter(db.get_bind()) as queries:
+        permissions = catalog.get_user_permissions(db, user_id)
+    assert sorted(permissions.values()) == ["setting.read", "setting.update"]
+    assert queries.count == 3
+
+    with QueryCounter(db.get_bind()) as queries:
+        assert catalog.get_user_permissions(db, user_id) == permissions
+        names = catalog.get_permission_names(db, permissions)
+    assert sorted(names) == ["setting.read", "setting.update"]
+    assert queries.count == 0
+
+
+def test_catalog_invalidated_on_commit(db: Session, monkeypatch: MonkeyPatch) -> None:
+    data = seed(db)
+    catalog = PermissionCatalog()
+    monkeypatch.setattr("authz.changes.subscribers", [catalog.apply])
+    user_id = data["user"].id
+    catalog.get_user_permissions(db, user_id)
+
+    permission = data["permissions"][0]
+    crud.rbac.update_permission(db, permission, new_permission_name="setting.write")
+    assert "setting.write" in catalog.get_user_permissions(db, user_id).values()
+
+    [role_has_permission] = [
+        obj
+        for obj in crud.rbac.get_all_role_has_permission_by_role_id(
+            db, role_id=data["role"].id
+        )
+        if obj.permission_id == permission.id
+    ]
+    crud.rbac.delete_role_has_permission(db, role_has_permission)
+    assert list(catalog.get_user_permissions(db, user_id).values()) == [
+        "setting.update"
+    ]
+
+    crud.rbac.delete_role(db, data["role"])
+    assert catalog.get_user_permissions(db, user_id) == {}
+
+
+def test_catalog_discards_fill_raced_by_invalidation(db: Session) -> None:
+    data = seed(db)
+    catalog = PermissionCatalog()
+    get_all_role_ids_by_user_id = crud.rbac.get_all_role_ids_by_user_id
+
+    def invalidate_while_reading(db: Session, user_id: UUID) -> list[UUID]:
+        role_ids = get_all_role_ids_by_user_id(db, user_id=user_id)
+        catalog.apply(Change("user_has_role", "delete", {"user_id": str(user_id)}))
+        return role_ids
+
+    crud.rbac.get_all_role_ids_by_user_id = invalidate_while_reading
+    try:
+        catalog.get_user_roles(db, data["user"].id)
+    finally:
+        crud.rbac.get_all_role_ids_by_user_id = get_all_role_ids_by_user_id
+    assert catalog.user_roles == {}
+
+
+def test_catalog_skips_replica_sessions(db: Session) -> None:
+    data = seed(db)
+    catalog = PermissionCatalog()
+    db.info["replica"] = True
+    try:
+        catalog.get_user_permissions(db, data["user"].id)
+    finally:
+        del db.info["replica"]
+    assert catalog.user_roles == {}
+    assert catalog.permission_names == {}
+
+
+def test_catalog_evicts_least_recently_used(db: Session) -> None:
+    data = seed(db)
+    other = crud.rbac.create_user(
+        db, obj_in=UserCreate(email="user@test.com", password="12345678")
+    )
+    catalog = PermissionCatalog(max_users=1)
+    catalog.get_user_roles(db, data["user"].id)
+    catalog.get_user_roles(db, other.id)
+    assert list(catalog.user_roles) == [other.id]
+
+
+def test_changes_discarded_on_rollback(db: Session, monkeypatch: MonkeyPatch) -> None:
+    applied = []
+    monkeypatch.setattr("authz.changes.subscribers", [applied.append])
+    data = seed(db)
+    applied.clear()
+    data["role"].name = "renamed"
+    crud.rbac._record_change(db, data["role"], "update")
+    db.rollback()
+    assert applied == []
+    assert "rbac_changes" not in db.info
+
+
+def test_catalog_bypassed_while_listener_disconnected(db: Session) -> None:
+    data = seed(db)
+    catalog = PermissionCatalog()
+    catalog.listening = threading.Event()
+    catalog.get_user_permissions(db, data["user"].id)
+    assert catalog.user_roles == {}
+
+    catalog.listening.set()
+    catalog.get_user_permissions(db, data["user"].id)
+    assert list(catalog.user_roles) == [data["user"].id]
+
+
+def test_catalog_expires(db: Session, monkeypatch: MonkeyPatch) -> None:
+    data = seed(db)
+    catalog = PermissionCatalog(ttl=60)
+    catalog.get_user_roles(db, data["user"].id)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    catalog.expire()
+    assert catalog.user_roles == {}
@@ -0,0 +1,90 @@
+from typing import Callable
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.orm import Session
+
+from authz.check import is_allowed
+from authz.client import AuthzClient
+from main import app
+from tests.conftest import AdminLogin
+
+client = TestClient(app)
+
+
+def test_is_allowed() -> None:
+    assert is_allowed(["a", "b"], ["a", "b"])
+    assert not is_allowed(["a"], ["a", "b"])
+    assert is_allowed(["a"], ["a", "b"], mode="any")
+    assert not is_allowed(["c"], ["a", "b"], mode="any")
+    assert is_allowed([], [])
+    with pytest.raises(ValueError):
+        is_allowed(["a"], ["a"], mode="some")
+
+
+def test_check(db: Session, admin_login: Callable[..., AdminLogin]) -> None:
+    token = admin_login().token
+    authz = AuthzClient(token=token, http=client)
+    authz.load()
+    assert len(authz.permission_names) == 4
+    assert authz.check(token, ["setting.read", "setting.update"])
+    assert not authz.check(token, ["setting.read", "setting.export"])
+    assert authz.check(token, ["setting.read", "setting.export"], mode="any")
+    assert not authz.check("invalid", ["setting.read"])
+
+
+def test_refresh(db: Session, admin_login: Callable[..., AdminLogin]) -> None:
+    token = admin_login().token
+    authz = AuthzClient(token=token, http=client)
+    authz.load()
+    assert authz.refresh() == 0
+
+    header = {"authorization": f"Bearer {token}"}
+    r = client.get("/api/v1/rbac/permission", headers=header)
+    permission = next(p for p in r.json() if p["name"] == "setting.update")
+    client.patch(
+        f"/api/v1/rbac/permission/{permission['id']}",
+        json={"name": "setting.edit"},
+        headers=header,
+    )
+    assert authz.check(token, ["setting.update"])
+    assert authz.refresh() == 1
+    assert not authz.check(token, ["setting.update"])
+    assert authz.check(token, ["setting.edit"])
+
+    client.post("/api/v1/rbac/role", json={"name": "viewer"}, headers=header)
+    assert authz.refresh() == 1
+    assert authz.check(token, ["setting.edit"])
+
+
+def test_require(db: Session, admin_login: Callable[..., AdminLogin]) -> None:
+    token = admin_login().token
+    authz = AuthzClient(token=token, http=client)
+    authz.load()
+
+    service = FastAPI()
+
+    @service.get("/read", dependencies=[Depends(authz.require("setting.read"))])
+    def read() -> dict:
+        return {}
+
+    @service.get(
+        "/export",
+        dependencies=[
+            Depends(authz.require("setting.export", "setting.read", mode="any"))
+        ],
+    )
+    def export() -> dict:
+        return {}
+
+    @service.get("/audit", dependencies=[Depends(authz.require("setting.audit"))])
+    def audit() -> dict:
+        return {}
+
+    service_client = TestClient(service)
+    header = {"authorization": f"Bearer {token}"}
+    assert service_client.get("/read", headers=header).status_code == 200
+    assert service_client.get("/export", headers=header).status_code == 200
+    assert service_client.get("/audit", headers=header).status_code == 401
+    assert service_client.get("/read").status_code == 401
@@ -0,0 +1,103 @@
+import threading
+import time
+from typing import Callable
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from pytest import MonkeyPatch
+from sqlalchemy.orm import Session
+
+from authz.catalog import PermissionCatalog
+from authz.changes import Change
+from authz.decisions import DecisionCache, decisions
+from core.config import get_settings
+from db.session import get_test_engine
+from main import app
+from tests.conftest import AdminLogin, QueryCounter
+
+client = TestClient(app)
+
+
+def test_repeated_checks_are_cached(
+    db: Session, admin_login: Callable[..., AdminLogin]
+) -> None:
+    token = admin_login().token
+    allowed = {"permissions": ["setting.read", "setting.update"], "token": token}
+    denied = {"permissions": ["setting.export"], "token": token}
+    assert client.post("/api/v1/auth", json=allowed).status_code == 201
+    assert client.post("/api/v1/auth", json=denied).status_code == 401
+
+    with QueryCounter(get_test_engine()) as counter:
+        # the permission order does not matter
+        allowed["permissions"].reverse()
+        assert client.post("/api/v1/auth", json=allowed).status_code == 201
+        assert client.post("/api/v1/auth", json=denied).status_code == 401
+    assert counter.count == 0
+
+
+def test_invalidated_on_change(
+    db: Session, admin_login: Callable[..., AdminLogin]
+) -> None:
+    token = admin_login().token
+    header = {"authorization": f"Bearer {token}"}
+    body = {"permissions": ["setting.update"], "token": token}
+    assert client.post("/api/v1/auth", json=body).status_code == 201
+
+    r = client.get("/api/v1/rbac/permission", headers=header)
+    permission = next(p for p in r.json() if p["name"] == "setting.update")
+    client.patch(
+        f"/api/v1/rbac/permission/{permission['id']}",
+        json={"name": "setting.edit"},
+        headers=header,
+    )
+    assert client.post("/api/v1/auth", json=body).status_code == 401
+
+
+def test_not_cached_without_listener(
+    db: Session, monkeypatch: MonkeyPatch, admin_login: Callable[..., AdminLogin]
+) -> None:
+    monkeypatch.setattr(get_settings(), "AUTHZ_CACHE", False)
+    token = admin_login().token
+    body = {"permissions": ["setting.read"], "token": token}
+    client.post("/api/v1/auth", json=body)
+    key = decisions.key(token, ["setting.read"], "all", decisions.version())
+    assert decisions.get(key) is None
+
+
+def test_ttl_capped_at_exp() -> None:
+    cache = DecisionCache(PermissionCatalog(), ttl=60)
+    key = cache.key("token", ["a"], "all", cache.version())
+    cache.set(key, True, {"exp": time.time() - 1})
+    assert cache.get(key) is None
+    cache.set(key, True, {"exp": time.time() + 0.05})
+    assert cache.get(key) is True
+    time.sleep(0.06)
+    assert cache.get(key) is None
+
+
+def test_bounded_and_versioned() -> None:
+    catalog = PermissionCatalog()
+    cache = DecisionCache(catalog, max_entries=2)
+    keys = [cache.key(f"token{i}", ["a"], "all", cache.version()) for i in range(3)]
+    for key in keys:
+        cache.set(key, False, {})
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) is False
+
+    stale = cache.key("token", ["a"], "all", cache.version())
+    catalog.apply(Change("role", "update", {"id": str(uuid4())}))
+    cache.set(stale, True, {})
+    assert cache.get(stale) is None
+    fresh = cache.key("token", ["a"], "all", cache.version())
+    cache.set(fresh, True, {})
+    assert cache.get(fresh) is True
+    assert len(cache.entries) == 1
+
+
+def test_not_cached_while_listener_disconnected() -> None:
+    catalog = PermissionCatalog()
+    catalog.listening = threading.Event()
+    cache = DecisionCache(catalog)
+    key = cache.key("token", ["a"], "all", cache.version())
+    cache.set(key, True, {})
+    assert cache.get(key) is None
@@ -0,0 +1,71 @@
+import threading
+
+from sqlalchemy import text
+
+from authz.changes import Change, CHANNEL
+from authz.listener import ChangeListener
+from db.session import get_test_engine
+
+
+def notify(change: Change) -> None:
+    with get_test_engine().begin() as connection:
+        connection.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": change.to_json()},
+        )
+
+
+def test_listener_receives_changes() -> None:
+    received = []
+    event = threading.Event()
+
+    def on_change(change: Change) -> None:
+        received.append(change)
+        event.set()
+
+    resyncs = []
+    listener = ChangeListener(
+        get_test_engine(), on_change, lambda: resyncs.append(1), poll_interval=0.05
+    )
+    listener.start()
+    try:
+        assert listener.connected.wait(5)
+        assert listener._connection.get_dsn_parameters()["keepalives"] == "1"
+        change = Change(
+            "role", "delete", {"id": "0187c4a2-0000-7000-8000-000000000000"}
+        )
+        notify(change)
+        assert event.wait(5)
+    finally:
+        listener.stop()
+    assert received == [change]
+    assert resyncs == [1]
+
+
+def test_listener_resyncs_after_reconnect() -> None:
+    resynced = threading.Semaphore(0)
+    disconnects = []
+    listener = ChangeListener(
+        get_test_engine(),
+        lambda change: None,
+        resynced.release,
+        on_disconnect=lambda: disconnects.append(1),
+        poll_interval=0.05,
+        retry_interval=0.05,
+    )
+    listener.start()
+    try:
+        assert resynced.acquire(timeout=5)
+        with get_test_engine().begin() as connection:
+            connection.execute(
+                text(
+                    "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                    "WHERE query = :query AND datname = current_database() "
+                    "AND pid <> pg_backend_pid()"
+                ),
+                {"query": f"LISTEN {CHANNEL}"},
+            )
+        assert resynced.acquire(timeout=5)
+        assert disconnects == [1]
+    finally:
+        listener.stop()
@@ -0,0 +1,250 @@
+import os
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from authz.catalog import PermissionCatalog
+from authz.snapshot import (
+    dump_snapshot,
+    HEADER,
+    install_snapshot,
+    latest_change_id,
+    load_snapshot,
+    loads_snapshot,
+    read_graph,
+    SnapshotPublisher,
+    SnapshotStore,
+    write_snapshot,
+)
+import crud
+from db.session import get_test_engine
+from schemas.rbac import UserCreate
+from tests.conftest import QueryCounter
+
+
+def seed(db: Session) -> dict:
+    users = [
+        crud.rbac.create_user(
+            db, obj_in=UserCreate(email=f"user{i}@test.com", password="12345678")
+        )
+        for i in range(3)
+    ]
+    roles = [crud.rbac.create_role(db, role_name=f"role{i}") for i in range(2)]
+    permissions = crud.rbac.create_permissions(
+        db, permissions=["setting.read", "setting.update", "setting.delete"]
+    )
+    crud.rbac.create_role_has_permission(
+        db, role_id=roles[0].id, permission_ids=[obj.id for obj in permissions[:2]]
+    )
+    crud.rbac.create_role_has_permission(
+        db, role_id=roles[1].id, permission_ids=[obj.id for obj in permissions[1:]]
+    )
+    crud.rbac.create_user_has_role(db, user_id=users[0].id, role_id=roles[0].id)
+    crud.rbac.create_user_has_role(db, user_id=users[0].id, role_id=roles[1].id)
+    crud.rbac.create_user_has_role(db, user_id=users[1].id, role_id=roles[1].id)
+    return {"users": users, "roles": roles, "permissions": permissions}
+
+
+def test_snapshot_round_trip(db: Session, tmp_path) -> None:
+    data = seed(db)
+    path = str(tmp_path / "rbac.snapshot")
+    write_snapshot(path, read_graph(db.connection()), generation=7, built_at=1.5)
+
+    snapshot = load_snapshot(path)
+    assert snapshot.generation == 7
+    assert snapshot.built_at == 1.5
+    users, permissions = data["users"], data["permissions"]
+    names = {permission.id: permission.name for permission in permissions}
+    assert snapshot.get_user_permissions(users[0].id) == names
+    assert snapshot.get_user_permissions(users[1].id) == {
+        permission.id: permission.name for permission in permissions[1:]
+    }
+    assert snapshot.get_user_permissions(users[2].id) == {}
+    assert snapshot.get_user_permissions(data["roles"][0].id) == {}
+    assert snapshot.get_permissions([permissions[0].id, users[0].id]) == {
+        permissions[0].id: "setting.read"
+    }
+
+
+def test_catalog_reads_snapshot(db: Session, tmp_path) -> None:
+    data = seed(db)
+    path = str(tmp_path / "rbac.snapshot")
+    write_snapshot(path, read_graph(db.connection()), generation=1, built_at=0)
+    catalog = PermissionCatalog()
+    catalog.snapshots = SnapshotStore(path)
+    user_id = data["users"][0].id
+    with QueryCounter(db.get_bind()) as queries:
+        assert len(catalog.get_user_permissions(db, user_id)) == 3
+    assert queries.count == 0
+
+
+def test_catalog_reads_changed_ids_until_rebuilt(
+    db: Session, tmp_path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data = seed(db)
+    path = str(tmp_path / "rbac.snapshot")
+    write_snapshot(path, read_graph(db.connection()), generation=1, built_at=0)
+    catalog = PermissionCatalog()
+    catalog.snapshots = SnapshotStore(path, check_interval=0)
+    monkeypatch.setattr("authz.changes.subscribers", [catalog.apply])
+    users, roles = data["users"], data["roles"]
+    crud.rbac.delete_user_has_role(
+        db,
+        crud.rbac.get_user_has_role_by_user_id_and_role_id(
+            db, user_id=users[0].id, role_id=roles[1].id
+        ),
+    )
+    user = crud.rbac.create_user(
+        db, obj_in=UserCreate(email="new@test.com", password="12345678")
+    )
+    crud.rbac.create_user_has_role(db, user_id=user.id, role_id=roles[0].id)
+
+    assert len(catalog.get_user_permissions(db, users[0].id)) == 2
+    assert len(catalog.get_user_permissions(db, user.id)) == 2
+    with QueryCounter(db.get_bind()) as queries:
+        assert catalog.get_user_permissions(db, users[2].id) == {}
+    assert queries.count == 0
+
+    write_snapshot(path, read_graph(db.connection()), generation=2, built_at=0)
+    with QueryCounter(db.get_bind()) as queries:
+        assert len(catalog.get_user_permissions(db, users[0].id)) == 2
+        assert len(catalog.get_user_permissions(db, user.id)) == 2
+    assert queries.count == 0
+    assert catalog.snapshot_pending == {}
+
+
+def test_store_swaps_replaced_file(db: Session, tmp_path) -> None:
+    path = str(tmp_path / "rbac.snapshot")
+    store = SnapshotStore(path, check_interval=0)
+    assert store.get() is None
+
+    write_snapshot(path, read_graph(db.connection()), generation=1, built_at=0)
+    first = store.get()
+    assert first.generation == 1
+    seed(db)
+    write_snapshot(path, read_graph(db.connection()), generation=2, built_at=0)
+    second = store.get()
+    assert second.generation == 2
+    assert second.header.permissions == 3
+    # the old mapping stays readable for requests still using it
+    assert first.header.permissions == 0
+    assert os.listdir(tmp_path) == ["rbac.snapshot"]
+
+
+def test_publisher_skips_fresh_snapshot(tmp_path) -> None:
+    engine = get_test_engine()
+    path = str(tmp_path / "rbac.snapshot")
+    publisher = SnapshotPublisher(engine, path)
+    dirty_since = time.time()
+    assert publisher.publish(dirty_since)
+    assert load_snapshot(path).generation == 1
+    # another worker heard about the same change
+    assert not publisher.publish(dirty_since)
+    assert publisher.publish(time.time())
+    assert load_snapshot(path).generation == 2
+
+
+def test_publisher_thread(tmp_path) -> None:
+    path = str(tmp_path / "rbac.snapshot")
+    publisher = SnapshotPublisher(get_test_engine(), path, debounce=0.01)
+    publisher.start()
+    try:
+        deadline = time.monotonic() + 5
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        publisher.stop()
+    with get_test_engine().connect() as connection:
+        count = connection.execute(text("SELECT count(*) FROM permission")).scalar()
+    assert load_snapshot(path).header.permissions == count
+
+
+def test_export_and_install(db: Session, tmp_path) -> None:
+    data = seed(db)
+    graph = read_graph(db.connection())
+    raw = dump_snapshot(graph, generation=2, built_at=0)
+    compressed = dump_snapshot(graph, generation=2, built_at=0, compress=True)
+    assert len(compressed) < len(raw)
+
+    path = str(tmp_path / "rbac.snapshot")
+    write_snapshot(path, graph, generation=5, built_at=0)
+    installed = install_snapshot(path, compressed, graph.change_id, time.time())
+    with open(path, "rb") as f:
+        assert f.read()[HEADER.size :] == raw[HEADER.size :]
+    user_id = data["users"][0].id
+    assert load_snapshot(path).get_user_permissions(user_id) == (
+        loads_snapshot(raw).get_user_permissions(user_id)
+    )
+    # numbered after the file it replaced, whatever the export said
+    assert installed.generation == 6
+    assert installed.change_id == graph.change_id
+    assert sorted(installed.role_name(i) for i in range(installed.header.roles)) == [
+        "role0",
+        "role1",
+    ]
+
+
+def test_install_rejects_invalid(db: Session, tmp_path) -> None:
+    raw = dump_snapshot(read_graph(db.connection()), generation=1, built_at=0)
+    path = str(tmp_path / "rbac.snapshot")
+    for blob in [raw[:-16], b"RBACSNAP" + b"\0" * 100, b"not a snapshot" * 10]:
+        with pytest.raises(ValueError):
+            install_snapshot(path, blob, 0, time.time())
+    assert not os.path.exists(path)
+
+
+def test_install_rejects_stale(db: Session, tmp_path) -> None:
+    raw = dump_snapshot(read_graph(db.connection()), generation=1, built_at=0)
+    seed(db)
+    path = str(tmp_path / "rbac.snapshot")
+    with pytest.raises(ValueError):
+        install_snapshot(path, raw, latest_change_id(db.connection()), time.time())
+    assert not os.path.exists(path)
+
+
+def test_catalog_serves_imported_snapshot(db: Session, tmp_path) -> None:
+    data = seed(db)
+    graph = read_graph(db.connection())
+    # exported long ago, but it includes every change made so far
+    raw = dump_snapshot(graph, generation=0, built_at=0)
+    user_id = data["users"][0].id
+
+    # imported while the worker is running
+    path = str(tmp_path / "running.snapshot")
+    catalog = PermissionCatalog()
+    catalog.snapshots = SnapshotStore(path, check_interval=0)
+    catalog.resync(graph.change_id)
+    checked_at = time.time()
+    install_snapshot(path, raw, latest_change_id(db.connection()), checked_at)
+    with QueryCounter(db.get_bind()) as queries:
+        assert len(catalog.get_user_permissions(db, user_id)) == 3
+    assert queries.count == 0
+
+    # imported before the worker boots and resyncs
+    path = str(tmp_path / "cold.snapshot")
+    checked_at = time.time()
+    install_snapshot(path, raw, latest_change_id(db.connection()), checked_at)
+    catalog = PermissionCatalog()
+    catalog.snapshots = SnapshotStore(path, check_interval=0)
+    catalog.resync(latest_change_id(db.connection()))
+    with QueryCounter(db.get_bind()) as queries:
+        assert len(catalog.get_user_permissions(db, user_id)) == 3
+    assert queries.count == 0
+
+    # a later change still waits for a rebuild
+    catalog.resync(graph.change_id + 1)
+    assert catalog.snapshot() is None
+
+
+def test_publisher_skips_current_file(tmp_path) -> None:
+    engine = get_test_engine()
+    path = str(tmp_path / "rbac.snapshot")
+    publisher = SnapshotPublisher(engine, path)
+    assert publisher.publish(time.time())
+    change_id = load_snapshot(path).change_id
+    publisher.mark_stale(change_id)
+    assert publisher._dirty_since is None
+    publisher.mark_stale(change_id + 1)
+    assert publisher._dirty_since is not None
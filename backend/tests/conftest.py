@@ -1,21 +1,224 @@
-from typing import Generator
+from collections import defaultdict
+from dataclasses import dataclass
+import os
+from typing import Any, Callable, Generator
 
+from fastapi.testclient import TestClient
 import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
 
-from db.session import Base, test_engine, TestSessionLocal
+from api.deps import get_db, get_read_db, get_snapshot_db
+from authz.catalog import catalog
+from core.config import get_settings
+import crud
+from db.session import Base, get_test_engine, TestSessionLocal
+from main import app
+from models.rbac import Permission, User
+from schemas.rbac import UserCreate
+
+# the cost of bcrypt is not under test, the default 12 rounds dominate the suite
+get_settings().BCRYPT_ROUNDS = 4
+
+_connection: Connection | None = None
+
+
+def _create_worker_database(worker: str) -> None:
+    # clone a template holding the schema instead of running DDL per worker,
+    # the first worker of a run rebuilds the template under an advisory lock
+    settings = get_settings()
+    template = f"{settings.POSTGRES_TEST_DB}_template"
+    database = f"{settings.POSTGRES_TEST_DB}_{worker}"
+    testrun = os.environ.get("PYTEST_XDIST_TESTRUNUID", "")
+    admin_engine = create_engine(
+        settings.test_database_url, isolation_level="AUTOCOMMIT"
+    )
+    with admin_engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(hashtext(:t))"), t=template)
+        comment = connection.execute(
+            text(
+                "SELECT shobj_description(oid, 'pg_database') FROM pg_database "
+                "WHERE datname = :name"
+            ),
+            name=template,
+        ).scalar()
+        if comment != testrun:
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{template}"'))
+            connection.execute(text(f'CREATE DATABASE "{template}"'))
+            template_engine = create_engine(
+                settings.database_url(
+                    host=f"{settings.POSTGRES_HOST}:{settings.POSTGRES_TEST_PORT or settings.POSTGRES_PORT}",
+                    db=template,
+                )
+            )
+            Base.metadata.create_all(bind=template_engine)
+            template_engine.dispose()
+            connection.execute(
+                text(f"COMMENT ON DATABASE \"{template}\" IS '{testrun}'")
+            )
+        connection.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+        connection.execute(text(f'CREATE DATABASE "{database}" TEMPLATE "{template}"'))
+        connection.execute(text("SELECT pg_advisory_unlock(hashtext(:t))"), t=template)
+    admin_engine.dispose()
+    settings.POSTGRES_TEST_DB = database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def engine() -> Generator:
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        # a fresh clone of the template, dropped again at the end of the run
+        _create_worker_database(worker)
+    engine = get_test_engine()
+    if not worker:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    yield engine
+    if not worker:
+        Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if worker:
+        database = get_settings().POSTGRES_TEST_DB
+        get_settings().POSTGRES_TEST_DB = database.rsplit("_", 1)[0]
+        admin_engine = create_engine(
+            get_settings().test_database_url, isolation_level="AUTOCOMMIT"
+        )
+        with admin_engine.connect() as connection:
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+        admin_engine.dispose()
 
 
 @pytest.fixture()
-def db() -> Generator:
-    Base.metadata.create_all(bind=test_engine)
-    yield TestSessionLocal()
-    TestSessionLocal().close_all()
-    Base.metadata.drop_all(bind=test_engine)
+def db(engine: Engine) -> Generator:
+    # every test runs in one transaction that is rolled back, commits from the
+    # code under test only release a savepoint which is reopened right away.
+    # Requests get their own session on the same connection, like they would
+    # get their own session in production
+    global _connection
+    connection = engine.connect()
+    transaction = connection.begin()
+    connection.begin_nested()
+    _connection = connection
+    session = open_session(connection)
+    yield session
+    _connection = None
+    session.close()
+    transaction.rollback()
+    connection.close()
+    # rolled back rows must not outlive the test in the permission catalog
+    catalog.clear()
+
+
+def open_session(connection: Connection) -> Session:
+    session = TestSessionLocal(bind=connection)
+
+    @event.listens_for(session, "after_transaction_end")
+    def restart_savepoint(session, transaction):
+        if not connection.in_nested_transaction():
+            connection.begin_nested()
+
+    return session
 
 
 def override_get_db():
     try:
-        db = TestSessionLocal()
+        if _connection is not None:
+            db = open_session(_connection)
+        else:
+            db = TestSessionLocal()
         yield db
     finally:
         db.close()
+
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_snapshot_db] = override_get_db
+
+
+ADMIN_PERMISSIONS = [
+    "setting.create",
+    "setting.read",
+    "setting.update",
+    "setting.delete",
+]
+
+
+@dataclass
+class AdminLogin:
+    token: str
+    user: User
+    permissions: list[Permission]
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"authorization": f"Bearer {self.token}"}
+
+
+@pytest.fixture()
+def admin_login(db: Session) -> Callable[..., AdminLogin]:
+    # an admin user holding the given permissions through the admin role,
+    # logged in through the api
+    def login(permissions: list[str] = ADMIN_PERMISSIONS) -> AdminLogin:
+        email = "admin@test.com"
+        password = "12345678"
+        admin = UserCreate(email=email, password=password)
+        user = crud.rbac.create_user(db, obj_in=admin)
+        role = crud.rbac.create_role(db, role_name="admin")
+        crud.rbac.create_user_has_role(db, user_id=user.id, role_id=role.id)
+        db_objs = crud.rbac.create_permissions(db, permissions=permissions)
+        crud.rbac.create_role_has_permission(
+            db, role_id=role.id, permission_ids=[obj.id for obj in db_objs]
+        )
+
+        login_data = {"email": email, "password": password}
+        r = TestClient(app).post("/api/v1/auth/login", json=login_data)
+        return AdminLogin(token=r.json()["token"], user=user, permissions=db_objs)
+
+    return login
+
+
+class QueryCounter:
+    # savepoints come from the test transaction, not from the code under test
+    ignored = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self.statements: list[tuple[str, Any]] = []
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith(self.ignored):
+            self.statements.append((statement, parameters))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        # the same statement run again with other parameters is the N+1 shape
+        parameters = defaultdict(list)
+        for statement, params in self.statements:
+            parameters[statement].append(repr(params))
+        return {
+            statement: len(params)
+            for statement, params in parameters.items()
+            if len(params) >= threshold and len(set(params)) > 1
+        }
+
+    def assert_at_most(self, budget: int) -> None:
+        statements = "\n".join(statement for statement, _ in self.statements)
+        assert (
+            self.count <= budget
+        ), f"{self.count} statements over budget of {budget}:\n{statements}"
+
+    def assert_no_repeats(self, threshold: int = 2) -> None:
+        repeated = self.repeated(threshold)
+        assert not repeated, f"repeated statements: {repeated}"
@@ -1,8 +1,11 @@
 from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
+from pytest import MonkeyPatch
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from crud import rbac
+from core.config import get_settings
+from crud import crud_rbac, rbac
 from main import app
 from schemas.rbac import UserCreate
 
@@ -20,6 +23,17 @@ def test_create_user(db: Session) -> None:
     assert hasattr(user, "hashed_password")
 
 
+def test_create_duplicate_user_skips_hash(
+    db: Session, monkeypatch: MonkeyPatch
+) -> None:
+    user_in = UserCreate(email="random@test.com", password="secret")
+    rbac.create_user(db, obj_in=user_in)
+    hashed = []
+    monkeypatch.setattr(crud_rbac, "get_password_hash", hashed.append)
+    assert rbac.create_user(db, obj_in=user_in) is None
+    assert hashed == []
+
+
 # Role
 def test_create_role(db: Session) -> None:
     role_name = "admin"
@@ -27,6 +41,12 @@ def test_create_role(db: Session) -> None:
     assert role.name == role_name
 
 
+def test_create_duplicate_role(db: Session) -> None:
+    role_name = "admin"
+    rbac.create_role(db, role_name=role_name)
+    assert rbac.create_role(db, role_name=role_name) is None
+
+
 def test_get_role_by_name(db: Session) -> None:
     role_name = "admin"
     role1 = rbac.create_role(db, role_name=role_name)
@@ -81,3 +101,37 @@ def test_create_permissions(db: Session) -> None:
     db_objs = rbac.create_permissions(db, permissions=permissions)
     for i, db_obj in enumerate(db_objs):
         assert db_obj.name == permissions[i]
+
+
+def test_permission_ids_are_time_ordered(db: Session) -> None:
+    permissions = ["permission1", "permission2", "permission3"]
+    db_objs = rbac.create_permissions(db, permissions=permissions)
+    ids = [db_obj.id for db_obj in db_objs]
+    assert all(id.version == 7 for id in ids)
+    assert ids == sorted(ids)
+
+
+def test_server_default_id_is_uuid7(db: Session) -> None:
+    id = db.execute(
+        text("INSERT INTO role (name) VALUES ('raw') RETURNING id")
+    ).scalar()
+    db.commit()
+    assert id.version == 7
+
+
+def test_purge_refresh_tokens(db: Session, monkeypatch: MonkeyPatch) -> None:
+    user = rbac.create_user(
+        db, obj_in=UserCreate(email="user@test.com", password="12345678")
+    )
+    first = rbac.create_refresh_token(db, user.id)
+    _, _, second = rbac.rotate_refresh_token(db, first)
+    rbac.create_refresh_token(db, user.id)
+    monkeypatch.setattr(get_settings(), "REFRESH_TOKEN_EXPIRE_DAYS", -1)
+    rbac.create_refresh_token(db, user.id)
+    # the rotated token is kept to detect its reuse, the expired one is not
+    assert rbac.purge_refresh_tokens(db) == 1
+    monkeypatch.setattr(get_settings(), "REFRESH_TOKEN_REUSE_DETECTION_HOURS", -1)
+    assert rbac.purge_refresh_tokens(db) == 1
+    count = db.execute(text("SELECT count(*) FROM refresh_token")).scalar()
+    assert count == 2
+    assert rbac.rotate_refresh_token(db, second)
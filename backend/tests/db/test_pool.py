@@ -0,0 +1,65 @@
+from pydantic import ValidationError
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from core.config import Settings
+from db.pool import TimedQueuePool, engine_options, instrument, pool_status
+from db.session import get_test_engine
+
+
+def test_default_engine_options() -> None:
+    options = engine_options(Settings())
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_pre_ping"]
+    assert options["pool_size"] == 5
+
+
+def test_recycle_engine_options() -> None:
+    options = engine_options(
+        Settings(POSTGRES_POOL_LIVENESS="recycle", POSTGRES_POOL_SIZE=20)
+    )
+    assert not options["pool_pre_ping"]
+    assert options["pool_recycle"] == 1800
+    assert options["pool_size"] == 20
+    assert options["connect_args"]["keepalives"] == 1
+
+
+def test_pgbouncer_engine_options() -> None:
+    options = engine_options(Settings(POSTGRES_PGBOUNCER=True))
+    assert options["poolclass"] is NullPool
+    assert not options["pool_pre_ping"]
+
+
+def test_unknown_liveness() -> None:
+    with pytest.raises(ValidationError):
+        Settings(POSTGRES_POOL_LIVENESS="never")
+
+
+def test_pool_status() -> None:
+    engine = instrument(
+        create_engine(get_test_engine().url, poolclass=TimedQueuePool, pool_size=2)
+    )
+    with engine.connect() as connection:
+        status = pool_status(engine)
+        assert status["checked_out"] == 1
+        assert status["checkouts"] == 1
+    status = pool_status(engine)
+    assert status["checked_out"] == 0
+    assert status["checked_in"] == 1
+    assert status["wait_seconds_total"] >= 0
+    assert status["wait_buckets"][-1] == ("+Inf", 1)
+    engine.dispose()
+
+
+def test_closed_connection_is_replaced() -> None:
+    engine = instrument(
+        create_engine(get_test_engine().url, poolclass=TimedQueuePool, pool_size=1)
+    )
+    with engine.connect() as connection:
+        dbapi_connection = connection.connection.dbapi_connection
+    dbapi_connection.close()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert connection.connection.dbapi_connection is not dbapi_connection
+    engine.dispose()
@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from db.replica import ReplicaRouter
+from db.session import get_test_engine, TestSessionLocal
+
+
+def test_route_to_healthy_replica() -> None:
+    test_engine = get_test_engine()
+    router = ReplicaRouter([test_engine], fallback=TestSessionLocal)
+    db = router()
+    assert db.get_bind() is test_engine
+    assert router.get_lag(test_engine) == 0
+    db.close()
+
+
+def test_fallback_when_replica_lags() -> None:
+    test_engine = get_test_engine()
+    router = ReplicaRouter([test_engine], fallback=lambda: None, max_lag=-1)
+    assert router() is None
+
+
+def test_fallback_when_replica_unavailable() -> None:
+    test_engine = get_test_engine()
+    engine = create_engine("postgresql+psycopg2://postgres@127.0.0.1:1/rbac")
+    router = ReplicaRouter([engine], fallback=TestSessionLocal)
+    db = router()
+    assert isinstance(db, Session)
+    assert db.get_bind() is test_engine
+    assert not router.is_healthy(engine)
+    db.close()
+
+
+def test_round_robin_skips_unhealthy_replica() -> None:
+    test_engine = get_test_engine()
+    engine = create_engine("postgresql+psycopg2://postgres@127.0.0.1:1/rbac")
+    router = ReplicaRouter([engine, test_engine], fallback=lambda: None)
+    for _ in range(3):
+        db = router()
+        assert db.get_bind() is test_engine
+        db.close()
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from pytest import MonkeyPatch
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from main import app
+from utils.admission import LoopLagMonitor, is_low_priority, loop_monitor
+
+client = TestClient(app)
+
+
+def test_is_low_priority() -> None:
+    assert is_low_priority("POST", "/api/v1/auth/login")
+    assert is_low_priority("GET", "/api/v1/rbac/role")
+    assert not is_low_priority("POST", "/api/v1/auth")
+    assert not is_low_priority("POST", "/api/v1/rbac/role")
+    assert not is_low_priority("GET", "/metrics")
+
+
+def test_shed_on_in_flight(db: Session, monkeypatch: MonkeyPatch) -> None:
+    # the request itself is in flight
+    monkeypatch.setattr(get_settings(), "ADMISSION_MAX_IN_FLIGHT", 0)
+    monkeypatch.setattr(get_settings(), "ADMISSION_RETRY_AFTER", 3)
+
+    r = client.get("/api/v1/rbac/role")
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "3"
+    r = client.post(
+        "/api/v1/auth/login", json={"email": "admin@test.com", "password": "12345678"}
+    )
+    assert r.status_code == 503
+
+    r = client.post("/api/v1/auth", json={"permissions": [], "token": "invalid"})
+    assert r.status_code == 401
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert 'http_requests_shed_total{reason="in_flight"}' in r.text
+
+
+def test_shed_on_loop_lag(db: Session, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "ADMISSION_MAX_LOOP_LAG_MS", 100)
+    monkeypatch.setattr(loop_monitor, "lag", 0.2)
+    r = client.get("/api/v1/rbac/role")
+    assert r.status_code == 503
+    r = client.post("/api/v1/auth", json={"permissions": [], "token": "invalid"})
+    assert r.status_code == 401
+
+    monkeypatch.setattr(loop_monitor, "lag", 0.05)
+    r = client.get("/api/v1/rbac/role")
+    assert r.status_code == 401
+
+
+def test_loop_lag_monitor() -> None:
+    async def run() -> tuple[float, float]:
+        monitor = LoopLagMonitor(interval=0.01)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)
+        blocked = monitor.current_lag()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return blocked, monitor.lag
+
+    blocked, lag = asyncio.run(run())
+    assert blocked >= 0.15
+    assert lag < 0.15
@@ -0,0 +1,85 @@
+from typing import Callable, Generator
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from pytest import MonkeyPatch
+from sqlalchemy.orm import Session
+
+from api.deps import get_db, get_read_db
+from main import app, uvicorn_exception_handler
+from tests.conftest import AdminLogin
+from utils.auth import build_manifest, PermissionRequirement, require_permissions
+from utils.exception import UvicornException
+
+client = TestClient(app)
+
+
+def test_reject_before_session(monkeypatch: MonkeyPatch) -> None:
+    opened = []
+
+    def open_session() -> Generator:
+        opened.append(True)
+        yield None
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, open_session)
+    monkeypatch.setitem(app.dependency_overrides, get_read_db, open_session)
+    r = client.get("/api/v1/rbac/role")
+    assert r.status_code == 401
+    assert r.json()["error"] == "header does not start with Bearer"
+    r = client.post(
+        "/api/v1/rbac/role",
+        json={"name": "test"},
+        headers={"authorization": "Bearer invalid"},
+    )
+    assert r.status_code == 401
+    assert opened == []
+
+
+def test_require_permissions_mode(
+    db: Session, admin_login: Callable[..., AdminLogin]
+) -> None:
+    header = admin_login(["setting.read"]).headers
+
+    service = FastAPI()
+
+    @service.get("/all", dependencies=[require_permissions("setting.read", "x.y")])
+    def read_all() -> dict:
+        return {}
+
+    @service.get(
+        "/any", dependencies=[require_permissions("setting.read", "x.y", mode="any")]
+    )
+    def read_any() -> dict:
+        return {}
+
+    service.dependency_overrides = app.dependency_overrides
+    service.add_exception_handler(UvicornException, uvicorn_exception_handler)
+    service_client = TestClient(service)
+    r = service_client.get("/all", headers=header)
+    assert r.status_code == 401
+    assert r.json()["error"] == "user does not have permission"
+    assert service_client.get("/any", headers=header).status_code == 200
+
+    with pytest.raises(ValueError):
+        PermissionRequirement(["setting.read"], mode="some")
+
+
+def test_read_manifest(db: Session, admin_login: Callable[..., AdminLogin]) -> None:
+    header = admin_login(["setting.read"]).headers
+    r = client.get("/api/v1/auth/manifest", headers=header)
+    assert r.status_code == 200
+    manifest = r.json()
+    assert manifest == build_manifest(app)
+    assert {
+        "path": "/api/v1/rbac/role/{id}",
+        "methods": ["PATCH"],
+        "permissions": ["setting.update"],
+        "mode": "all",
+    } in manifest
+    paths = {entry["path"] for entry in manifest}
+    assert "/api/v1/auth/login" not in paths
+    assert "/api/v1/auth/manifest" in paths
+
+    r = client.get("/api/v1/auth/manifest")
+    assert r.status_code == 401
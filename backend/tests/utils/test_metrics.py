@@ -0,0 +1,71 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+import crud
+from main import app
+from schemas.rbac import UserCreate
+from utils.metrics import request_stats, RequestStats
+
+client = TestClient(app)
+
+
+def test_metrics(db: Session) -> None:
+    email = "admin@test.com"
+    password = "12345678"
+    crud.rbac.create_user(db, obj_in=UserCreate(email=email, password=password))
+    labels = {"method": "POST", "route": "/api/v1/auth/login"}
+    before = REGISTRY.get_sample_value("http_request_sql_statements_sum", labels) or 0
+
+    r = client.post("/api/v1/auth/login", json={"email": email, "password": password})
+    token = r.json()["token"]
+    r = client.post("/api/v1/auth", json={"permissions": [], "token": token})
+    assert r.status_code == 201
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert 'route="/api/v1/auth/login"' in r.text
+    assert (
+        REGISTRY.get_sample_value(
+            "http_request_duration_seconds_count", {**labels, "status": "201"}
+        )
+        >= 1
+    )
+    assert REGISTRY.get_sample_value("http_request_sql_statements_sum", labels) > before
+    assert REGISTRY.get_sample_value("auth_checks_total", {"outcome": "allowed"}) >= 1
+    assert "http_requests_in_flight 1.0" in r.text
+    assert 'db_pool_checked_out{engine="test"}' in r.text
+    assert "# TYPE db_pool_checkouts_total counter" in r.text
+    assert 'db_pool_checkout_wait_duration_seconds_bucket{engine="test",le="+Inf"}' in (
+        r.text
+    )
+
+
+def test_metrics_unmatched_route() -> None:
+    client.get("/not-found")
+    assert (
+        REGISTRY.get_sample_value(
+            "http_request_duration_seconds_count",
+            {"method": "GET", "route": "unmatched", "status": "404"},
+        )
+        >= 1
+    )
+
+
+def test_failed_statement_leaves_no_timing(db: Session) -> None:
+    stats = RequestStats({"type": "http", "method": "GET"})
+    token = request_stats.set(stats)
+    try:
+        for _ in range(3):
+            with pytest.raises(DBAPIError):
+                with db.begin_nested():
+                    db.execute(text("SELECT 1 / 0"))
+        db.execute(text("SELECT 1"))
+    finally:
+        request_stats.reset(token)
+    info = db.connection().info
+    assert not [key for key in info if key.endswith("start_time")]
+    assert stats.statements >= 1
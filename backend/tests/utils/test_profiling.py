@@ -0,0 +1,68 @@
+import os
+
+from fastapi.testclient import TestClient
+from pytest import MonkeyPatch
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+import crud
+from main import app
+from schemas.rbac import UserCreate
+
+client = TestClient(app)
+
+
+def login(db: Session, headers: dict[str, str] = {}):
+    email = "admin@test.com"
+    password = "12345678"
+    crud.rbac.create_user(db, obj_in=UserCreate(email=email, password=password))
+    return client.post(
+        "/api/v1/auth/login",
+        json={"email": email, "password": password},
+        headers=headers,
+    )
+
+
+def test_profile_inline(db: Session, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "PROFILE_TOKEN", "profile-secret")
+    # enough rounds for bcrypt to stay among the top entries of the profile
+    monkeypatch.setattr(get_settings(), "BCRYPT_ROUNDS", 8)
+    r = login(db, {"X-Profile": "profile-secret", "X-Profile-Output": "inline"})
+    assert r.status_code == 201
+    body = r.json()
+    assert body["status_code"] == 201
+    assert "token" in body["response"]
+    assert "verify_password" in body["profile"]
+    assert any('FROM "user"' in query["statement"] for query in body["sql"])
+    assert r.headers["x-profile-id"] == body["id"]
+
+
+def test_profile_file(db: Session, monkeypatch: MonkeyPatch, tmp_path) -> None:
+    monkeypatch.setattr(get_settings(), "PROFILE_TOKEN", "profile-secret")
+    monkeypatch.setattr(get_settings(), "PROFILE_DIR", str(tmp_path))
+    r = login(db, {"X-Profile": "profile-secret"})
+    assert r.status_code == 201
+    assert "token" in r.json()
+    name = r.headers["x-profile-id"]
+    assert sorted(os.listdir(tmp_path)) == [f"{name}.json", f"{name}.prof"]
+
+
+def test_profile_sampled(db: Session, monkeypatch: MonkeyPatch, tmp_path) -> None:
+    monkeypatch.setattr(get_settings(), "PROFILE_SAMPLE_RATE", 1)
+    monkeypatch.setattr(get_settings(), "PROFILE_DIR", str(tmp_path))
+    r = login(db)
+    assert r.status_code == 201
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_profile_rejects_wrong_token(db: Session, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "PROFILE_TOKEN", "profile-secret")
+    r = login(db, {"X-Profile": "wrong", "X-Profile-Output": "inline"})
+    assert r.status_code == 201
+    assert "x-profile-id" not in r.headers
+    assert "token" in r.json()
+
+
+def test_profile_disabled_without_token(db: Session) -> None:
+    r = login(db, {"X-Profile": "", "X-Profile-Output": "inline"})
+    assert "x-profile-id" not in r.headers
@@ -0,0 +1,44 @@
+from uuid import uuid4
+
+import pytest
+
+from core.config import get_settings
+from utils import security
+
+
+def test_password_hash_uses_configured_rounds(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "BCRYPT_ROUNDS", 5)
+    hashed_password = security.get_password_hash("secret")
+    assert security.get_hash_rounds(hashed_password) == 5
+    assert security.verify_password("secret", hashed_password)
+    assert not security.needs_rehash(hashed_password)
+
+
+def test_needs_rehash(monkeypatch: pytest.MonkeyPatch) -> None:
+    hashed_password = security.get_password_hash("secret", rounds=4)
+    monkeypatch.setattr(get_settings(), "BCRYPT_ROUNDS", 5)
+    assert security.needs_rehash(hashed_password)
+
+
+def test_jwt_round_trip() -> None:
+    permission_ids = [uuid4(), uuid4()]
+    token = security.generate_jwt(permission_ids, "admin@test.com")
+    payload = security.verify_jwt(token)
+    assert payload["email"] == "admin@test.com"
+    assert payload["permissions"] == [str(id) for id in permission_ids]
+
+
+def test_api_key_format() -> None:
+    prefix, key = security.generate_api_key()
+    assert key.startswith(security.API_KEY_PREFIX)
+    assert security.get_api_key_prefix(key) == prefix
+    assert security.get_api_key_prefix("rbac_short_secret") is None
+    assert security.get_api_key_prefix(f"rbac_{prefix}_") is None
+    # a well formed key with a forged tag
+    body, _, tag = key.rpartition("_")
+    forged = "0" * len(tag) if tag != "0" * len(tag) else "1" * len(tag)
+    assert security.get_api_key_prefix(f"{body}_{forged}") is None
+    assert security.get_api_key_prefix(f"rbac_{prefix}_x") is None
+    assert security.get_api_key_prefix("eyJhbGciOiJIUzI1NiJ9") is None
+    assert security.keyed_hash(key) == security.keyed_hash(key)
+    assert security.keyed_hash(key) != security.keyed_hash(key + "x")
@@ -0,0 +1,91 @@
+import json
+import logging
+
+from fastapi.testclient import TestClient
+import pytest
+from pytest import LogCaptureFixture, MonkeyPatch
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+import crud
+from main import app
+from schemas.rbac import UserCreate
+from utils.slow_query import explain
+
+client = TestClient(app)
+
+
+def slow_queries(caplog: LogCaptureFixture) -> list[dict]:
+    return [
+        json.loads(record.message)
+        for record in caplog.records
+        if record.name == "slow_query"
+    ]
+
+
+def test_slow_query_log(
+    db: Session, monkeypatch: MonkeyPatch, caplog: LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(get_settings(), "SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr(get_settings(), "SLOW_QUERY_EXPLAIN", True)
+    caplog.set_level(logging.WARNING, logger="slow_query")
+
+    crud.rbac.get_user_by_email(db, "admin@test.com")
+
+    [record] = slow_queries(caplog)
+    assert record["caller"] == "CRUDRbac.get_user_by_email"
+    assert record["route"] is None
+    assert record["plan"][0]["Plan"]["Node Type"] == "Limit"
+
+
+def test_slow_query_log_route(
+    db: Session, monkeypatch: MonkeyPatch, caplog: LogCaptureFixture
+) -> None:
+    crud.rbac.create_user(
+        db, obj_in=UserCreate(email="admin@test.com", password="12345678")
+    )
+    monkeypatch.setattr(get_settings(), "SLOW_QUERY_THRESHOLD_MS", 0)
+    caplog.set_level(logging.WARNING, logger="slow_query")
+
+    client.post(
+        "/api/v1/auth/login",
+        json={"email": "admin@test.com", "password": "12345678"},
+    )
+
+    records = slow_queries(caplog)
+    assert records
+    assert {record["route"] for record in records} == {"/api/v1/auth/login"}
+    assert "CRUDRbac.get_user_by_email" in {record["caller"] for record in records}
+    assert all("plan" not in record for record in records)
+
+
+def test_slow_query_explain_error_keeps_transaction(db: Session) -> None:
+    plan = explain(db.connection().connection, "SELECT * FROM missing", None)
+    assert "missing" in plan["error"]
+    assert db.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_slow_query_below_threshold(
+    db: Session, monkeypatch: MonkeyPatch, caplog: LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(get_settings(), "SLOW_QUERY_THRESHOLD_MS", 60_000)
+    caplog.set_level(logging.WARNING, logger="slow_query")
+    crud.rbac.get_user_by_email(db, "admin@test.com")
+    assert slow_queries(caplog) == []
+
+
+def test_slow_query_failed_statement(
+    db: Session, monkeypatch: MonkeyPatch, caplog: LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(get_settings(), "SLOW_QUERY_THRESHOLD_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="slow_query"):
+        with pytest.raises(DBAPIError):
+            with db.begin_nested():
+                db.execute(text("SELECT 1 / 0"))
+        db.execute(text("SELECT 2"))
+    assert not [key for key in db.connection().info if key.endswith("start_time")]
+    statements = [record["statement"] for record in slow_queries(caplog)]
+    assert "SELECT 1 / 0" not in statements
+    assert "SELECT 2" in statements
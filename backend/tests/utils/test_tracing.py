@@ -0,0 +1,102 @@
+import json
+from typing import Callable, Generator
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.orm import Session
+
+from authz.catalog import catalog
+from main import app
+from tests.conftest import AdminLogin
+from utils import tracing
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def exporter() -> Generator:
+    exporter = tracing.InMemoryExporter()
+    tracing.exporters.append(exporter)
+    yield exporter
+    tracing.exporters.remove(exporter)
+
+
+def test_request_spans(
+    db: Session,
+    exporter: tracing.InMemoryExporter,
+    admin_login: Callable[..., AdminLogin],
+) -> None:
+    token = admin_login().token
+    catalog.clear()
+    exporter.spans.clear()
+    parent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    r = client.post(
+        "/api/v1/auth",
+        json={"permissions": ["setting.read"], "token": token},
+        headers={"traceparent": parent},
+    )
+    assert r.status_code == 201
+
+    [request] = exporter.find("POST /api/v1/auth")
+    [verify] = exporter.find("jwt.verify")
+    [check] = exporter.find("auth.check_permissions")
+    [lookup] = exporter.find("CRUDRbac.get_permissions_by_ids")
+    assert request.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert request.parent_id == "b7ad6b7169203331"
+    assert request.attributes["http.status_code"] == 201
+    assert {span.trace_id for span in exporter.spans} == {request.trace_id}
+    assert verify.parent_id == request.span_id
+    assert check.parent_id == request.span_id
+    assert lookup.parent_id == check.span_id
+    assert r.headers["traceparent"] == request.traceparent
+
+
+def test_login_spans(
+    db: Session,
+    exporter: tracing.InMemoryExporter,
+    admin_login: Callable[..., AdminLogin],
+) -> None:
+    admin_login()
+    [request] = exporter.find("POST /api/v1/auth/login")
+    [authenticate] = exporter.find("CRUDRbac.authenticate")
+    [verify] = exporter.find("bcrypt.verify")
+    assert authenticate.parent_id == request.span_id
+    assert verify.parent_id == authenticate.span_id
+    assert verify.duration_ms > 0
+
+
+def test_error_span(exporter: tracing.InMemoryExporter) -> None:
+    r = client.post("/api/v1/auth", json={"permissions": [], "token": "invalid"})
+    assert r.status_code == 401
+    [verify] = exporter.find("jwt.verify")
+    assert verify.status == "error"
+    assert verify.attributes["exception"] == "UvicornException"
+    assert "traceparent" in r.headers
+
+
+def test_invalid_traceparent(exporter: tracing.InMemoryExporter) -> None:
+    client.get(
+        "/metrics", headers={"traceparent": "00-" + "0" * 32 + "-" + "0" * 16 + "-01"}
+    )
+    [request] = exporter.find("GET /metrics")
+    assert request.parent_id is None
+    assert request.trace_id != "0" * 32
+
+
+def test_file_exporter(tmp_path) -> None:
+    path = tmp_path / "traces.jsonl"
+    tracing.configure("file", str(path))
+    try:
+        with tracing.span("outer"):
+            with tracing.span("inner", key="value"):
+                pass
+    finally:
+        tracing.configure(None, "")
+    inner, outer = [json.loads(line) for line in path.read_text().splitlines()]
+    assert inner["parent_id"] == outer["span_id"]
+    assert inner["attributes"] == {"key": "value"}
+
+
+def test_no_exporter() -> None:
+    with tracing.span("unused") as span:
+        assert span is None
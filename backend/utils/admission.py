@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import get_settings
+from utils.metrics import EVENT_LOOP_LAG, REQUESTS_SHED
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.lag = 0.0
+        self._expected: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._expected = None
+
+    async def _run(self) -> None:
+        while True:
+            self._expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, time.perf_counter() - self._expected)
+            EVENT_LOOP_LAG.set(self.lag)
+
+    def current_lag(self) -> float:
+        # a blocked loop cannot finish its sample, count the overdue wakeup too
+        if self._expected is None:
+            return self.lag
+        return max(self.lag, time.perf_counter() - self._expected)
+
+
+loop_monitor = LoopLagMonitor()
+
+
+def is_low_priority(method: str, path: str) -> bool:
+    # authorization checks are on the critical path of every other service,
+    # lists and logins can be retried by a person
+    if method == "POST" and path == "/api/v1/auth/login":
+        return True
+    return method == "GET" and path.startswith("/api/v1/")
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp, monitor: LoopLagMonitor = loop_monitor) -> None:
+        self.app = app
+        self.monitor = monitor
+        self.in_flight = 0
+
+    def overload(self) -> str | None:
+        settings = get_settings()
+        max_lag = settings.ADMISSION_MAX_LOOP_LAG_MS
+        if max_lag is not None and self.monitor.current_lag() * 1000 > max_lag:
+            return "loop_lag"
+        max_in_flight = settings.ADMISSION_MAX_IN_FLIGHT
+        if max_in_flight is not None and self.in_flight > max_in_flight:
+            return "in_flight"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            if is_low_priority(scope["method"], scope["path"]):
+                reason = self.overload()
+                if reason:
+                    REQUESTS_SHED.labels(reason).inc()
+                    response = JSONResponse(
+                        status_code=503,
+                        content={"message": "server is overloaded, try again later"},
+                        headers={
+                            "Retry-After": str(get_settings().ADMISSION_RETRY_AFTER)
+                        },
+                    )
+                    await response(scope, receive, send)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -1,26 +1,145 @@
-from fastapi.responses import JSONResponse
+from datetime import datetime, timezone
+import hmac
+from typing import Any, Collection, Iterable
+from uuid import UUID
+
+from fastapi import Depends, FastAPI, Header
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
 
-from api.api_v1.endpoints import auth
-from schemas.token import Token
+from api.deps import get_db
+from authz.catalog import catalog
+from authz.check import is_allowed
+from utils import security
 from utils.exception import UvicornException
+from utils.metrics import AUTH_CHECKS
+from utils.tracing import span
 
 
-async def verify_permission(
-    db: Session, authorization: str | None, permissions: list[str]
-) -> bool:
+def get_token_payload(
+    authorization: str | None = Header(default=None),
+) -> dict[str, Any]:
     if not authorization or not authorization.startswith("Bearer "):
+        AUTH_CHECKS.labels("missing_token").inc()
         raise UvicornException(
             status_code=401,
             message="user is not authorized",
             error="header does not start with Bearer",
         )
-    token = authorization.split("Bearer ")[1]
-    res = await auth.auth(Token(permissions=permissions, token=token), db=db)
-    if type(res) == JSONResponse and res.status_code == 401:
+    token = authorization[7:]
+    if token.startswith(security.API_KEY_PREFIX):
+        # api keys are checked against the database with the session, only
+        # once their tag shows they were issued here
+        if security.get_api_key_prefix(token) is None:
+            AUTH_CHECKS.labels("invalid_token").inc()
+            raise UvicornException(
+                status_code=401,
+                message="user is not authorized",
+                error="api key is invalid, expired or revoked",
+            )
+        return {"api_key": token}
+    try:
+        return security.verify_jwt(token)
+    except UvicornException:
+        AUTH_CHECKS.labels("invalid_token").inc()
+        raise
+
+
+def verify_api_key(db: Session, key: str) -> dict[str, Any]:
+    # one indexed lookup by prefix, cached in the catalog, and a keyed hash.
+    # Returns a payload shaped like the jwt payload
+    prefix = security.get_api_key_prefix(key)
+    entry = prefix and catalog.get_api_key(db, prefix)
+    now = datetime.now(tz=timezone.utc)
+    if (
+        not entry
+        or not hmac.compare_digest(entry.key_hash, security.keyed_hash(key))
+        or (entry.expires_at and entry.expires_at <= now)
+    ):
+        AUTH_CHECKS.labels("invalid_token").inc()
         raise UvicornException(
             status_code=401,
             message="user is not authorized",
-            error="user does not have permission",
+            error="api key is invalid, expired or revoked",
         )
-    return True
+    permissions = catalog.get_user_permissions(db, user_id=entry.user_id)
+    payload = {"permissions": [str(id) for id in permissions]}
+    if entry.expires_at:
+        payload["exp"] = entry.expires_at.timestamp()
+    return payload
+
+
+def authorize(
+    db: Session,
+    payload: dict[str, Any],
+    permissions: Collection[str],
+    mode: str = "all",
+) -> bool:
+    # permissions are served from the catalog, misses are read from the
+    # primary so they cannot race an invalidation
+    with span("auth.check_permissions", permissions=len(permissions)):
+        permission_names = catalog.get_permission_names(
+            db, [UUID(permission_id) for permission_id in payload["permissions"]]
+        )
+        allowed = is_allowed(permission_names, permissions, mode)
+    AUTH_CHECKS.labels("allowed" if allowed else "denied").inc()
+    return allowed
+
+
+class PermissionRequirement:
+    # the token is checked before the session dependency is resolved, a
+    # request without a valid token never opens a session
+    def __init__(self, permissions: Iterable[str], mode: str = "all") -> None:
+        if mode not in ("all", "any"):
+            raise ValueError(f"unknown mode: {mode}")
+        self.permissions = frozenset(permissions)
+        self.mode = mode
+
+    async def __call__(
+        self,
+        payload: dict[str, Any] = Depends(get_token_payload),
+        db: Session = Depends(get_db),
+    ) -> dict[str, Any]:
+        if "api_key" in payload:
+            payload = verify_api_key(db, payload["api_key"])
+        allowed = authorize(db, payload, self.permissions, self.mode)
+        # a catalog miss was read from the primary, give the connection back
+        # instead of holding it for the rest of the request
+        db.close()
+        if not allowed:
+            raise UvicornException(
+                status_code=401,
+                message="user is not authorized",
+                error="user does not have permission",
+            )
+        return payload
+
+
+def require_permissions(*permissions: str, mode: str = "all") -> Any:
+    return Depends(PermissionRequirement(permissions, mode))
+
+
+def build_manifest(app: FastAPI) -> list[dict[str, Any]]:
+    manifest = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for dependency in route.dependant.dependencies:
+            requirement = dependency.call
+            if isinstance(requirement, PermissionRequirement):
+                manifest.append(
+                    {
+                        "path": route.path,
+                        "methods": sorted(route.methods),
+                        "permissions": sorted(requirement.permissions),
+                        "mode": requirement.mode,
+                    }
+                )
+    return manifest
+
+
+def get_manifest(app: FastAPI) -> list[dict[str, Any]]:
+    # compiled on startup, built on first use when startup did not run
+    if getattr(app.state, "permission_manifest", None) is None:
+        app.state.permission_manifest = build_manifest(app)
+    return app.state.permission_manifest
@@ -0,0 +1,175 @@
+from contextvars import ContextVar
+import time
+from typing import Any, Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import (
+    REGISTRY,
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    HistogramMetricFamily,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from db.pool import pool_status
+from db.session import built_engines
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served")
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements",
+    "SQL statements issued per request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_duration_seconds",
+    "Time spent in SQL per request",
+    ["method", "route"],
+)
+AUTH_CHECKS = Counter(
+    "auth_checks_total",
+    "Authorization checks by outcome",
+    ["outcome"],
+)
+AUTH_DECISION_CACHE = Counter(
+    "auth_decision_cache_total",
+    "Authorization decision cache lookups by result",
+    ["result"],
+)
+EVENT_LOOP_LAG = Gauge("event_loop_lag_seconds", "Event loop scheduling delay")
+REQUESTS_SHED = Counter(
+    "http_requests_shed_total",
+    "Low priority requests rejected with 503 by reason",
+    ["reason"],
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight",
+    "bcrypt hash and verify calls running or waiting to run",
+)
+
+
+class RequestStats:
+    def __init__(self, scope: Scope) -> None:
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+    @property
+    def method(self) -> str:
+        return self.scope["method"]
+
+    @property
+    def route(self) -> str:
+        # label by route template, raw paths would explode cardinality
+        route = self.scope.get("route")
+        return route.path if route else "unmatched"
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context, a statement that raises takes its start
+    # time with it instead of leaving it on the pooled connection
+    if context is not None:
+        context.query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "query_start_time", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats(scope)
+        token = request_stats.set(stats)
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            request_stats.reset(token)
+            method, route = stats.method, stats.route
+            REQUEST_LATENCY.labels(method, route, status).observe(elapsed)
+            REQUEST_SQL_STATEMENTS.labels(method, route).observe(stats.statements)
+            REQUEST_SQL_SECONDS.labels(method, route).observe(stats.sql_seconds)
+
+
+class PoolCollector:
+    def collect(self) -> Iterator[Any]:
+        families = {
+            "checked_out": GaugeMetricFamily(
+                "db_pool_checked_out", "Connections in use", labels=["engine"]
+            ),
+            "checked_in": GaugeMetricFamily(
+                "db_pool_checked_in", "Idle connections", labels=["engine"]
+            ),
+            "overflow": GaugeMetricFamily(
+                "db_pool_overflow", "Connections above pool size", labels=["engine"]
+            ),
+            "checkouts": CounterMetricFamily(
+                "db_pool_checkouts_total", "Connection checkouts", labels=["engine"]
+            ),
+            "timeouts": CounterMetricFamily(
+                "db_pool_timeouts_total", "Checkouts that timed out", labels=["engine"]
+            ),
+            "wait_seconds_total": CounterMetricFamily(
+                "db_pool_checkout_wait_seconds_total",
+                "Time spent waiting for a connection",
+                labels=["engine"],
+            ),
+        }
+        waits = HistogramMetricFamily(
+            "db_pool_checkout_wait_duration_seconds",
+            "Time spent waiting for a connection per checkout",
+            labels=["engine"],
+        )
+        for name, engine in built_engines().items():
+            status = pool_status(engine)
+            for key, family in families.items():
+                if key in status:
+                    family.add_metric([name], status[key])
+            if "wait_buckets" in status:
+                waits.add_metric(
+                    [name], status["wait_buckets"], status["wait_seconds_total"]
+                )
+        yield from families.values()
+        yield waits
+
+
+REGISTRY.register(PoolCollector())
@@ -0,0 +1,151 @@
+from contextvars import ContextVar
+import cProfile
+from datetime import datetime, timezone
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import get_settings
+
+sql_timeline: ContextVar[list[dict[str, Any]] | None] = ContextVar(
+    "sql_timeline", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and sql_timeline.get() is not None:
+        context.profile_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timeline = sql_timeline.get()
+    start = getattr(context, "profile_start_time", None)
+    if timeline is not None and start is not None:
+        timeline.append(
+            {
+                "start": start,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+                "statement": statement,
+            }
+        )
+
+
+class ProfilingMiddleware:
+    # cProfile follows the event loop thread, where the async handlers run,
+    # so concurrent requests leak into a profile and only one runs at a time
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.lock = threading.Lock()
+
+    def should_profile(self, headers: Headers) -> str | None:
+        settings = get_settings()
+        token = headers.get("x-profile")
+        if token and settings.PROFILE_TOKEN:
+            if hmac.compare_digest(token, settings.PROFILE_TOKEN):
+                if headers.get("x-profile-output") == "inline":
+                    return "inline"
+                return "file"
+        if (
+            settings.PROFILE_SAMPLE_RATE
+            and random.random() < settings.PROFILE_SAMPLE_RATE
+        ):
+            return "file"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        output = self.should_profile(Headers(scope=scope))
+        if not output or not self.lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.profile(scope, receive, send, output)
+        finally:
+            self.lock.release()
+
+    async def profile(
+        self, scope: Scope, receive: Receive, send: Send, output: str
+    ) -> None:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+        name = (
+            f"{datetime.now(tz=timezone.utc):%Y%m%dT%H%M%S%f}-{scope['method']}-{slug}"
+        )
+        start_message: Message = {}
+        body = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message
+            if output == "inline":
+                if message["type"] == "http.response.start":
+                    start_message = message
+                else:
+                    body.append(message.get("body", b""))
+                return
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("x-profile-id", name)
+            await send(message)
+
+        timeline: list[dict[str, Any]] = []
+        token = sql_timeline.set(timeline)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            sql_timeline.reset(token)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(50)
+        report = {
+            "id": name,
+            "method": scope["method"],
+            "path": scope["path"],
+            "duration_ms": elapsed_ms,
+            "sql_ms": sum(query["duration_ms"] for query in timeline),
+            "sql": [
+                {**query, "start": (query["start"] - start) * 1000}
+                for query in timeline
+            ],
+        }
+
+        if output == "file":
+            directory = get_settings().PROFILE_DIR
+            os.makedirs(directory, exist_ok=True)
+            profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+            with open(os.path.join(directory, f"{name}.json"), "w") as f:
+                json.dump(report, f, indent=2)
+            return
+
+        content = json.dumps(
+            {
+                **report,
+                "status_code": start_message["status"],
+                "response": b"".join(body).decode("utf-8", errors="replace"),
+                "profile": stream.getvalue(),
+            }
+        ).encode()
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        headers["content-type"] = "application/json"
+        headers["content-length"] = str(len(content))
+        headers["x-profile-id"] = name
+        await send({**start_message, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": content})
@@ -1,43 +1,104 @@
 from datetime import datetime, timedelta, timezone
-import os
+import hashlib
+import hmac
+import secrets
 from typing import Any
 from uuid import UUID
 
 import bcrypt
 import jwt
 
+from core.config import get_settings
 from utils.exception import UvicornException
+from utils.metrics import PASSWORD_HASH_IN_FLIGHT
+from utils.tracing import traced
 
 
-def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode()
+@traced("bcrypt.hash")
+@PASSWORD_HASH_IN_FLIGHT.track_inprogress()
+def get_password_hash(password: str, rounds: int | None = None) -> str:
+    rounds = rounds or get_settings().BCRYPT_ROUNDS
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode()
 
 
+@traced("bcrypt.verify")
+@PASSWORD_HASH_IN_FLIGHT.track_inprogress()
 def verify_password(password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
 
 
+def get_hash_rounds(hashed_password: str) -> int:
+    # $2b$<rounds>$<salt and hash>
+    return int(hashed_password.split("$")[2])
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    return get_hash_rounds(hashed_password) != get_settings().BCRYPT_ROUNDS
+
+
+@traced("jwt.generate")
 def generate_jwt(permission_ids: list[UUID], email: str) -> str:
     permission_ids = [str(permission_id) for permission_id in permission_ids]
     payload = {
         "iss": "full-stack-rbac",
-        "exp": datetime.now(tz=timezone.utc) + timedelta(days=1),
+        "exp": datetime.now(tz=timezone.utc)
+        + timedelta(minutes=get_settings().ACCESS_TOKEN_EXPIRE_MINUTES),
         "iat": datetime.now(tz=timezone.utc),
         "permissions": permission_ids,
         "email": email,
     }
     return jwt.encode(
         payload,
-        os.getenv("SECRET_KEY"),
+        get_settings().SECRET_KEY,
         algorithm="HS256",
     )
 
 
-def verify_jwt(token: str) -> dict[str, Any]:
+API_KEY_PREFIX = "rbac_"
+
+
+def generate_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def generate_api_key() -> tuple[str, str]:
+    # rbac_<prefix>_<secret>_<tag>, the prefix is stored in clear to find the
+    # key, the tag is keyed with SECRET_KEY so forged keys are rejected
+    # without a lookup
+    prefix = secrets.token_hex(6)
+    key = f"{API_KEY_PREFIX}{prefix}_{secrets.token_urlsafe(32)}"
+    return prefix, f"{key}_{api_key_tag(key)}"
+
+
+def api_key_tag(key: str) -> str:
+    return keyed_hash(f"api_key:{key}")[:12]
+
+
+def get_api_key_prefix(key: str) -> str | None:
+    # None unless the key carries a valid tag
+    if not key.startswith(API_KEY_PREFIX):
+        return None
+    body, _, tag = key.rpartition("_")
+    prefix, _, secret = body[len(API_KEY_PREFIX) :].partition("_")
+    if len(prefix) != 12 or not secret:
+        return None
+    return prefix if hmac.compare_digest(tag, api_key_tag(body)) else None
+
+
+def keyed_hash(token: str) -> str:
+    # refresh tokens and api keys are random, a keyed hash is enough and
+    # costs microseconds where bcrypt costs hundreds of milliseconds
+    return hmac.new(
+        get_settings().SECRET_KEY.encode(), token.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+@traced("jwt.verify")
+def verify_jwt(token: str, secret_key: str | None = None) -> dict[str, Any]:
     try:
         return jwt.decode(
             token,
-            os.getenv("SECRET_KEY"),
+            secret_key or get_settings().SECRET_KEY,
             algorithms=["HS256"],
             issuer="full-stack-rbac",
         )
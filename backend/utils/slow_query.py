@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.config import get_settings
+from utils.metrics import request_stats
+
+logger = logging.getLogger("slow_query")
+
+CRUD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "crud") + os.sep
+EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and get_settings().SLOW_QUERY_THRESHOLD_MS is not None:
+        context.slow_query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    settings = get_settings()
+    if settings.SLOW_QUERY_THRESHOLD_MS is None:
+        return
+    start = getattr(context, "slow_query_start_time", None)
+    if start is None:
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if elapsed_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    stats = request_stats.get()
+    record = {
+        "event": "slow_query",
+        "duration_ms": round(elapsed_ms, 3),
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "statement": statement,
+        "caller": find_caller(),
+        "method": stats.method if stats else None,
+        "route": stats.route if stats else None,
+    }
+    if settings.SLOW_QUERY_EXPLAIN and not executemany:
+        record["plan"] = explain(conn.connection, statement, parameters)
+    logger.warning(json.dumps(record, default=str))
+
+
+def find_caller() -> str | None:
+    # only walked on the slow path, stacks are deep inside SQLAlchemy
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(CRUD_DIR):
+            name = frame.f_code.co_name
+            owner = frame.f_locals.get("self")
+            return f"{type(owner).__name__}.{name}" if owner is not None else name
+        frame = frame.f_back
+    return None
+
+
+def explain(dbapi_connection: Any, statement: str, parameters: Any) -> Any:
+    if not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    # a fresh cursor on the same connection sees the same transaction, the
+    # savepoint keeps a failing EXPLAIN from aborting it
+    savepoint = not dbapi_connection.autocommit
+    cursor = dbapi_connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(
+                "EXPLAIN (ANALYZE off, FORMAT JSON) " + statement, parameters
+            )
+            plan = cursor.fetchone()[0]
+        except Exception as e:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return {"error": str(e)}
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    finally:
+        cursor.close()
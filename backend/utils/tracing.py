@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Iterator, TypeVar
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+F = TypeVar("F", bound=Callable[..., Any])
+T = TypeVar("T")
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.status = "ok"
+        self.start_time = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration_ms: float | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class InMemoryExporter:
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def find(self, name: str) -> list[Span]:
+        return [span for span in self.spans if span.name == name]
+
+
+class FileExporter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+exporters: list[Any] = []
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def configure(exporter: str | None, path: str) -> None:
+    exporters.clear()
+    if exporter == "file":
+        exporters.append(FileExporter(path))
+    elif exporter:
+        raise ValueError(f"unknown TRACE_EXPORTER: {exporter}")
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    match = TRACEPARENT.match(value or "")
+    if not match or match[1] == "0" * 32 or match[2] == "0" * 16:
+        return None
+    return match[1], match[2]
+
+
+@contextmanager
+def span(
+    name: str, parent: tuple[str, str] | None = None, **attributes: Any
+) -> Iterator[Span | None]:
+    # spans cost nothing while no exporter is configured
+    if not exporters:
+        yield None
+        return
+    if parent is None and (current := current_span.get()) is not None:
+        parent = current.trace_id, current.span_id
+    trace_id, parent_id = parent or (os.urandom(16).hex(), None)
+    new_span = Span(name, trace_id, parent_id, attributes)
+    token = current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.status = "error"
+        new_span.set_attribute("exception", type(e).__name__)
+        raise
+    finally:
+        current_span.reset(token)
+        new_span.end()
+        for exporter in exporters:
+            exporter.export(new_span)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def traced_methods(cls: type[T]) -> type[T]:
+    for name, value in list(vars(cls).items()):
+        if callable(value) and not name.startswith("_"):
+            setattr(cls, name, traced(f"{cls.__name__}.{name}")(value))
+    return cls
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not exporters:
+            await self.app(scope, receive, send)
+            return
+
+        parent = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        with span(
+            f"{scope['method']} {scope['path']}",
+            parent=parent,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        ) as request_span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                    MutableHeaders(scope=message)[
+                        "traceparent"
+                    ] = request_span.traceparent
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route:
+                    request_span.name = f"{scope['method']} {route.path}"
+                    request_span.set_attribute("http.route", route.path)
@@ -0,0 +1,33 @@
+import os
+import threading
+import time
+from uuid import UUID
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_rand_a = 0
+
+
+def uuid7() -> UUID:
+    # 48-bit unix ms timestamp | version 7 | 12-bit rand_a | variant | 62-bit rand_b
+    # rand_a is used as a counter within the same millisecond so ids stay ordered
+    global _last_ms, _last_rand_a
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _last_rand_a = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            ms = _last_ms
+            _last_rand_a += 1
+            if _last_rand_a > 0xFFF:
+                _last_ms = ms = ms + 1
+                _last_rand_a = 0
+        rand_a = _last_rand_a
+    rand_b = int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+    value = (ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= rand_a << 64
+    value |= 0x2 << 62
+    value |= rand_b
+    return UUID(int=value)